@@ -1,4 +1,5 @@
 from .models import AuditLog
+from .tasks import write_audit_log
 
 
 class AuditMiddleware:
@@ -49,9 +50,10 @@ class AuditMiddleware:
         # Determinar si fue exitoso
         success = 200 <= response.status_code < 400
         
-        # Registrar en auditoría
+        # Registrar en auditoría (el INSERT se hace en la cola de tareas,
+        # fuera del tiempo de respuesta de la petición)
         try:
-            AuditLog.log_action(
+            entry = AuditLog.build_entry(
                 action=action,
                 request=request,
                 description=description,
@@ -65,6 +67,7 @@ class AuditMiddleware:
                     'content_type': response.get('Content-Type', ''),
                 }
             )
+            write_audit_log.delay(entry)
         except Exception as e:
             # No fallar si el logging falla
             print(f"Error en AuditMiddleware: {e}")
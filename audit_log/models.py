@@ -164,7 +164,7 @@ class AuditLog(models.Model):
         verbose_name_plural = 'Registros de Auditoría'
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),  # Orden y paginación por cursor
             models.Index(fields=['user']),
             models.Index(fields=['action']),
             models.Index(fields=['ip_address']),
@@ -181,6 +181,23 @@ class AuditLog(models.Model):
         """
         Método helper para crear registros de auditoría fácilmente
         """
+        entry = cls.build_entry(
+            action, request=request, user=user, description=description,
+            object_type=object_type, object_id=object_id, object_repr=object_repr,
+            extra_data=extra_data, success=success, error_message=error_message,
+            severity=severity
+        )
+        return cls.objects.create(**entry)
+    
+    @classmethod
+    def build_entry(cls, action, request=None, user=None, description='', 
+                    object_type='', object_id=None, object_repr='', 
+                    extra_data=None, success=True, error_message='', severity='INFO'):
+        """
+        Construye los campos de un registro como dict serializable a JSON
+        (user_id en vez de la instancia), para poder insertarlo desde la cola
+        de tareas en segundo plano.
+        """
         # Obtener usuario
         if request and hasattr(request, 'user') and request.user.is_authenticated:
             user = request.user
@@ -202,24 +219,23 @@ class AuditLog(models.Model):
             method = request.method
             path = request.path
         
-        # Crear registro
-        return cls.objects.create(
-            action=action,
-            severity=severity,
-            user=user,
-            username=user.username if user else 'Anónimo',
-            ip_address=ip_address,
-            user_agent=user_agent,
-            method=method,
-            path=path,
-            description=description,
-            object_type=object_type,
-            object_id=object_id,
-            object_repr=object_repr,
-            extra_data=extra_data or {},
-            success=success,
-            error_message=error_message
-        )
+        return {
+            'action': action,
+            'severity': severity,
+            'user_id': user.pk if user else None,
+            'username': user.username if user else 'Anónimo',
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'method': method,
+            'path': path,
+            'description': description,
+            'object_type': object_type,
+            'object_id': object_id,
+            'object_repr': object_repr,
+            'extra_data': extra_data or {},
+            'success': success,
+            'error_message': error_message,
+        }
     
     @staticmethod
     def get_client_ip(request):
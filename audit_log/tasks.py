@@ -0,0 +1,12 @@
+"""
+Tareas en segundo plano para la bitácora de auditoría.
+"""
+from task_queue.queue import task
+
+
+@task(max_retries=2)
+def write_audit_log(entry):
+    """Inserta un registro de auditoría construido con AuditLog.build_entry()."""
+    from .models import AuditLog
+
+    AuditLog.objects.create(**entry)
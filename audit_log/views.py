@@ -1,7 +1,6 @@
 from rest_framework import viewsets, filters, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count
 from django.http import HttpResponse
@@ -17,13 +16,18 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 
+from ecommerce_api.pagination import KeysetPageNumberPagination
 from users.permissions import IsAdminOrManager
 from .models import AuditLog
 from .serializers import AuditLogSerializer, AuditLogFilterSerializer
 
 
-class AuditLogPagination(PageNumberPagination):
-    """Paginación personalizada para logs de auditoría"""
+class AuditLogPagination(KeysetPageNumberPagination):
+    """
+    Paginación personalizada para logs de auditoría.
+    Con ?cursor= usa paginación keyset sobre (timestamp, id), sin COUNT(*).
+    """
+    ordering_field = 'timestamp'
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -52,6 +56,9 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     - end_date: Fecha final
     - success: true/false
     - search: Búsqueda en descripción, path, error_message
+    
+    **Paginación:**
+    - ?page=N (por defecto) o ?cursor= para paginación por cursor sin total
     """
     
     queryset = AuditLog.objects.all()
@@ -5,6 +5,9 @@ Este módulo centraliza el envío de notificaciones por email para:
 - Nuevas solicitudes de devolución (a managers)
 - Aprobación de devoluciones (a clientes)
 - Rechazo de devoluciones (a clientes)
+
+Se ejecutan desde la cola de tareas (deliveries/tasks.py): los errores SMTP
+se propagan para que la tarea se reintente.
 """
 
 from django.core.mail import send_mail, EmailMultiAlternatives
@@ -85,6 +88,7 @@ Sistema SmartSales365
         print(f"✅ Email enviado a {len(recipient_list)} manager(s)")
     except Exception as e:
         print(f"❌ Error enviando email: {str(e)}")
+        raise
 
 
 def send_return_approved_notification(return_obj):
@@ -156,6 +160,7 @@ Si tienes dudas, contáctanos en: soporte@smartsales365.com
         print(f"✅ Email de aprobación enviado a {return_obj.user.email}")
     except Exception as e:
         print(f"❌ Error enviando email: {str(e)}")
+        raise
 
 
 def send_return_rejected_notification(return_obj):
@@ -223,6 +228,7 @@ Equipo SmartSales365
         print(f"✅ Email de rechazo enviado a {return_obj.user.email}")
     except Exception as e:
         print(f"❌ Error enviando email: {str(e)}")
+        raise
 
 
 def send_return_evaluation_started_notification(return_obj):
@@ -280,3 +286,4 @@ Equipo SmartSales365
         print(f"✅ Email de evaluación enviado a {return_obj.user.email}")
     except Exception as e:
         print(f"❌ Error enviando email: {str(e)}")
+        raise
@@ -4,88 +4,87 @@ Signals para gestión automática de entregas y garantías.
 Este módulo maneja la creación automática de:
 1. Deliveries cuando una orden se marca como PAID
 2. Warranties cuando una orden se marca como DELIVERED
+
+Ambos cuelgan de shop_orders.signals.orders_status_changed, que solo se emite
+en transiciones reales de estado (individuales o en bloque).
 """
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
-from shop_orders.models import Order
+from shop_orders.models import Order, OrderItem
+from shop_orders.signals import orders_status_changed
 from .models import Delivery, Warranty
 
 
-@receiver(post_save, sender=Order)
-def create_delivery_on_paid_order(sender, instance, created, **kwargs):
-    """
-    Crear automáticamente un Delivery cuando una orden se marca como PAID.
-    
-    Flujo:
-    1. Cliente paga → Orden status='PAID'
-    2. Signal se dispara
-    3. Se crea Delivery con status='PENDING'
-    4. Manager puede entonces asignar un repartidor
-    """
-    # Solo crear delivery si la orden cambió a PAID y no tiene delivery ya
-    if instance.status == Order.OrderStatus.PAID and not hasattr(instance, 'delivery'):
-        # Obtener dirección del usuario (puedes personalizarlo)
-        customer_address = getattr(instance.user, 'address', 'Dirección no especificada')
-        customer_phone = getattr(instance.user, 'phone_number', 'Sin teléfono')
-        
-        # Crear el delivery
-        Delivery.objects.create(
-            order=instance,
-            delivery_address=customer_address if customer_address else 'Dirección no especificada',
-            customer_phone=customer_phone if customer_phone else 'Sin teléfono',
-            status=Delivery.DeliveryStatus.PENDING,
-            notes=f'Delivery creado automáticamente para orden #{instance.id}'
-        )
-        print(f'✅ Delivery creado automáticamente para orden #{instance.id}')
-
-
-@receiver(post_save, sender=Order)
-def create_warranties_on_delivered_order(sender, instance, **kwargs):
+def build_delivery(order):
+    """Delivery PENDING (sin guardar) para una orden pagada."""
+    # Obtener dirección del usuario (puedes personalizarlo)
+    customer_address = getattr(order.user, 'address', 'Dirección no especificada')
+    customer_phone = getattr(order.user, 'phone_number', 'Sin teléfono')
+
+    return Delivery(
+        order=order,
+        delivery_address=customer_address if customer_address else 'Dirección no especificada',
+        customer_phone=customer_phone if customer_phone else 'Sin teléfono',
+        status=Delivery.DeliveryStatus.PENDING,
+        notes=f'Delivery creado automáticamente para orden #{order.id}'
+    )
+
+
+def build_warranty(order_id, product):
+    """Warranty ACTIVE (sin guardar) para un producto de una orden entregada."""
+    # Extraer duración de garantía del warranty_info (ej: "1 año de garantía")
+    warranty_duration_days = extract_warranty_duration(product.warranty_info)
+
+    # Calcular fecha de fin de garantía
+    start_date = timezone.now().date()
+    end_date = start_date + timedelta(days=warranty_duration_days)
+
+    return Warranty(
+        order_id=order_id,
+        product=product,
+        start_date=start_date,
+        end_date=end_date,
+        status=Warranty.WarrantyStatus.ACTIVE,
+        terms=f'Garantía del fabricante: {product.warranty_info}. '
+              f'Válida por {warranty_duration_days} días desde la entrega. '
+              f'Cubre defectos de fábrica y mal funcionamiento.',
+        notes=f'Garantía creada automáticamente al entregar orden #{order_id}'
+    )
+
+
+@receiver(orders_status_changed)
+def create_deliveries_and_warranties(sender, order_ids, new_status, **kwargs):
     """
-    Crear automáticamente Warranties cuando una orden se marca como DELIVERED.
-    
+    Crea Deliveries y Warranties cuando las órdenes cambian de estado.
+
     Flujo:
-    1. Repartidor marca delivery como completado → Orden status='DELIVERED'
-    2. Signal se dispara
-    3. Se crean garantías para cada producto en la orden
-    4. Duración de garantía según warranty_info del producto
+    1. Cliente paga → Orden PAID → Delivery PENDING (un manager asigna repartidor)
+    2. Repartidor entrega → Orden DELIVERED → una garantía por producto,
+       con la duración de warranty_info
+
+    Solo corre en transiciones reales (Order.save() o bulk_transition), así
+    que guardar una orden sin cambiar su estado no cuesta queries extra. Sirve
+    igual para una orden que para cientos: un query para saber cuáles ya
+    tienen Delivery/Warranty, uno para leer los datos y un bulk_create.
     """
-    # Solo crear garantías si la orden está DELIVERED
-    if instance.status == Order.OrderStatus.DELIVERED:
-        # Verificar que no se hayan creado garantías ya
-        if instance.warranties.exists():
-            return  # Ya existen garantías, no duplicar
-        
-        # Crear garantía para cada item de la orden
-        for item in instance.items.all():
-            product = item.product
-            
-            if not product:
-                continue  # Skip si el producto fue eliminado
-            
-            # Extraer duración de garantía del warranty_info (ej: "1 año de garantía")
-            warranty_duration_days = extract_warranty_duration(product.warranty_info)
-            
-            # Calcular fecha de fin de garantía
-            start_date = timezone.now().date()
-            end_date = start_date + timedelta(days=warranty_duration_days)
-            
-            # Crear garantía
-            Warranty.objects.create(
-                order=instance,
-                product=product,
-                start_date=start_date,
-                end_date=end_date,
-                status=Warranty.WarrantyStatus.ACTIVE,
-                terms=f'Garantía del fabricante: {product.warranty_info}. '
-                      f'Válida por {warranty_duration_days} días desde la entrega. '
-                      f'Cubre defectos de fábrica y mal funcionamiento.',
-                notes=f'Garantía creada automáticamente al entregar orden #{instance.id}'
-            )
-        
-        print(f'✅ Garantías creadas automáticamente para orden #{instance.id}')
+    if new_status == Order.OrderStatus.PAID:
+        existing = Delivery.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True)
+        orders = Order.objects.filter(id__in=order_ids).exclude(id__in=existing).select_related('user')
+        deliveries = Delivery.objects.bulk_create([build_delivery(order) for order in orders])
+        if deliveries:
+            print(f'✅ {len(deliveries)} deliveries creados automáticamente')
+
+    elif new_status == Order.OrderStatus.DELIVERED:
+        existing = Warranty.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True)
+        items = OrderItem.objects.filter(
+            order_id__in=order_ids,
+            product__isnull=False
+        ).exclude(order_id__in=existing).select_related('product')
+        warranties = Warranty.objects.bulk_create([build_warranty(item.order_id, item.product) for item in items])
+        if warranties:
+            print(f'✅ {len(warranties)} garantías creadas automáticamente')
 
 
 def extract_warranty_duration(warranty_info):
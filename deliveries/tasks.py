@@ -0,0 +1,24 @@
+"""
+Tareas en segundo plano para los emails de devoluciones.
+"""
+from task_queue.queue import task
+
+from . import email_utils
+
+
+# Tipo de email -> función de email_utils
+RETURN_EMAILS = {
+    'created': email_utils.send_new_return_notification_to_managers,
+    'evaluation_started': email_utils.send_return_evaluation_started_notification,
+    'approved': email_utils.send_return_approved_notification,
+    'rejected': email_utils.send_return_rejected_notification,
+}
+
+
+@task(max_retries=5, retry_backoff=30)
+def send_return_email(kind, return_id):
+    """Envía el email de devolución indicado por `kind` (ver RETURN_EMAILS)."""
+    from .models import Return
+
+    return_obj = Return.objects.select_related('product', 'order', 'user').get(id=return_id)
+    RETURN_EMAILS[kind](return_obj)
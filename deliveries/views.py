@@ -14,12 +14,8 @@ from .serializers import (
 )
 from users.permissions import IsAdminUser, IsManagerUser, IsDeliveryUser, IsAdminOrManager
 from shop_orders.models import Order
-from .email_utils import (
-    send_new_return_notification_to_managers,
-    send_return_approved_notification,
-    send_return_rejected_notification,
-    send_return_evaluation_started_notification
-)
+from .tasks import send_return_email
+from users.tasks import send_order_delivered_notification, send_return_notification
 
 
 class DeliveryZoneViewSet(viewsets.ModelViewSet):
@@ -249,6 +245,13 @@ class DeliveryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # La orden también debe poder pasar a DELIVERED (p. ej. no si fue cancelada)
+        if new_status == Delivery.DeliveryStatus.DELIVERED and not delivery.order.can_transition_to(Order.OrderStatus.DELIVERED):
+            return Response(
+                {'error': f'La orden #{delivery.order.id} está {delivery.order.status} y no puede marcarse como entregada'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Actualizar estado
         delivery.status = new_status
         if notes:
@@ -263,16 +266,11 @@ class DeliveryViewSet(viewsets.ModelViewSet):
             if delivery.delivery_person:
                 delivery.delivery_person.status = DeliveryProfile.DeliveryStatus.AVAILABLE
                 delivery.delivery_person.save()
-            # Actualizar estado de la orden
-            delivery.order.status = Order.OrderStatus.DELIVERED
-            delivery.order.save()
+            # Actualizar estado de la orden (crea las garantías si hubo transición)
+            delivery.order.transition_to(Order.OrderStatus.DELIVERED)
             
-            # ✅ Enviar notificación push al cliente
-            try:
-                from users.push_notification_service import PushNotificationService
-                PushNotificationService.send_order_delivered_notification(delivery.order.user, delivery.order)
-            except Exception as e:
-                print(f"⚠️  Error enviando notificación push al cliente: {str(e)}")
+            # ✅ Enviar notificación push al cliente (en segundo plano)
+            send_order_delivered_notification.delay(delivery.order.id)
         elif new_status == Delivery.DeliveryStatus.FAILED:
             # Liberar al repartidor
             if delivery.delivery_person:
@@ -402,11 +400,8 @@ class ReturnViewSet(viewsets.ModelViewSet):
         # ✅ Recargar el objeto con las relaciones para el email
         return_obj = Return.objects.select_related('product', 'order', 'user').get(pk=return_obj.pk)
         
-        # ✅ Enviar email a managers
-        try:
-            send_new_return_notification_to_managers(return_obj)
-        except Exception as e:
-            print(f"⚠️  Error enviando email a managers: {str(e)}")
+        # ✅ Enviar email a managers (en segundo plano)
+        send_return_email.delay('created', return_obj.id)
         
         # Crear serializer con el objeto recargado
         response_serializer = self.get_serializer(return_obj)
@@ -456,11 +451,8 @@ class ReturnViewSet(viewsets.ModelViewSet):
             return_obj.manager_notes = notes
         return_obj.save()
         
-        # ✅ Enviar email al cliente notificando que está en evaluación
-        try:
-            send_return_evaluation_started_notification(return_obj)
-        except Exception as e:
-            print(f"⚠️  Error enviando email al cliente: {str(e)}")
+        # ✅ Enviar email al cliente notificando que está en evaluación (en segundo plano)
+        send_return_email.delay('evaluation_started', return_obj.id)
         
         serializer = self.get_serializer(return_obj)
         return Response({
@@ -525,18 +517,9 @@ class ReturnViewSet(viewsets.ModelViewSet):
             return_obj.completed_at = timezone.now()
             return_obj.save()
             
-            # ✅ Enviar email al cliente notificando aprobación
-            try:
-                send_return_approved_notification(return_obj)
-            except Exception as e:
-                print(f"⚠️  Error enviando email al cliente: {str(e)}")
-            
-            # ✅ Enviar notificación push al cliente
-            try:
-                from users.push_notification_service import PushNotificationService
-                PushNotificationService.send_return_approved_notification(return_obj.order.user, return_obj)
-            except Exception as e:
-                print(f"⚠️  Error enviando notificación push al cliente: {str(e)}")
+            # ✅ Notificar aprobación al cliente por email y push (en segundo plano)
+            send_return_email.delay('approved', return_obj.id)
+            send_return_notification.delay(return_obj.id, approved=True)
         else:
             # Si el reembolso falló, mantener en APPROVED pero no COMPLETED
             print(f"⚠️  Devolución aprobada pero reembolso falló: {refund_message}")
@@ -583,18 +566,9 @@ class ReturnViewSet(viewsets.ModelViewSet):
         return_obj.evaluated_at = timezone.now()
         return_obj.save()
         
-        # ✅ Enviar email al cliente notificando rechazo
-        try:
-            send_return_rejected_notification(return_obj)
-        except Exception as e:
-            print(f"⚠️  Error enviando email al cliente: {str(e)}")
-        
-        # ✅ Enviar notificación push al cliente
-        try:
-            from users.push_notification_service import PushNotificationService
-            PushNotificationService.send_return_rejected_notification(return_obj.order.user, return_obj)
-        except Exception as e:
-            print(f"⚠️  Error enviando notificación push al cliente: {str(e)}")
+        # ✅ Notificar rechazo al cliente por email y push (en segundo plano)
+        send_return_email.delay('rejected', return_obj.id)
+        send_return_notification.delay(return_obj.id, approved=False)
         
         serializer = self.get_serializer(return_obj)
         return Response({
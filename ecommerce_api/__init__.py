@@ -0,0 +1,5 @@
+# Cargar la app de Celery al iniciar Django (solo se usa con TASK_QUEUE_BACKEND='celery')
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
@@ -0,0 +1,32 @@
+"""
+Configuración de Celery para la cola de tareas (TASK_QUEUE_BACKEND='celery').
+
+Worker:
+    celery -A ecommerce_api worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_api.settings')
+
+app = Celery('ecommerce_api')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+
+@app.task(bind=True, name='task_queue.run_task', acks_late=True)
+def run_task(self, task_name, args, kwargs):
+    """
+    Punto de entrada único en el worker: ejecuta una tarea registrada con
+    task_queue.queue.task, reintenta con backoff y manda a dead-letter.
+    """
+    from task_queue.queue import get_task, dead_letter
+
+    registered = get_task(task_name)
+    try:
+        return registered(*args, **kwargs)
+    except Exception as exc:
+        attempt = self.request.retries + 1
+        if attempt <= registered.max_retries:
+            raise self.retry(exc=exc, countdown=registered.countdown(attempt))
+        dead_letter(task_name, args, kwargs, attempt, exc)
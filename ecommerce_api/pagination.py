@@ -0,0 +1,122 @@
+"""
+Paginación por cursor (keyset) compartida por los listados grandes.
+
+PageNumberPagination hace COUNT(*) y OFFSET: en tablas con millones de filas
+(AuditLog, Order) las páginas profundas tardan segundos. En modo cursor la
+página siguiente se pide con un WHERE sobre (fecha, id), que resuelve el
+índice compuesto correspondiente, así que cualquier página cuesta lo mismo
+que la primera y no se calcula el total.
+
+Es opt-in: se activa enviando el parámetro `cursor` (vacío para la primera
+página) y se sigue con el enlace `next` de la respuesta:
+
+    GET /api/admin/orders/?cursor=&page_size=100
+    GET /api/admin/orders/?cursor=MjAyNS0xMS0xN1QxMDozMDowMC4xMjNafDQy&page_size=100
+
+Sin `cursor` el comportamiento es el de siempre. En modo cursor el orden es
+fijo (más reciente primero) y se ignora ?ordering=.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPaginationMixin:
+    """
+    Añade el modo cursor a una clase de paginación existente.
+
+    Atributos:
+        ordering_field: Campo de fecha que ordena el listado ('created_at', 'timestamp')
+        cursor_page_size: Tamaño por defecto cuando la clase base no define page_size
+    """
+    cursor_query_param = 'cursor'
+    ordering_field = 'created_at'
+    cursor_page_size = 50
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.keyset_page_size = self.get_page_size(request) or self.cursor_page_size
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+
+        field = self.ordering_field
+        queryset = queryset.order_by(f'-{field}', '-id')
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+            )
+
+        # Una fila extra indica si hay página siguiente, sin COUNT(*)
+        results = list(queryset[:self.keyset_page_size + 1])
+        self.has_next = len(results) > self.keyset_page_size
+        self.page = results[:self.keyset_page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor(getattr(last, self.ordering_field), last.pk)
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def encode_cursor(self, value, pk):
+        raw = f'{value.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        """Devuelve (fecha, id) o None para la primera página."""
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            value, pk = raw.rsplit('|', 1)
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_paginated_response_schema(self, schema):
+        page_schema = super().get_paginated_response_schema(schema)
+        page_schema['properties']['next']['description'] = (
+            f'Con ?{self.cursor_query_param}= contiene el cursor de la página siguiente'
+        )
+        return page_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Paginación por cursor: vacío para la primera página, luego el valor de "next". Omite el total.',
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+
+class KeysetPageNumberPagination(KeysetPaginationMixin, PageNumberPagination):
+    """PageNumberPagination por defecto, cursor (fecha, id) con ?cursor=."""
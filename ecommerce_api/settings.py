@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'django_filters',  # Filtros avanzados para Django REST Framework
     'audit_log',  # Sistema de auditoría y bitácora
     'fcm_django',  # Push notifications con Firebase Cloud Messaging
+    'task_queue',  # Cola de tareas en segundo plano (push, email, auditoría)
 ]
 
 MIDDLEWARE = [
@@ -149,6 +150,25 @@ else:
 # Cache time to live (en segundos)
 CACHE_TTL = 60 * 5  # 5 minutos
 
+# Modelo de recomendaciones personalizadas (ver products/recommendation_engine.py)
+RECOMMENDATION_MODEL_PATH = config(
+    'RECOMMENDATION_MODEL_PATH',
+    default=os.path.join(BASE_DIR, 'products', 'recommendation_model.joblib')
+)
+
+
+# Cola de tareas en segundo plano (ver task_queue/queue.py)
+# - 'local': pool de hilos dentro de cada worker de gunicorn (sin infraestructura extra)
+# - 'celery': usa CELERY_BROKER_URL (Redis) y requiere `celery -A ecommerce_api worker`
+TASK_QUEUE_BACKEND = config('TASK_QUEUE_BACKEND', default='local')
+TASK_QUEUE_LOCAL_WORKERS = config('TASK_QUEUE_LOCAL_WORKERS', default=4, cast=int)
+# Ejecutar las tareas en el momento, sin esperar al commit (tests)
+TASK_QUEUE_ALWAYS_EAGER = config('TASK_QUEUE_ALWAYS_EAGER', default=False, cast=bool)
+
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=redis_url or 'redis://localhost:6379/0')
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -238,6 +258,14 @@ STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_YOUR_SECRET_KEY
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_YOUR_WEBHOOK_SECRET_HERE')
 stripe.api_key = STRIPE_SECRET_KEY
 
+# Si es True, el webhook de Stripe solo registra el evento y responde 200;
+# el worker `python manage.py process_stripe_events --loop` lo procesa.
+STRIPE_WEBHOOK_ASYNC = config('STRIPE_WEBHOOK_ASYNC', default=False, cast=bool)
+
+# Reservas de stock para órdenes pendientes de pago (minutos).
+# Stripe exige que una sesión de checkout expire entre 30 minutos y 24 horas.
+STOCK_RESERVATION_TTL_MINUTES = config('STOCK_RESERVATION_TTL_MINUTES', default=60, cast=int)
+
 # Frontend URL for payment redirects
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173')
 
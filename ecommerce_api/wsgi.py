@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_api.settings')
 
 application = get_wsgi_application()
+
+# Precargar el índice de autocompletado de este worker (en segundo plano)
+from products.suggestion_index import warm_suggestion_index  # noqa: E402
+
+warm_suggestion_index()
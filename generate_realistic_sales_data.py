@@ -269,12 +269,7 @@ def add_seasonal_trends():
                     )
             special_dates.append(('Navidad', order_date))
     
-    # Recalcular totales de órdenes
-    for order in orders:
-        items = OrderItem.objects.filter(order=order)
-        total = sum(item.price * item.quantity for item in items)
-        order.total_price = total
-        order.save()
+    # Los totales (total_price, item_count) se actualizan solos al crear cada OrderItem
     
     print_success(f"Tendencias estacionales añadidas: {len(set(special_dates))} fechas especiales")
 
@@ -1,14 +1,20 @@
 from django.core.management.base import BaseCommand
-from predictions.services import train_sales_prediction_model
+from predictions.services import EXTRACT_CHUNK_SIZE, train_sales_prediction_model
 
 
 class Command(BaseCommand):
     help = 'Entrena y guarda el modelo de predicción de ventas'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=EXTRACT_CHUNK_SIZE,
+                            help='Filas leídas por bloque al extraer las características')
+        parser.add_argument('--cache-dir', default=None,
+                            help='Directorio para cachear el frame de características en Parquet (requiere pyarrow)')
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.NOTICE('Iniciando el entrenamiento del modelo de predicción de ventas...'))
         
-        result = train_sales_prediction_model()
+        result = train_sales_prediction_model(chunk_size=kwargs['chunk_size'], cache_dir=kwargs['cache_dir'])
         
         if "error" in result:
             self.stdout.write(self.style.ERROR(result["error"]))
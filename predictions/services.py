@@ -1,58 +1,137 @@
+import hashlib
+import logging
+import os
+from itertools import islice
+
+import joblib
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db.models import Count, Max, Sum
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-import joblib
-import os
-from django.conf import settings
+from sklearn.model_selection import train_test_split
 
 from shop_orders.models import OrderItem, Order
 
+logger = logging.getLogger(__name__)
+
+# Parquet es opcional: sin pyarrow el frame se extrae siempre de la base de datos
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
 
-def train_sales_prediction_model(min_samples=10):
+FEATURES = ['year', 'month', 'day', 'weekday', 'product_id', 'category_id', 'price']
+TARGET = 'quantity'
+CATEGORICAL_FEATURES = ['product_id', 'category_id']
+EXTRACT_CHUNK_SIZE = 50_000
+
+# Columnas leídas con values_list (sin instanciar modelos)
+_ROW_FIELDS = ('order__created_at', 'product_id', 'product__category_id', 'price', 'quantity')
+
+
+def _sales_items():
+    return OrderItem.objects.filter(order__status=Order.OrderStatus.PAID).order_by()
+
+
+def _chunk_frame(rows):
     """
-    Entrena un modelo de Random Forest para predecir ventas y lo guarda.
-    Devuelve un dict con el resultado o un error.
+    Convierte un bloque de tuplas en columnas tipadas: las fechas se reducen a
+    year/month/day/weekday en el bloque, así nunca se acumulan datetimes ni
+    Decimals de Python para todo el historial.
     """
-    # 1. Recolectar y preprocesar los datos
-    order_items = OrderItem.objects.filter(order__status=Order.OrderStatus.PAID).select_related('order', 'product__category')
-    
-    if not order_items.exists():
-        return {"error": "No hay suficientes datos de ventas para entrenar el modelo."}
+    created_at, product_ids, category_ids, prices, quantities = zip(*rows)
+    dates = pd.DatetimeIndex(pd.to_datetime(created_at, utc=True))
+    return pd.DataFrame({
+        'year': dates.year.to_numpy(dtype=np.int16),
+        'month': dates.month.to_numpy(dtype=np.int8),
+        'day': dates.day.to_numpy(dtype=np.int8),
+        'weekday': dates.weekday.to_numpy(dtype=np.int8),
+        # Ítems de productos o categorías borrados -> 0, como antes
+        'product_id': np.array([pk or 0 for pk in product_ids], dtype=np.int32),
+        'category_id': np.array([pk or 0 for pk in category_ids], dtype=np.int32),
+        'price': np.array(prices, dtype=np.float32),
+        'quantity': np.array(quantities, dtype=np.int32),
+    })
 
-    data = [
-        {
-            'date': item.order.created_at,
-            'product_id': item.product.id if item.product else 0,
-            'category_id': item.product.category.id if (item.product and item.product.category) else 0,
-            'price': float(item.price),
-            'quantity': int(item.quantity),
-        }
-        for item in order_items
-    ]
-
-    df = pd.DataFrame(data)
-    if df.empty:
-        return {"error": "No hay suficientes datos para entrenar el modelo."}
 
-    df['date'] = pd.to_datetime(df['date'])
-    # Ingeniería de características: extraer partes de la fecha
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day'] = df['date'].dt.day
-    df['weekday'] = df['date'].dt.weekday
+def extract_sales_features(chunk_size=EXTRACT_CHUNK_SIZE):
+    """
+    Frame de características de los ítems pagados, leído por bloques.
 
-    # 2. Definir características (X) y objetivo (y)
-    features = ['year', 'month', 'day', 'weekday', 'product_id', 'category_id', 'price']
-    target = 'quantity'
+    values_list().iterator() usa un cursor del lado del servidor en
+    PostgreSQL, de modo que la memoria de la extracción queda acotada a
+    chunk_size filas de Python más las columnas NumPy ya convertidas
+    (~21 bytes por ítem). product_id y category_id quedan como categóricas.
+    """
+    rows = _sales_items().values_list(*_ROW_FIELDS).iterator(chunk_size=chunk_size)
+    chunks = []
+    while True:
+        block = list(islice(rows, chunk_size))
+        if not block:
+            break
+        chunks.append(_chunk_frame(block))
+
+    if not chunks:
+        return pd.DataFrame(columns=FEATURES + [TARGET])
+
+    df = pd.concat(chunks, ignore_index=True)
+    for column in CATEGORICAL_FEATURES:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def _features_signature():
+    """Resumen de los ítems pagados: si cambia, el frame cacheado ya no sirve."""
+    stats = _sales_items().aggregate(count=Count('id'), last_id=Max('id'), units=Sum('quantity'))
+    raw = f"{stats['count']}:{stats['last_id']}:{stats['units']}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def load_sales_features(chunk_size=EXTRACT_CHUNK_SIZE, cache_dir=None):
+    """
+    extract_sales_features() con caché opcional en Parquet: con cache_dir
+    (y pyarrow instalado) el frame se guarda en
+    cache_dir/sales_features_<firma>.parquet y se reutiliza mientras no
+    cambien los ítems pagados.
+    """
+    if not cache_dir:
+        return extract_sales_features(chunk_size=chunk_size)
+    if not PARQUET_AVAILABLE:
+        logger.warning("pyarrow no está instalado; se omite la caché Parquet de características.")
+        return extract_sales_features(chunk_size=chunk_size)
+
+    cache_path = os.path.join(cache_dir, f'sales_features_{_features_signature()}.parquet')
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
 
-    X = df[features]
-    y = df[target]
+    df = extract_sales_features(chunk_size=chunk_size)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cache_path, index=False)
+    return df
+
+
+def train_sales_prediction_model(min_samples=10, chunk_size=EXTRACT_CHUNK_SIZE, cache_dir=None):
+    """
+    Entrena un modelo de Random Forest para predecir ventas y lo guarda.
+    Devuelve un dict con el resultado o un error.
+    """
+    # 1. Recolectar y preprocesar los datos (por bloques, columnas tipadas)
+    df = load_sales_features(chunk_size=chunk_size, cache_dir=cache_dir)
+    if df.empty:
+        return {"error": "No hay suficientes datos de ventas para entrenar el modelo."}
 
     # Simple check for minimum data
     if len(df) < min_samples:
         return {"error": f"Se requieren al menos {min_samples} muestras para entrenar. Datos disponibles: {len(df)}"}
 
+    # 2. Definir características (X) y objetivo (y). El modelo recibe los IDs
+    # como números, igual que las predicciones de la vista
+    X = df[FEATURES].astype({column: np.int32 for column in CATEGORICAL_FEATURES})
+    y = df[TARGET]
+
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     # 3. Entrenar el modelo
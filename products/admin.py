@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Review
+from .models import Category, Product, ProductRatingSummary, Review
 
 
 @admin.register(Category)
@@ -12,6 +12,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'price', 'stock', 'is_active', 'average_rating', 'review_count')
     list_filter = ('is_active', 'category')
     search_fields = ('name', 'description')
+    list_select_related = ('rating_summary',)
 
 
 @admin.register(Review)
@@ -21,3 +22,11 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'user__username', 'comment')
     readonly_fields = ('created_at', 'updated_at')
 
+
+
+@admin.register(ProductRatingSummary)
+class ProductRatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'review_count', 'average_rating', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'updated_at')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+    readonly_fields = ('updated_at',)
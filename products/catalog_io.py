@@ -0,0 +1,359 @@
+"""
+Importación y exportación masiva del catálogo (CSV o JSONL).
+
+Reemplaza los scripts que recorrían un diccionario haciendo
+Product.objects.get(name=...) y save() por fila:
+
+- import_products(): lee el archivo como stream, por lotes de chunk_size
+  filas, y hace upsert con la clave natural:
+    * filas con `sku`: los SKUs existentes se actualizan con bulk_update y
+      los nuevos se crean con bulk_create;
+    * filas sin `sku`: se buscan por `name` (como los scripts anteriores) y
+      se actualizan con bulk_update o se crean con bulk_create.
+  Las filas inválidas no detienen la importación: se reportan con su número.
+  Cada lote se confirma en su propia transacción; con dry_run todo el
+  archivo corre en una sola y se revierte al final.
+- export_rows(): genera el catálogo línea a línea para un StreamingHttpResponse
+  o un archivo, sin cargarlo completo en memoria.
+
+Columnas: sku, name, description, price, stock, category (nombre; se crea si
+no existe), image_url, warranty_info, is_active. Solo se actualizan las
+columnas presentes en el archivo.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .catalog_service import touch_catalog
+from .models import Category, Product
+
+FORMATS = ('csv', 'jsonl')
+COLUMNS = ['sku', 'name', 'description', 'price', 'stock', 'category', 'image_url', 'warranty_info', 'is_active']
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'si', 'sí'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+class ImportFormatError(ValueError):
+    """El archivo no tiene un formato reconocible (encabezado CSV o JSON inválido)."""
+
+
+def detect_format(filename, default='csv'):
+    """Formato a partir de la extensión del archivo ('.jsonl'/'.ndjson' -> jsonl)."""
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_rows(stream, fmt):
+    """
+    Genera (número_de_fila, dict) desde un stream binario, sin leerlo completo.
+    El número de fila es la línea del archivo (el encabezado CSV es la 1).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            yield from _iter_csv(text)
+        elif fmt == 'jsonl':
+            yield from _iter_jsonl(text)
+        else:
+            raise ImportFormatError(f'Formato no soportado: {fmt}. Use csv o jsonl.')
+    finally:
+        # No cerrar el archivo del llamador al descartar el wrapper
+        text.detach()
+
+
+def _iter_csv(text):
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or ('name' not in reader.fieldnames and 'sku' not in reader.fieldnames):
+        raise ImportFormatError('El CSV debe tener encabezado con al menos "sku" o "name".')
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key in COLUMNS}
+
+
+def _iter_jsonl(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ImportFormatError(f'JSON inválido: {e.msg}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ImportFormatError('Cada línea debe ser un objeto JSON.')
+            continue
+        yield line_number, {key: value for key, value in row.items() if key in COLUMNS}
+
+
+def _clean_field(model, key, value, field_name=None):
+    """
+    Valida un valor con el campo del modelo (max_length, formato de URL...),
+    así una celda inválida se reporta en su fila en lugar de rechazar el lote
+    completo con un error de la base de datos.
+    """
+    try:
+        return model._meta.get_field(field_name or key).clean(value, None)
+    except ValidationError as e:
+        raise ValueError(f'{key} inválido: {" ".join(e.messages)}')
+
+
+def _clean(row):
+    """Valida y convierte una fila. Devuelve el dict de campos del modelo o lanza ValueError."""
+    values = {}
+    for key, raw in row.items():
+        value = raw.strip() if isinstance(raw, str) else raw
+        if key == 'sku':
+            values['sku'] = _clean_field(Product, 'sku', str(value)) if value not in (None, '') else None
+        elif key == 'name':
+            if not value:
+                raise ValueError('name no puede estar vacío')
+            if len(str(value)) > 255:
+                raise ValueError('name supera los 255 caracteres')
+            values['name'] = str(value)
+        elif key == 'price':
+            try:
+                price = Decimal(str(value))
+            except InvalidOperation:
+                raise ValueError(f'price inválido: {raw!r}')
+            if price < 0 or price.as_tuple().exponent < -2 or abs(price) >= Decimal('1e8'):
+                raise ValueError(f'price inválido: {raw!r}')
+            values['price'] = price
+        elif key == 'stock':
+            try:
+                stock = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'stock inválido: {raw!r}')
+            if stock < 0:
+                raise ValueError('stock no puede ser negativo')
+            values['stock'] = stock
+        elif key == 'is_active':
+            if isinstance(value, bool):
+                values['is_active'] = value
+            elif str(value).lower() in TRUE_VALUES:
+                values['is_active'] = True
+            elif str(value).lower() in FALSE_VALUES:
+                values['is_active'] = False
+            else:
+                raise ValueError(f'is_active inválido: {raw!r}')
+        elif key == 'category':
+            values['category'] = _clean_field(Category, 'category', str(value), 'name') if value else None
+        elif key == 'image_url':
+            values['image_url'] = _clean_field(Product, 'image_url', str(value)) if value not in (None, '') else None
+        else:
+            value = '' if value is None else str(value)
+            values[key] = _clean_field(Product, key, value) if value else ''
+
+    if not values.get('sku') and not values.get('name'):
+        raise ValueError('Cada fila necesita sku o name')
+    return values
+
+
+def _resolve_categories(rows):
+    """Reemplaza el nombre de categoría por su id (creando las que falten)."""
+    names = {row['category'] for row in rows if row.get('category')}
+    if not names:
+        return
+    existing = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - set(existing)
+    if missing:
+        Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+    for row in rows:
+        if 'category' in row:
+            name = row.pop('category')
+            row['category_id'] = existing.get(name) if name else None
+
+
+def _model_fields(row):
+    return sorted(key for key in row if key != 'sku')
+
+
+def _split_new_rows(rows, existing, report):
+    """Descarta (con error) las filas nuevas a las que les falta name o price."""
+    valid = []
+    for line_number, row in rows:
+        if row['key'] not in existing and ('name' not in row['values'] or 'price' not in row['values']):
+            _add_error(report, line_number, 'Producto nuevo: name y price son obligatorios')
+        else:
+            valid.append(row['values'])
+    return valid
+
+
+def _upsert_by_sku(rows, now, report):
+    """
+    SKUs existentes: bulk_update solo de las columnas presentes (por grupo de
+    columnas). SKUs nuevos: bulk_create. Un INSERT ... ON CONFLICT DO UPDATE no
+    sirve para filas parciales (p. ej. solo sku,stock): la base de datos
+    valida los NOT NULL de la fila insertada antes de resolver el conflicto.
+    """
+    ids_by_sku = dict(
+        Product.objects.filter(sku__in=[row['key'] for _, row in rows]).values_list('sku', 'id')
+    )
+    valid = _split_new_rows(rows, ids_by_sku, report)
+
+    to_create, groups = [], {}
+    for values in valid:
+        product_id = ids_by_sku.get(values['sku'])
+        if product_id is None:
+            to_create.append(Product(**values))
+        else:
+            groups.setdefault(tuple(_model_fields(values)), []).append(Product(id=product_id, updated_at=now, **values))
+
+    Product.objects.bulk_create(to_create)
+    for fields, products in groups.items():
+        Product.objects.bulk_update(products, list(fields) + ['updated_at'])
+    return len(to_create), sum(len(products) for products in groups.values())
+
+
+def _upsert_by_name(rows, now, report):
+    """Productos sin sku: se actualiza el primero con ese nombre o se crea uno nuevo."""
+    ids_by_name = {}
+    names = [row['key'] for _, row in rows]
+    for product_id, name in Product.objects.filter(name__in=names).order_by('id').values_list('id', 'name'):
+        ids_by_name.setdefault(name, product_id)
+    valid = _split_new_rows(rows, ids_by_name, report)
+
+    to_create, groups = [], {}
+    for values in valid:
+        product_id = ids_by_name.get(values['name'])
+        if product_id is None:
+            to_create.append(Product(**values))
+        else:
+            groups.setdefault(tuple(_model_fields(values)), []).append(Product(id=product_id, updated_at=now, **values))
+
+    Product.objects.bulk_create(to_create)
+    for fields, products in groups.items():
+        Product.objects.bulk_update(products, list(fields) + ['updated_at'])
+    return len(to_create), sum(len(products) for products in groups.values())
+
+
+def _import_chunk(chunk, report):
+    by_sku, by_name = {}, {}
+    for line_number, row in chunk:
+        if isinstance(row, Exception):
+            _add_error(report, line_number, str(row))
+            continue
+        try:
+            values = _clean(row)
+        except ValueError as e:
+            _add_error(report, line_number, str(e))
+            continue
+        # Claves repetidas dentro del lote: gana la última fila
+        if values.get('sku'):
+            by_sku[values['sku']] = (line_number, {'key': values['sku'], 'values': values})
+        else:
+            values.pop('sku', None)
+            by_name[values['name']] = (line_number, {'key': values['name'], 'values': values})
+
+    rows = list(by_sku.values()) + list(by_name.values())
+    if not rows:
+        return
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            _resolve_categories([row['values'] for _, row in rows])
+            created, updated = _upsert_by_sku(list(by_sku.values()), now, report) if by_sku else (0, 0)
+            created_by_name, updated_by_name = _upsert_by_name(list(by_name.values()), now, report) if by_name else (0, 0)
+    except DatabaseError as e:
+        # El lote completo se revierte: reportar su rango de filas
+        lines = [line_number for line_number, _ in rows]
+        _add_error(report, f'{min(lines)}-{max(lines)}', f'Lote rechazado: {e}')
+        return
+
+    report['created'] += created + created_by_name
+    report['updated'] += updated + updated_by_name
+
+
+def _add_error(report, row, message):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': row, 'error': message})
+
+
+def import_products(stream, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Importa productos desde un stream binario (archivo subido o abierto en 'rb').
+
+    Returns:
+        dict: {'processed', 'created', 'updated', 'error_count', 'errors': [{'row', 'error'}], 'dry_run'}
+
+    Raises:
+        ImportFormatError: si el formato o el encabezado no son válidos
+    """
+    report = {'processed': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': [], 'dry_run': dry_run}
+
+    if dry_run:
+        with transaction.atomic():
+            _import_stream(stream, fmt, chunk_size, report)
+            transaction.set_rollback(True)
+        return report
+
+    # Cada lote se confirma en su propia transacción (_import_chunk): una
+    # importación grande no retiene los locks de todos los productos tocados
+    # (ni bloquea los UPDATE de stock del checkout) hasta leer todo el archivo
+    try:
+        _import_stream(stream, fmt, chunk_size, report)
+    finally:
+        if report['created'] or report['updated']:
+            # Los bulk_* no disparan signals: invalidar catálogo y sugerencias
+            transaction.on_commit(touch_catalog)
+
+    return report
+
+
+def _import_stream(stream, fmt, chunk_size, report):
+    chunk = []
+    for line_number, row in iter_rows(stream, fmt):
+        chunk.append((line_number, row))
+        report['processed'] += 1
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, report)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, report)
+
+
+def export_rows(fmt='csv', queryset=None, chunk_size=2000):
+    """
+    Genera el catálogo como líneas de texto (CSV con encabezado o JSONL),
+    leyendo la base de datos por bloques.
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f'Formato no soportado: {fmt}. Use csv o jsonl.')
+
+    queryset = queryset if queryset is not None else Product.objects.all()
+    rows = queryset.order_by('id').values_list(
+        'sku', 'name', 'description', 'price', 'stock', 'category__name', 'image_url', 'warranty_info', 'is_active'
+    ).iterator(chunk_size=chunk_size)
+
+    if fmt == 'jsonl':
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            record['price'] = str(record['price'])
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _LineBuffer:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla."""
+
+    def write(self, value):
+        return value
@@ -0,0 +1,74 @@
+"""
+Importación y exportación masiva del catálogo vía API (solo administradores).
+La lógica vive en products/catalog_io.py; el comando import_products/
+export_products usa las mismas funciones.
+"""
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .catalog_io import DEFAULT_CHUNK_SIZE, FORMATS, ImportFormatError, detect_format, export_rows, import_products
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_products_view(request):
+    """
+    Importa productos desde un archivo CSV o JSONL (upsert por sku o name).
+
+    POST /api/products/import/
+    multipart: file=<archivo>, file_format=csv|jsonl (opcional, por extensión),
+               dry_run=true (valida sin guardar), chunk_size (default 1000)
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Debe enviar el archivo en el campo "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = request.data.get('file_format') or detect_format(upload.name)
+    if fmt not in FORMATS:
+        return Response({'error': f'Formato no soportado: {fmt}. Use csv o jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        chunk_size = max(1, min(int(request.data.get('chunk_size', DEFAULT_CHUNK_SIZE)), 10000))
+    except (TypeError, ValueError):
+        return Response({'error': 'chunk_size debe ser un entero.'}, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+    try:
+        report = import_products(upload.file, fmt=fmt, chunk_size=chunk_size, dry_run=dry_run)
+    except ImportFormatError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': report['error_count'] == 0,
+        'message': f"{report['created']} productos creados y {report['updated']} actualizados"
+                   + (' (simulación, sin guardar)' if dry_run else ''),
+        **report,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_products_view(request):
+    """
+    Exporta el catálogo completo como stream (no se arma en memoria).
+
+    GET /api/products/export/?file_format=csv|jsonl
+    (no se usa ?format=, que DRF reserva para elegir el renderer)
+    """
+    fmt = request.query_params.get('file_format', 'csv')
+    if fmt not in FORMATS:
+        return Response({'error': f'Formato no soportado: {fmt}. Use csv o jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(export_rows(fmt), content_type=CONTENT_TYPES[fmt])
+    filename = f"productos_{timezone.now():%Y%m%d_%H%M%S}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
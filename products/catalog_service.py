@@ -0,0 +1,144 @@
+"""
+Listado público del catálogo: filtros, orden y cache HTTP.
+
+El catálogo cambia poco y lo piden todas las apps al abrirse. Se lleva una
+"versión" del catálogo en el cache (la fecha del último cambio de un
+Product) que se renueva con touch_catalog() en cada escritura:
+
+- ETag / Last-Modified se calculan desde esa versión y la query string, sin
+  tocar la base de datos; si el cliente ya tiene la versión vigente recibe 304.
+- Las respuestas anónimas se guardan en el cache bajo una clave que incluye
+  la versión, así que un cambio en el catálogo invalida todas a la vez.
+
+Las ventas no renuevan la versión en cada orden (la invalidaría sin parar en
+una tienda con tráfico): solo cuando un producto se agota o vuelve a tener
+stock disponible, que es lo que filtra ?in_stock=. El número de unidades del
+listado puede atrasarse hasta CATALOG_STOCK_REFRESH segundos; el detalle del
+producto se invalida en cada cambio y el checkout valida el stock real.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Max, When
+from django.utils import timezone
+from django.utils.http import http_date
+
+CATALOG_VERSION_KEY = 'products:catalog:version'
+CATALOG_RESPONSE_TIMEOUT = 60 * 5
+CATALOG_STOCK_REFRESH = 60 * 5
+
+# ?ordering= permitido -> columnas (con -id como desempate estable para paginar)
+CATALOG_ORDERINGS = {
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+}
+DEFAULT_ORDERING = '-created_at'
+# Resultados de ?search= que se listan (y paginan) como máximo
+SEARCH_RESULTS_LIMIT = 200
+
+
+def touch_catalog(product_ids=None, listing=True):
+    """
+    Marca el catálogo como modificado ahora (invalida ETag y respuestas
+    cacheadas), invalida el detalle cacheado de los productos cambiados y los
+    publica para el índice de autocompletado de cada worker (None = todos).
+
+    Con listing=False (ventas que no agotan ningún producto) el listado
+    conserva su versión y solo se invalidan el detalle y los índices.
+    """
+    from .detail_cache import invalidate_product_details
+    from .suggestion_index import record_product_changes
+
+    if listing:
+        cache.set(CATALOG_VERSION_KEY, timezone.now().timestamp(), timeout=None)
+    invalidate_product_details(product_ids)
+    record_product_changes(product_ids)
+
+
+def get_catalog_version():
+    """
+    Timestamp del último cambio del catálogo. Si no está en el cache (primer
+    request o cache vaciado) se toma de MAX(Product.updated_at).
+
+    Nunca es anterior al inicio del intervalo de CATALOG_STOCK_REFRESH
+    vigente, así las unidades en stock del listado se refrescan aunque las
+    ventas no hayan renovado la versión.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        from .models import Product
+
+        last_update = Product.objects.aggregate(last=Max('updated_at'))['last']
+        version = last_update.timestamp() if last_update else 0.0
+        cache.add(CATALOG_VERSION_KEY, version, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, version)
+    now = timezone.now().timestamp()
+    return max(version, now - now % CATALOG_STOCK_REFRESH)
+
+
+def catalog_etag(request, version):
+    """ETag del listado: versión del catálogo + query string (+ host, por los enlaces de paginación)."""
+    raw = f'{version}|{request.get_host()}|{request.get_full_path()}'
+    return '"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def catalog_cache_key(etag):
+    return f'products:catalog:response:{etag.strip(chr(34))}'
+
+
+def last_modified_header(version):
+    return http_date(int(version))
+
+
+def _decimal_param(value):
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def apply_catalog_filters(queryset, params):
+    """
+    Filtros y orden del listado de productos:
+    ?search=texto, ?category=ID, ?min_price=, ?max_price=, ?in_stock=true,
+    ?ordering=price|-price|name|-name|created_at|-created_at.
+
+    Los valores inválidos se ignoran. Los filtros usan el índice
+    (is_active, category, price) de Product; ?search= usa los índices de
+    texto de products.search_service y, sin ?ordering=, ordena por relevancia.
+    """
+    category = params.get('category')
+    if category and category.isdigit():
+        queryset = queryset.filter(category_id=int(category))
+
+    min_price = _decimal_param(params.get('min_price'))
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+
+    max_price = _decimal_param(params.get('max_price'))
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    if params.get('in_stock', '').lower() in ('1', 'true', 'yes'):
+        queryset = queryset.filter(stock__gt=F('reserved_stock'))
+
+    search = params.get('search', '').strip()
+    if search:
+        from .search_service import search_product_ids
+
+        product_ids = search_product_ids(search, limit=SEARCH_RESULTS_LIMIT)
+        queryset = queryset.filter(id__in=product_ids)
+        if 'ordering' not in params and product_ids:
+            relevance = Case(
+                *[When(id=product_id, then=position) for position, product_id in enumerate(product_ids)],
+                output_field=IntegerField(),
+            )
+            return queryset.order_by(relevance, 'id')
+
+    ordering = params.get('ordering', DEFAULT_ORDERING)
+    return queryset.order_by(*CATALOG_ORDERINGS.get(ordering, CATALOG_ORDERINGS[DEFAULT_ORDERING]))
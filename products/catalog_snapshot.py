@@ -0,0 +1,253 @@
+"""
+Snapshot compacto del catálogo para resolver productos en memoria.
+
+CartNLPService resolvía cada ítem de un comando con una búsqueda en la base
+de datos y, si no había resultado, con una más por cada sinónimo; después la
+vista volvía a leer cada producto con Product.objects.get. Con el snapshot un
+comando de varios ítems se resuelve sin consultar la base de datos.
+
+Cada worker guarda, por producto activo: nombre normalizado (minúsculas y sin
+acentos), palabras del nombre, palabras en singular (stem) de la descripción,
+precio y stock. Sobre el vocabulario de los nombres mantiene índices
+palabra -> productos y trigrama -> palabras (fuzzy_matching).
+
+match() puntúa cada producto de 0 a 1:
+- cada palabra de la consulta se compara con las palabras candidatas del
+  vocabulario (las que comparten trigramas, sin recorrer el catálogo) con
+  word_similarity(): exacta, singular, prefijo, contenida o con errores de
+  tipeo; los sinónimos de KEYWORD_SYNONYMS cuentan con un pequeño descuento;
+- si la palabra no aparece en el nombre pero sí en la descripción suma menos;
+- similitud de conjuntos de palabras: cobertura de la consulta (peso mayor)
+  y del nombre del producto. Las palabras de la consulta que no coinciden con
+  ningún producto ("al carrito") se ignoran.
+
+Se sincroniza con la misma versión compartida que el índice de sugerencias
+(suggestion_index): cada touch_catalog() publica los IDs cambiados y el
+snapshot recarga solo esos productos.
+"""
+import threading
+from collections import defaultdict, namedtuple
+
+from .fuzzy_matching import max_edits, trigrams, word_similarity
+from .models import Product
+from .text_normalization import WORD_RE, normalize, stem
+from .suggestion_index import changed_product_ids, current_version
+
+# Palabras comunes de los clientes -> término del catálogo
+KEYWORD_SYNONYMS = {
+    'celular': 'phone',
+    'telefono': 'phone',
+    'movil': 'phone',
+    'computadora': 'laptop',
+    'portatil': 'laptop',
+    'notebook': 'laptop',
+    'pc': 'laptop',
+    'auricular': 'airpods',
+    'audifonos': 'airpods',
+    'headphones': 'airpods',
+    'tele': 'tv',
+    'television': 'tv',
+    'consola': 'playstation',
+    'raton': 'mouse',
+}
+SYNONYM_WEIGHT = 0.9
+DESCRIPTION_WEIGHT = 0.5
+QUERY_COVERAGE_WEIGHT = 0.85
+MIN_CONFIDENCE = 0.45
+
+SnapshotProduct = namedtuple(
+    'SnapshotProduct',
+    ['id', 'name', 'price', 'stock', 'category_id', 'normalized_name', 'name_words', 'description_stems'],
+)
+
+
+class CatalogSnapshot:
+    """Productos activos de un worker. Usar get_catalog_snapshot()."""
+
+    def __init__(self, version):
+        self.version = version
+        self.products = {}
+        self.words = defaultdict(set)         # palabra del nombre -> productos
+        self.ngrams = defaultdict(set)        # trigrama -> palabras del vocabulario
+        self.descriptions = defaultdict(set)  # stem de la descripción -> productos
+
+    def add(self, product_id, name, description, price, stock, category_id):
+        normalized_name = normalize(name)
+        product = SnapshotProduct(
+            id=product_id,
+            name=name,
+            price=price,
+            stock=stock,
+            category_id=category_id,
+            normalized_name=normalized_name,
+            name_words=frozenset(WORD_RE.findall(normalized_name)),
+            description_stems=frozenset(stem(word) for word in WORD_RE.findall(normalize(description or ''))),
+        )
+        self.products[product_id] = product
+        for word in product.name_words:
+            if word not in self.words:
+                for gram in trigrams(word):
+                    self.ngrams[gram].add(word)
+            self.words[word].add(product_id)
+        for word in product.description_stems:
+            self.descriptions[word].add(product_id)
+
+    def remove(self, product_id):
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        for word in product.name_words:
+            ids = self.words.get(word)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self.words[word]
+                for gram in trigrams(word):
+                    self.ngrams[gram].discard(word)
+                    if not self.ngrams[gram]:
+                        del self.ngrams[gram]
+        for word in product.description_stems:
+            ids = self.descriptions.get(word)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self.descriptions[word]
+
+    def refresh(self, product_ids):
+        """Recarga desde la base de datos solo los productos indicados."""
+        for product_id in product_ids:
+            self.remove(product_id)
+        for row in _load_products(product_ids):
+            self.add(*row)
+
+    def get(self, product_id):
+        return self.products.get(product_id)
+
+    def similar_words(self, query_word):
+        """
+        {palabra del vocabulario: similitud} para una palabra de la consulta.
+        Las candidatas salen del índice de trigramas: solo se comparan las
+        palabras que comparten suficientes n-gramas.
+        """
+        grams = trigrams(query_word)
+        # Con d ediciones se pierden hasta 3·d trigramas; una palabra contenida
+        # conserva al menos los trigramas interiores de la consulta
+        required = max(1, min(len(grams) - 3 * max_edits(query_word), len(query_word) - 2))
+        counts = defaultdict(int)
+        for gram in grams:
+            for word in self.ngrams.get(gram, ()):
+                counts[word] += 1
+
+        matches = {}
+        if query_word in self.words:
+            matches[query_word] = 1.0
+        for word, shared in counts.items():
+            if shared >= required and word not in matches:
+                similarity = word_similarity(query_word, word)
+                if similarity:
+                    matches[word] = similarity
+        return matches
+
+    def match(self, query, limit=5, category_id=None):
+        """
+        Productos que coinciden con query y su puntaje (0..1), del mayor al menor.
+
+        Returns:
+            list[tuple[SnapshotProduct, float]]
+        """
+        normalized = normalize(query or '')
+        query_words = list(dict.fromkeys(WORD_RE.findall(normalized)))
+        if not query_words:
+            return []
+
+        # best[producto][i] = mejor similitud de la palabra i de la consulta en ese producto
+        best = defaultdict(dict)
+        matched_words = defaultdict(set)
+        for i, query_word in enumerate(query_words):
+            alternatives = {query_word: 1.0}
+            synonym = KEYWORD_SYNONYMS.get(query_word) or KEYWORD_SYNONYMS.get(stem(query_word))
+            if synonym:
+                alternatives[synonym] = SYNONYM_WEIGHT
+            for alternative, weight in alternatives.items():
+                for word, similarity in self.similar_words(alternative).items():
+                    for product_id in self.words.get(word, ()):
+                        if similarity * weight > best[product_id].get(i, 0):
+                            best[product_id][i] = similarity * weight
+                            matched_words[product_id].add(word)
+                for product_id in self.descriptions.get(stem(alternative), ()):
+                    if DESCRIPTION_WEIGHT * weight > best[product_id].get(i, 0):
+                        best[product_id][i] = DESCRIPTION_WEIGHT * weight
+
+        # Palabras que no aparecen en ningún producto ("al carrito") no restan confianza
+        recognized = len({i for similarities in best.values() for i in similarities})
+
+        scored = []
+        for product_id, similarities in best.items():
+            product = self.products[product_id]
+            if category_id and product.category_id != category_id:
+                continue
+            query_coverage = sum(similarities.values()) / recognized
+            name_coverage = len(matched_words[product_id]) / max(len(product.name_words), 1)
+            score = QUERY_COVERAGE_WEIGHT * query_coverage + (1 - QUERY_COVERAGE_WEIGHT) * name_coverage
+            scored.append((round(min(score, 1.0), 3), product_id))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.products[product_id], score) for score, product_id in scored[:limit]]
+
+    def find(self, query, category_id=None):
+        """El producto más probable para query, o None si ninguno llega a MIN_CONFIDENCE."""
+        results = self.match(query, limit=1, category_id=category_id)
+        if results and results[0][1] >= MIN_CONFIDENCE:
+            return results[0][0]
+        return None
+
+
+def _load_products(product_ids=None):
+    products = Product.objects.filter(is_active=True)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    return products.values_list(
+        'id', 'name', 'description', 'price', 'stock', 'category_id'
+    ).iterator(chunk_size=2000)
+
+
+def build_catalog_snapshot(version):
+    snapshot = CatalogSnapshot(version)
+    for row in _load_products():
+        snapshot.add(*row)
+    return snapshot
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog_snapshot():
+    """Snapshot del worker, puesto al día con la versión compartida del catálogo."""
+    global _snapshot
+    version = current_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version > version:
+            snapshot = build_catalog_snapshot(version)
+        elif snapshot.version < version:
+            product_ids = changed_product_ids(snapshot.version, version)
+            if product_ids is None:
+                snapshot = build_catalog_snapshot(version)
+            else:
+                snapshot.refresh(product_ids)
+                snapshot.version = version
+        _snapshot = snapshot
+    return snapshot
+
+
+def reset_catalog_snapshot():
+    """Descarta el snapshot del worker (se reconstruye en la próxima consulta)."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
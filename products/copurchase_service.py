@@ -0,0 +1,188 @@
+"""
+Recomendaciones "comprado junto con" a partir de ProductCoPurchase.
+
+Antes cada vista de producto hacía un self-join OrderItem x OrderItem con
+COUNT, que crece con el cuadrado del volumen de órdenes. Ahora:
+
+- rebuild_copurchase_matrix(): arma la matriz órdenes x productos como una
+  matriz dispersa (SciPy CSR), calcula X^T X (co-ocurrencias) y guarda todas
+  las parejas con su conteo completo. Lo usa el comando build_copurchase_matrix.
+- apply_order_copurchases(): suma (o resta, si se cancela) las parejas de las
+  órdenes que pasan a pagadas, con un número fijo de queries.
+- get_copurchase_recommendations(): los top-K vecinos se eligen al leer, con
+  un SELECT sobre el índice (product, -count). Mientras la tabla no tenga
+  filas del producto (p. ej. antes de la primera corrida de
+  build_copurchase_matrix) responde con el self-join sobre las órdenes.
+
+La tabla no se poda a los top-K al reconstruir: si lo hiciera, una pareja
+descartada volvería a contarse desde 0 con los incrementos y el ranking
+dependería de cuándo corrió la última reconstrucción.
+"""
+from collections import Counter
+from itertools import permutations
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, When
+from django.db.models.functions import Greatest, Now
+from scipy import sparse
+
+from .recommendation_models import ProductCoPurchase
+
+
+def sold_statuses():
+    from shop_orders.models import Order
+
+    return [Order.OrderStatus.PAID, Order.OrderStatus.SHIPPED, Order.OrderStatus.DELIVERED]
+
+
+def get_copurchase_recommendations(product_id, limit=5):
+    """
+    Productos activos más comprados junto con product_id, cada uno con el
+    atributo times_bought_together.
+    """
+    rows = ProductCoPurchase.objects.filter(
+        product_id=product_id,
+        related_product__is_active=True,
+    ).select_related(
+        'related_product__category', 'related_product__rating_summary'
+    ).order_by('-count', 'related_product_id')[:limit]
+
+    recommended = []
+    for row in rows:
+        product = row.related_product
+        product.times_bought_together = row.count
+        recommended.append(product)
+    if not recommended and not ProductCoPurchase.objects.filter(product_id=product_id).exists():
+        return _copurchases_from_orders(product_id, limit)
+    return recommended
+
+
+def _copurchases_from_orders(product_id, limit):
+    """Mismo resultado calculado desde OrderItem (órdenes vendidas en común)."""
+    from .models import Product
+
+    return list(
+        Product.objects.filter(
+            is_active=True,
+            order_items__order__status__in=sold_statuses(),
+            order_items__order__items__product_id=product_id,
+        ).exclude(
+            id=product_id
+        ).annotate(
+            times_bought_together=Count('order_items__order', distinct=True)
+        ).select_related(
+            'category', 'rating_summary'
+        ).order_by('-times_bought_together', 'id')[:limit]
+    )
+
+
+def _order_products(order_ids):
+    """{order_id: {product_id, ...}} de las órdenes dadas."""
+    from shop_orders.models import OrderItem
+
+    products_by_order = {}
+    items = OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False).values_list('order_id', 'product_id')
+    for order_id, product_id in items:
+        products_by_order.setdefault(order_id, set()).add(product_id)
+    return products_by_order
+
+
+def apply_order_copurchases(order_ids, sign=1):
+    """
+    Suma (sign=1) o resta (sign=-1) a la matriz las parejas de productos de
+    las órdenes dadas. Cada orden cuenta una vez por pareja aunque repita el
+    producto en varias líneas.
+
+    Queries constantes: un INSERT ... ON CONFLICT DO NOTHING para las parejas
+    nuevas, un SELECT ... FOR UPDATE y un UPDATE con CASE.
+
+    Returns:
+        int: parejas (dirigidas) modificadas
+    """
+    deltas = Counter()
+    for products in _order_products(order_ids).values():
+        for pair in permutations(sorted(products), 2):
+            deltas[pair] += sign
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        if sign > 0:
+            ProductCoPurchase.objects.bulk_create(
+                [ProductCoPurchase(product_id=a, related_product_id=b, count=0) for a, b in deltas],
+                ignore_conflicts=True,
+            )
+
+        product_ids = {a for a, _ in deltas}
+        related_ids = {b for _, b in deltas}
+        # Orden fijo al bloquear para que dos órdenes concurrentes no se crucen
+        rows = ProductCoPurchase.objects.select_for_update().filter(
+            product_id__in=product_ids,
+            related_product_id__in=related_ids,
+        ).order_by('product_id', 'related_product_id').values_list('id', 'product_id', 'related_product_id')
+
+        locked = [(row_id, (a, b)) for row_id, a, b in rows if (a, b) in deltas]
+        if locked:
+            whens = [When(id=row_id, then=Greatest(F('count') + deltas[pair], 0)) for row_id, pair in locked]
+            ProductCoPurchase.objects.filter(id__in=[row_id for row_id, _ in locked]).update(
+                count=Case(*whens, default=F('count'), output_field=IntegerField()),
+                updated_at=Now(),
+            )
+        if sign < 0:
+            ProductCoPurchase.objects.filter(
+                product_id__in=product_ids, related_product_id__in=related_ids, count__lte=0
+            ).delete()
+
+    return len(locked)
+
+
+def rebuild_copurchase_matrix(batch_size=5000):
+    """
+    Reconstruye ProductCoPurchase desde todas las órdenes vendidas, con el
+    conteo completo de cada pareja (el mismo que mantiene
+    apply_order_copurchases()).
+
+    Returns:
+        dict: {'orders': n, 'products': n, 'pairs': n}
+    """
+    from shop_orders.models import OrderItem
+
+    pairs = np.array(
+        list(
+            OrderItem.objects.filter(
+                order__status__in=sold_statuses(),
+                product__isnull=False,
+            ).values_list('order_id', 'product_id').distinct().iterator(chunk_size=batch_size)
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    if not len(pairs):
+        with transaction.atomic():
+            ProductCoPurchase.objects.all().delete()
+        return {'orders': 0, 'products': 0, 'pairs': 0}
+
+    order_ids, order_index = np.unique(pairs[:, 0], return_inverse=True)
+    product_ids, product_index = np.unique(pairs[:, 1], return_inverse=True)
+
+    # X[o, p] = 1 si la orden o contiene el producto p; X^T X = órdenes en común
+    orders_by_product = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (order_index, product_index)),
+        shape=(len(order_ids), len(product_ids)),
+    )
+    cooccurrence = (orders_by_product.T @ orders_by_product).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+    cooccurrence = cooccurrence.tocoo()
+
+    rows = [
+        ProductCoPurchase(product_id=int(product_ids[row]), related_product_id=int(product_ids[column]), count=int(count))
+        for row, column, count in zip(cooccurrence.row, cooccurrence.col, cooccurrence.data)
+    ]
+
+    with transaction.atomic():
+        ProductCoPurchase.objects.all().delete()
+        ProductCoPurchase.objects.bulk_create(rows, batch_size=batch_size)
+
+    return {'orders': len(order_ids), 'products': len(product_ids), 'pairs': len(rows)}
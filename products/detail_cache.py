@@ -0,0 +1,115 @@
+"""
+Cache del detalle de producto (GET /api/products/{id}/) para clientes.
+
+Read-through sobre el cache compartido (Redis con prefijo `smartsales` en
+producción):
+
+- Claves versionadas: products:detail:{id}:g{generación}:v{versión}. La versión
+  del producto sube con cada touch_catalog([id]) (escrituras del producto,
+  stock, reseñas) y la generación con touch_catalog() sin IDs (cambios de
+  categoría, importaciones). No se borra nada: las entradas viejas quedan
+  inalcanzables y expiran solas.
+- Protección contra estampidas: solo el worker que obtiene el lock
+  (cache.add) consulta la base de datos; el resto espera a que aparezca el
+  valor. Además cada entrada se refresca antes de expirar con probabilidad
+  creciente (XFetch), así un producto muy visitado nunca llega frío al TTL:
+  mientras un worker lo recalcula, los demás siguen sirviendo el valor actual.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+DETAIL_TIMEOUT = 60 * 15
+NOT_FOUND_TIMEOUT = 30
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+GENERATION_KEY = 'products:detail:generation'
+
+
+def _version_key(product_id):
+    return f'products:detail:version:{product_id}'
+
+
+def detail_cache_key(product_id):
+    """Clave vigente del detalle; cambia al invalidar el producto o todo el catálogo."""
+    versions = cache.get_many([GENERATION_KEY, _version_key(product_id)])
+    return (
+        f'products:detail:{product_id}'
+        f':g{versions.get(GENERATION_KEY, 0)}:v{versions.get(_version_key(product_id), 0)}'
+    )
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_product_details(product_ids=None):
+    """Invalida el detalle de los productos indicados (None = todos)."""
+    if product_ids is None:
+        _incr(GENERATION_KEY)
+        return
+    for product_id in set(product_ids):
+        _incr(_version_key(product_id))
+
+
+def _should_refresh_early(entry, now):
+    """
+    XFetch: adelanta el refresco con probabilidad que crece al acercarse la
+    expiración, proporcional a lo que costó calcular el valor (delta).
+    """
+    return now - entry['delta'] * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= entry['expires_at']
+
+
+def _store(key, loader):
+    started = time.monotonic()
+    data = loader()
+    delta = time.monotonic() - started
+    timeout = DETAIL_TIMEOUT if data is not None else NOT_FOUND_TIMEOUT
+    cache.set(key, {'data': data, 'delta': delta, 'expires_at': time.time() + timeout}, timeout=timeout)
+    return data
+
+
+def get_product_detail(product_id, loader):
+    """
+    Detalle serializado del producto, o None si no existe.
+
+    Args:
+        loader: función sin argumentos que lo calcula desde la base de datos
+            (devuelve None si el producto no existe o no está visible)
+    """
+    key = detail_cache_key(product_id)
+    lock_key = f'{key}:lock'
+
+    entry = cache.get(key)
+    if entry is not None:
+        if not _should_refresh_early(entry, time.time()) or not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            return entry['data']
+        try:
+            return _store(key, loader)
+        finally:
+            cache.delete(lock_key)
+
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            return _store(key, loader)
+        finally:
+            cache.delete(lock_key)
+
+    # Otro worker lo está calculando: esperar su resultado
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['data']
+
+    # El worker con el lock tardó demasiado (o murió): calcular sin guardar
+    return loader()
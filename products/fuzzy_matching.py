@@ -0,0 +1,76 @@
+"""
+Primitivas de coincidencia aproximada para nombres de productos.
+
+Las usa el snapshot del catálogo (catalog_snapshot) para tolerar errores de
+tipeo ("laptoop"), acentos omitidos ("audifonos") y palabras parciales:
+
+- trigrams(): n-gramas de una palabra con marcas de borde ("$la", "lap", ...,
+  "op$"). Un índice trigrama -> palabras permite encontrar candidatas sin
+  recorrer todo el vocabulario: con d ediciones una palabra pierde como
+  máximo 3·d trigramas.
+- levenshtein(): distancia de edición acotada; corta en cuanto supera el
+  máximo permitido.
+- word_similarity(): puntaje 0..1 entre una palabra de la consulta y una del
+  catálogo (exacta > mismo singular > prefijo > contenida > con errores).
+"""
+from .text_normalization import stem
+
+NGRAM_SIZE = 3
+
+
+def trigrams(word):
+    padded = f'${word}$'
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def max_edits(word):
+    """Errores tolerados según el largo: ninguno en palabras cortas, hasta 2 en las largas."""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 7:
+        return 1
+    return 2
+
+
+def levenshtein(a, b, max_distance):
+    """
+    Distancia de edición entre a y b, o max_distance + 1 si la supera
+    (se detiene en cuanto ninguna celda de la fila puede quedar por debajo).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def word_similarity(query_word, word):
+    """Similitud 0..1 entre una palabra de la consulta y una del catálogo (ya normalizadas)."""
+    if query_word == word:
+        return 1.0
+    if stem(query_word) == stem(word):
+        return 0.95
+    if len(query_word) >= 3 and word.startswith(query_word):
+        return 0.6 + 0.3 * len(query_word) / len(word)
+    if len(query_word) >= 3 and query_word in word:
+        return 0.5 + 0.3 * len(query_word) / len(word)
+
+    allowed = max_edits(query_word)
+    if allowed:
+        distance = levenshtein(query_word, word, allowed)
+        if distance <= allowed:
+            return 0.9 - 0.4 * distance / max(len(query_word), len(word))
+    return 0.0
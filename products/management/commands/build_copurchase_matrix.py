@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.copurchase_service import rebuild_copurchase_matrix
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la matriz de co-compra (ProductCoPurchase) desde las órdenes vendidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas leídas/escritas por lote')
+
+    def handle(self, *args, **options):
+        result = rebuild_copurchase_matrix(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Matriz reconstruida: {result['orders']} órdenes, "
+            f"{result['products']} productos, {result['pairs']} parejas"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from products.catalog_io import FORMATS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo de productos a CSV o JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Formato de salida')
+        parser.add_argument('--output', help='Archivo de salida (por defecto, stdout)')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            for line in export_rows(options['format']):
+                self.stdout.write(line, ending='')
+            return
+
+        count = -1 if options['format'] == 'csv' else 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in export_rows(options['format']):
+                output.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ {count} productos exportados a {options['output']}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.catalog_io import DEFAULT_CHUNK_SIZE, FORMATS, ImportFormatError, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Importa productos desde un archivo CSV o JSONL (upsert por sku, o por name si no hay sku)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo .csv o .jsonl')
+        parser.add_argument('--format', choices=FORMATS, help='Formato del archivo (por defecto, según la extensión)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Filas por lote')
+        parser.add_argument('--dry-run', action='store_true', help='Valida el archivo sin guardar cambios')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_products(
+                    stream, fmt=fmt, chunk_size=options['chunk_size'], dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"⚠️  Fila {error['row']}: {error['error']}"))
+
+        suffix = ' (simulación, sin guardar)' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['processed']} filas: {report['created']} creados, "
+            f"{report['updated']} actualizados, {report['error_count']} errores{suffix}"
+        ))
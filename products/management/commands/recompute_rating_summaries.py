@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from products.rating_service import recompute_rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes de calificaciones (ProductRatingSummary) desde las reseñas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='product_ids', help='Solo este producto (repetible)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Resúmenes escritos por lote')
+
+    def handle(self, *args, **options):
+        written = recompute_rating_summaries(
+            product_ids=options['product_ids'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Resúmenes recalculados: {written}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from products.recommendation_engine import DEFAULT_NEIGHBOURS, train_recommendation_model
+
+
+class Command(BaseCommand):
+    help = 'Entrena y guarda el modelo de recomendaciones personalizadas (similitud item-item)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=DEFAULT_NEIGHBOURS, help='Vecinos guardados por producto')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Iniciando el entrenamiento del modelo de recomendaciones...'))
+
+        result = train_recommendation_model(neighbours=options['neighbours'])
+
+        if "error" in result:
+            self.stdout.write(self.style.ERROR(result["error"]))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'¡Éxito! {result["status"]}'))
+            self.stdout.write(f'  - Guardado en: {result["path"]}')
+            self.stdout.write(f'  - Usuarios: {result["n_users"]}, productos: {result["n_products"]}')
+            self.stdout.write(f'  - Interacciones usadas: {result["n_interactions"]}')
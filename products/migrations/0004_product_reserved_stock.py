@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_stock',
+            field=models.PositiveIntegerField(default=0, help_text='Unidades apartadas por órdenes pendientes de pago', verbose_name='Stock reservado'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Índices de búsqueda de texto (ver products/search_service.py). Solo aplican
+# en Postgres; en otros motores la búsqueda se hace en memoria.
+
+from django.db import migrations
+
+CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() no es IMMUTABLE y no se puede usar en un índice: envoltorio
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+    $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS products_product_search_idx ON products_product USING gin ((
+        setweight(to_tsvector('spanish', f_unaccent(coalesce(name, ''))), 'A') ||
+        setweight(to_tsvector('spanish', f_unaccent(coalesce(description, ''))), 'B')
+    ))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS products_product_name_trgm_idx ON products_product
+    USING gin ((f_unaccent(lower(name))) gin_trgm_ops)
+    """,
+]
+
+DROP_SQL = [
+    "DROP INDEX IF EXISTS products_product_name_trgm_idx",
+    "DROP INDEX IF EXISTS products_product_search_idx",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def _run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_products_pr_is_acti_f516cc_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_productcopurchase_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Código único del producto; clave de la importación masiva', max_length=64, null=True, unique=True, verbose_name='SKU'),
+        ),
+    ]
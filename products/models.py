@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -16,10 +17,23 @@ class Category(models.Model):
 
 
 class Product(models.Model):
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='SKU',
+        help_text='Código único del producto; clave de la importación masiva'
+    )
     name = models.CharField(max_length=255, verbose_name='Nombre del Producto')
     description = models.TextField(verbose_name='Descripción')
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Precio')
     stock = models.PositiveIntegerField(default=0, verbose_name='Stock')
+    reserved_stock = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Stock reservado',
+        help_text='Unidades apartadas por órdenes pendientes de pago'
+    )
     category = models.ForeignKey(Category, related_name='products', on_delete=models.SET_NULL, null=True, verbose_name='Categoría')
     image_url = models.URLField(max_length=500, blank=True, null=True, verbose_name='URL de Imagen')
     warranty_info = models.CharField(max_length=255, blank=True, verbose_name='Información de Garantía')
@@ -31,22 +45,39 @@ class Product(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['-created_at']
+        indexes = [
+            # Catálogo público: ?category= con rango/orden de precio, y orden por defecto
+            models.Index(fields=['is_active', 'category', 'price']),
+            models.Index(fields=['is_active', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return self.name
     
+    @property
+    def available_stock(self):
+        """Stock que todavía se puede vender (descontando reservas activas)."""
+        return max(self.stock - self.reserved_stock, 0)
+    
+    @property
+    def rating_summary_or_none(self):
+        """ProductRatingSummary del producto, o None si aún no tiene reseñas."""
+        try:
+            return self.rating_summary
+        except ObjectDoesNotExist:
+            return None
+
     @property
     def average_rating(self):
-        """Calcula el promedio de calificaciones del producto."""
-        reviews = self.reviews.all()
-        if not reviews:
-            return 0
-        return round(sum(r.rating for r in reviews) / len(reviews), 1)
+        """Promedio de calificaciones del producto (leído del resumen materializado)."""
+        summary = self.rating_summary_or_none
+        return summary.average_rating if summary else 0
     
     @property
     def review_count(self):
-        """Retorna el número total de reseñas."""
-        return self.reviews.count()
+        """Retorna el número total de reseñas (leído del resumen materializado)."""
+        summary = self.rating_summary_or_none
+        return summary.review_count if summary else 0
 
 
 class Review(models.Model):
@@ -82,3 +113,10 @@ class Review(models.Model):
     def __str__(self):
         return f'{self.user.username} - {self.product.name} ({self.rating}★)'
 
+
+
+# Importar modelo de resumen de calificaciones
+from .rating_models import ProductRatingSummary
+
+# Importar matriz de co-compra (recomendaciones)
+from .recommendation_models import ProductCoPurchase
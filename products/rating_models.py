@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class ProductRatingSummary(models.Model):
+    """
+    Resumen materializado de las reseñas de un producto.
+
+    Se actualiza de forma incremental (F()) cada vez que se crea, edita o
+    borra una reseña (ver products.rating_service), así que leer el promedio
+    o el histograma es O(1) sin recorrer Review. Si se desincroniza, se
+    reconstruye con `python manage.py recompute_rating_summaries`.
+    """
+    product = models.OneToOneField(
+        'products.Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary',
+        verbose_name='Producto'
+    )
+    review_count = models.PositiveIntegerField(default=0, verbose_name='Número de reseñas')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones')
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumen de Calificaciones'
+        verbose_name_plural = 'Resúmenes de Calificaciones'
+
+    def __str__(self):
+        return f'{self.product_id}: {self.average_rating}★ ({self.review_count})'
+
+    @property
+    def average_rating(self):
+        """Promedio redondeado a 1 decimal (0 si no hay reseñas)."""
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def histogram(self):
+        """{estrellas: cantidad} para 1..5"""
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
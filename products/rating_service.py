@@ -0,0 +1,89 @@
+"""
+Mantenimiento de ProductRatingSummary.
+
+- apply_rating_change(): delta incremental con un UPDATE atómico (F()) al
+  crear, editar o borrar una reseña.
+- recompute_rating_summaries(): reconstrucción en bloque desde Review (un
+  GROUP BY y upserts por lotes), para el comando recompute_rating_summaries.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Now
+
+from .catalog_service import touch_catalog
+from .models import Review
+from .rating_models import ProductRatingSummary
+
+STARS = range(1, 6)
+SUMMARY_FIELDS = ['review_count', 'rating_sum'] + [f'stars_{stars}' for stars in STARS]
+
+
+def apply_rating_change(product_id, old_rating=None, new_rating=None):
+    """
+    Aplica al resumen del producto el cambio de una reseña:
+    - creación: old_rating=None, new_rating=N
+    - edición: old_rating=M, new_rating=N
+    - borrado: old_rating=M, new_rating=None
+    """
+    if old_rating == new_rating:
+        return
+
+    updates = {
+        'review_count': F('review_count') + ((new_rating is not None) - (old_rating is not None)),
+        'rating_sum': F('rating_sum') + ((new_rating or 0) - (old_rating or 0)),
+        'updated_at': Now(),
+    }
+    if old_rating is not None:
+        updates[f'stars_{old_rating}'] = F(f'stars_{old_rating}') - 1
+    if new_rating is not None:
+        updates[f'stars_{new_rating}'] = F(f'stars_{new_rating}') + 1
+
+    ProductRatingSummary.objects.get_or_create(product_id=product_id)
+    ProductRatingSummary.objects.filter(product_id=product_id).update(**updates)
+    # El promedio y el conteo se muestran en el catálogo
+    transaction.on_commit(lambda: touch_catalog([product_id]))
+
+
+def recompute_rating_summaries(product_ids=None, batch_size=1000):
+    """
+    Reconstruye los resúmenes desde Review. Borra los de productos que ya no
+    tienen reseñas.
+
+    Returns:
+        int: resúmenes escritos
+    """
+    reviews = Review.objects.all()
+    summaries = ProductRatingSummary.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+        summaries = summaries.filter(product_id__in=product_ids)
+
+    rows = reviews.order_by().values('product_id').annotate(
+        review_count=Count('id'),
+        rating_sum=Sum('rating'),
+        **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS}
+    )
+
+    written = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(ProductRatingSummary(**row))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+
+    summaries.exclude(product_id__in=reviews.values('product_id')).delete()
+    transaction.on_commit(lambda: touch_catalog(product_ids))
+    return written
+
+
+def _upsert(summaries):
+    ProductRatingSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=SUMMARY_FIELDS + ['updated_at'],
+    )
+    return len(summaries)
@@ -0,0 +1,284 @@
+"""
+Motor de recomendaciones personalizadas (filtrado colaborativo item-item).
+
+Entrenamiento (offline, `python manage.py train_recommendation_model`):
+1. Matriz dispersa usuarios x productos con las compras de órdenes vendidas
+   (peso = log(1 + unidades)).
+2. Similitud coseno entre productos: columnas normalizadas y S = R^T R,
+   conservando los top-K vecinos de cada producto.
+3. Se guarda con joblib (igual que predictions/services.py) junto con la
+   popularidad de cada producto para el fallback.
+
+En cada request el puntaje de todos los productos para un usuario es un único
+producto matriz-vector S @ u, donde u son las compras del usuario leídas en
+vivo (compras posteriores al entrenamiento también cuentan).
+
+Cache:
+- Por usuario y limit (personalized_cache_key), con una versión por usuario
+  que shop_orders.signals incrementa cuando una orden suya pasa a PAID o
+  DELIVERED (invalidate_user_recommendations).
+- Una lista global de los más vendidos (get_popular_product_ids) que se
+  recalcula cada POPULAR_PRODUCTS_TIMEOUT y comparten todos los usuarios sin
+  historial.
+"""
+import os
+import threading
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+from scipy import sparse
+
+DEFAULT_NEIGHBOURS = 50
+
+POPULAR_PRODUCTS_KEY = 'products:popular'
+POPULAR_PRODUCTS_SIZE = 100
+POPULAR_PRODUCTS_TIMEOUT = 60 * 15
+
+
+def model_path():
+    return settings.RECOMMENDATION_MODEL_PATH
+
+
+def _sold_items():
+    from shop_orders.models import Order, OrderItem
+
+    return OrderItem.objects.filter(
+        order__status__in=[Order.OrderStatus.PAID, Order.OrderStatus.SHIPPED, Order.OrderStatus.DELIVERED],
+        product__isnull=False,
+    )
+
+
+def _keep_top_k(matrix, k):
+    """Conserva los k valores más altos de cada fila de una matriz CSR."""
+    matrix = matrix.tocsr()
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if end - start > k:
+            values = matrix.data[start:end]
+            cutoff = np.partition(values, -k)[-k]
+            values[values < cutoff] = 0
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def train_recommendation_model(neighbours=DEFAULT_NEIGHBOURS, min_interactions=2):
+    """
+    Entrena la similitud item-item y la guarda en RECOMMENDATION_MODEL_PATH.
+    Devuelve un dict con el resultado o un error.
+    """
+    from .models import Product
+
+    rows = np.array(
+        list(
+            _sold_items().order_by().values('order__user_id', 'product_id').annotate(
+                units=Sum('quantity')
+            ).values_list('order__user_id', 'product_id', 'units').iterator(chunk_size=5000)
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+    if len(rows) < min_interactions:
+        return {"error": f"Se requieren al menos {min_interactions} compras para entrenar. Datos disponibles: {len(rows)}"}
+
+    user_ids, user_index = np.unique(rows[:, 0], return_inverse=True)
+    product_ids, product_index = np.unique(rows[:, 1], return_inverse=True)
+
+    # 1. Interacciones usuario x producto
+    interactions = sparse.csr_matrix(
+        (np.log1p(rows[:, 2]).astype(np.float32), (user_index, product_index)),
+        shape=(len(user_ids), len(product_ids)),
+    )
+
+    # 2. Similitud coseno entre columnas (productos)
+    norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0))).ravel()
+    normalized = interactions @ sparse.diags(1.0 / np.maximum(norms, 1e-9))
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    similarity = _keep_top_k(similarity, neighbours).astype(np.float32)
+
+    # 3. Popularidad (unidades vendidas) para usuarios sin historial
+    units = np.bincount(product_index, weights=rows[:, 2], minlength=len(product_ids))
+    categories = dict(Product.objects.filter(id__in=product_ids.tolist()).values_list('id', 'category_id'))
+
+    model = {
+        'product_ids': product_ids,
+        'similarity': similarity,
+        'popularity_order': np.argsort(-units, kind='stable'),
+        'product_categories': np.array([categories.get(int(pid)) or 0 for pid in product_ids], dtype=np.int64),
+        'trained_at': timezone.now().isoformat(),
+    }
+
+    path = model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+    _loaded.clear()
+
+    return {
+        "status": "Modelo de recomendaciones entrenado y guardado exitosamente.",
+        "path": path,
+        "n_users": len(user_ids),
+        "n_products": len(product_ids),
+        "n_interactions": len(rows),
+    }
+
+
+# =============================================================================
+# CARGA DEL MODELO Y SCORING
+# =============================================================================
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load_model():
+    """
+    Modelo entrenado, o None si no existe. Se mantiene en memoria y se
+    recarga solo cuando el archivo cambia (nuevo entrenamiento).
+    """
+    path = model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _load_lock:
+        model = joblib.load(path)
+        model['index'] = {int(pid): i for i, pid in enumerate(model['product_ids'])}
+        _loaded[path] = (mtime, model)
+    return model
+
+
+def _user_history(user):
+    """
+    (pesos {product_id: log(1 + unidades)} de compras vendidas,
+     IDs de todos los productos que el usuario ya pidió)
+    """
+    from shop_orders.models import Order, OrderItem
+
+    sold = {Order.OrderStatus.PAID, Order.OrderStatus.SHIPPED, Order.OrderStatus.DELIVERED}
+    units, ordered = {}, set()
+    items = OrderItem.objects.filter(order__user=user, product__isnull=False).values_list(
+        'product_id', 'quantity', 'order__status'
+    )
+    for product_id, quantity, order_status in items:
+        ordered.add(product_id)
+        if order_status in sold:
+            units[product_id] = units.get(product_id, 0) + quantity
+    return {product_id: float(np.log1p(total)) for product_id, total in units.items()}, ordered
+
+
+def recommend_for_user(user, limit=10):
+    """
+    Recomendaciones para el usuario. Sin modelo entrenado o sin compras
+    pagadas se usan los más vendidos (lista global compartida).
+
+    Returns:
+        dict: {
+            'product_ids': [...] ordenados por puntaje (con candidatos de más),
+            'strategy': 'personalized_ai' | 'popular_products',
+            'favorite_category_ids': [...] (top 3 por compras),
+        }
+    """
+    weights, ordered = _user_history(user)
+    model = load_model()
+    if model is None or not weights:
+        return {
+            'product_ids': [pid for pid in get_popular_product_ids() if pid not in ordered][:limit * 3],
+            'strategy': 'popular_products',
+            'favorite_category_ids': [],
+        }
+
+    index = model['index']
+
+    user_vector = np.zeros(len(model['product_ids']), dtype=np.float32)
+    for product_id, weight in weights.items():
+        if product_id in index:
+            user_vector[index[product_id]] = weight
+
+    # Un solo producto matriz-vector puntúa todos los productos
+    scores = model['similarity'] @ user_vector
+    excluded = [index[product_id] for product_id in ordered if product_id in index]
+    scores[excluded] = 0
+
+    # Candidatos de más: algunos pueden estar inactivos (se filtran al cargarlos)
+    candidates = limit * 3
+    top = np.argpartition(-scores, min(candidates, len(scores) - 1))[:candidates]
+    top = top[scores[top] > 0]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    ranked = [int(model['product_ids'][i]) for i in top]
+    strategy = 'personalized_ai' if ranked else 'popular_products'
+
+    # Completar con los más vendidos que el usuario no pidió
+    seen = set(ranked) | ordered
+    for i in model['popularity_order']:
+        if len(ranked) >= candidates:
+            break
+        product_id = int(model['product_ids'][i])
+        if product_id not in seen:
+            ranked.append(product_id)
+            seen.add(product_id)
+
+    category_weights = {}
+    for product_id, weight in weights.items():
+        if product_id in index:
+            category_id = int(model['product_categories'][index[product_id]])
+            if category_id:
+                category_weights[category_id] = category_weights.get(category_id, 0) + weight
+
+    return {
+        'product_ids': ranked,
+        'strategy': strategy,
+        'favorite_category_ids': sorted(category_weights, key=category_weights.get, reverse=True)[:3],
+    }
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+
+def get_popular_product_ids():
+    """
+    IDs de los productos activos más vendidos, calculados una vez por
+    intervalo y compartidos por todos los usuarios sin historial.
+    """
+    from .models import Product
+
+    product_ids = cache.get(POPULAR_PRODUCTS_KEY)
+    if product_ids is None:
+        product_ids = list(
+            Product.objects.filter(is_active=True).annotate(
+                times_sold=Count('order_items')
+            ).order_by('-times_sold', '-created_at').values_list('id', flat=True)[:POPULAR_PRODUCTS_SIZE]
+        )
+        cache.set(POPULAR_PRODUCTS_KEY, product_ids, timeout=POPULAR_PRODUCTS_TIMEOUT)
+    return product_ids
+
+
+def _user_version_key(user_id):
+    return f'products:personalized:version:{user_id}'
+
+
+def personalized_cache_key(user_id, limit):
+    """Clave de las recomendaciones de un usuario; cambia al invalidarlas."""
+    version = cache.get(_user_version_key(user_id), 0)
+    return f'products:personalized:{user_id}:v{version}:{limit}'
+
+
+def invalidate_user_recommendations(user_ids):
+    """Descarta las recomendaciones cacheadas (todos los limit) de los usuarios."""
+    for user_id in user_ids:
+        key = _user_version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class ProductCoPurchase(models.Model):
+    """
+    Matriz de co-compra: cuántas órdenes vendidas contienen a la vez product y
+    related_product. Se guarda en ambos sentidos (a->b y b->a) para que las
+    recomendaciones de un producto sean un único SELECT sobre el índice
+    (product, -count). Guarda el conteo completo de todas las parejas: los
+    top-K vecinos se eligen al leer.
+
+    La reconstruye `python manage.py build_copurchase_matrix` y se actualiza de
+    forma incremental cuando una orden pasa a pagada o se cancela
+    (ver products.copurchase_service).
+    """
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='co_purchases',
+        verbose_name='Producto'
+    )
+    related_product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Comprado junto con'
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='Órdenes en común')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Co-compra'
+        verbose_name_plural = 'Co-compras'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related_product'], name='unique_copurchase_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-count']),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} + {self.related_product_id}: {self.count}'
@@ -0,0 +1,100 @@
+"""
+Búsqueda de productos por texto.
+
+Las búsquedas por texto contra la base de datos (?search= del catálogo,
+products.catalog_service) pasan por search_product_ids(), que reemplaza las
+cadenas de name__icontains / description__icontains (LIKE '%x%' sin índice).
+El carrito por lenguaje natural y el autocompletado resuelven en memoria
+(catalog_snapshot, suggestion_index).
+
+En Postgres usa los índices de la migración 0007 de products:
+- Full-text en español (stemming: "laptops" -> "laptop") sobre nombre (peso A)
+  y descripción (peso B), sin acentos vía f_unaccent(). Ordena con ts_rank.
+- Trigramas (pg_trgm) sobre el nombre sin acentos, que resuelven con índice
+  las coincidencias parciales ("smar" -> "Smartphone").
+
+En otros motores (SQLite en tests/desarrollo) se usa una versión en memoria
+con las mismas reglas: sin acentos, plurales simples y nombre antes que
+descripción.
+"""
+from django.db import connection
+
+from .models import Product
+from .text_normalization import WORD_RE, normalize, stem
+
+SEARCH_DOCUMENT_SQL = (
+    "setweight(to_tsvector('spanish', f_unaccent(coalesce(name, ''))), 'A') || "
+    "setweight(to_tsvector('spanish', f_unaccent(coalesce(description, ''))), 'B')"
+)
+SEARCH_NAME_SQL = "f_unaccent(lower(name))"
+
+
+def search_product_ids(query, limit=10, category_id=None):
+    """
+    IDs de los productos activos que coinciden con query, del más al menos
+    relevante.
+
+    Coincide si el nombre contiene el texto completo o si alguna palabra
+    aparece en el nombre o la descripción; rankea primero las coincidencias
+    en el nombre.
+    """
+    normalized = normalize(query or '')
+    words = WORD_RE.findall(normalized)
+    if not words:
+        return []
+
+    if connection.vendor == 'postgresql':
+        return _search_postgres(normalized, words, limit, category_id)
+    return _search_in_memory(normalized, words, limit, category_id)
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search_postgres(normalized, words, limit, category_id):
+    # Palabras unidas con OR: el ranking premia a los que coinciden con más
+    params = {
+        'tsquery': ' | '.join(words),
+        'like': f'%{_escape_like(normalized)}%',
+        'limit': limit,
+        'category_id': category_id,
+    }
+    category_filter = 'AND category_id = %(category_id)s' if category_id else ''
+    sql = f"""
+        SELECT id FROM {Product._meta.db_table}
+        WHERE is_active {category_filter}
+          AND ({SEARCH_DOCUMENT_SQL} @@ to_tsquery('spanish', %(tsquery)s)
+               OR {SEARCH_NAME_SQL} LIKE %(like)s)
+        ORDER BY ({SEARCH_NAME_SQL} LIKE %(like)s) DESC,
+                 ts_rank({SEARCH_DOCUMENT_SQL}, to_tsquery('spanish', %(tsquery)s)) DESC,
+                 id
+        LIMIT %(limit)s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_in_memory(normalized, words, limit, category_id):
+    stems = {stem(word) for word in words}
+    products = Product.objects.filter(is_active=True)
+    if category_id:
+        products = products.filter(category_id=category_id)
+
+    scored = []
+    for product_id, name, description in products.values_list('id', 'name', 'description'):
+        name = normalize(name)
+        name_stems = {stem(word) for word in WORD_RE.findall(name)}
+        description_stems = {stem(word) for word in WORD_RE.findall(normalize(description or ''))}
+
+        name_hits = len(stems & name_stems)
+        description_hits = len(stems & description_stems)
+        contains = normalized in name
+        if not (contains or name_hits or description_hits):
+            continue
+        # Mismo orden que en Postgres: contiene el texto, luego peso A (nombre) > B (descripción)
+        scored.append((-contains, -(2 * name_hits + description_hits), product_id))
+
+    scored.sort()
+    return [product_id for _, _, product_id in scored[:limit]]
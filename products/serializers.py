@@ -38,18 +38,20 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'stock',
+            'id', 'sku', 'name', 'description', 'price', 'stock',
             'category', 'category_name', 'category_details', 'image_url',
             'warranty_info', 'is_active', 'average_rating', 'review_count'
         ]
     
     @extend_schema_field(serializers.FloatField)
     def get_average_rating(self, obj) -> float:
-        """Calcula el promedio de calificaciones."""
+        """
+        Promedio de calificaciones, leído de ProductRatingSummary. Los
+        querysets de products.views lo traen con select_related('rating_summary').
+        """
         return obj.average_rating
     
     @extend_schema_field(serializers.IntegerField)
     def get_review_count(self, obj) -> int:
-        """Retorna el número de reseñas."""
+        """Retorna el número de reseñas (de ProductRatingSummary)."""
         return obj.review_count
-
@@ -0,0 +1,32 @@
+"""
+Signals que mantienen la versión del catálogo (ver catalog_service): cualquier
+cambio en productos o categorías invalida ETags y respuestas cacheadas, y
+cualquier cambio en reseñas invalida el detalle cacheado del producto.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog_service import touch_catalog
+from .detail_cache import invalidate_product_details
+from .models import Category, Product, Review
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """Renueva la versión del catálogo cuando la transacción confirma el cambio."""
+    product_id = instance.pk
+    transaction.on_commit(lambda: touch_catalog([product_id]))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache_on_category_change(sender, instance, **kwargs):
+    """El nombre de la categoría aparece en todos sus productos: invalidar todo."""
+    transaction.on_commit(touch_catalog)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_product_detail_on_review_change(sender, instance, **kwargs):
+    """Reseñas creadas o editadas fuera de la API (admin, shell) también cambian el detalle."""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_product_details([product_id]))
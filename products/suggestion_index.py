@@ -0,0 +1,247 @@
+"""
+Índice en memoria para el autocompletado (/api/orders/cart/suggestions/?q=).
+
+Cada worker de gunicorn mantiene un índice de prefijos de los productos
+activos: para cada palabra del nombre (en minúsculas y sin acentos) se
+registran sus prefijos ("gal", "gala", "galax"...), y cada prefijo apunta a
+la lista de productos ya ordenada por popularidad (unidades vendidas). Una
+sugerencia es un lookup en un dict y un recorrido de los primeros elementos de
+esa lista, sin consultar la base de datos.
+
+Sincronización entre workers: cada cambio de catálogo (catalog_service.
+touch_catalog) incrementa una versión en el cache compartido y guarda bajo esa
+versión los IDs que cambiaron. Un worker con una versión atrasada recarga solo
+esos productos, popularidad incluida (las órdenes que entran o salen de los
+estados vendidos publican sus productos, ver shop_orders.signals); si le
+faltan versiones (expiraron o son demasiadas) reconstruye el índice completo.
+"""
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from .models import Product
+from .text_normalization import WORD_RE, normalize
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'products:suggestions:version'
+CHANGES_KEY_PREFIX = 'products:suggestions:changes:'
+CHANGES_TIMEOUT = 60 * 60 * 24
+REBUILD = '*'
+MAX_INCREMENTAL_VERSIONS = 500
+MAX_PREFIX_LENGTH = 12
+
+
+class SuggestionIndex:
+    """Índice de prefijos de un worker. Usar get_suggestion_index()."""
+
+    def __init__(self, version):
+        self.version = version
+        self.entries = {}
+        self.prefixes = defaultdict(list)
+
+    def add(self, product_id, name, price, stock, category, popularity):
+        tokens = tuple(WORD_RE.findall(normalize(name)))
+        entry = {
+            'suggestion': {
+                'id': product_id,
+                'name': name,
+                'price': str(price),
+                'stock': stock,
+                'category': category,
+            },
+            'tokens': tokens,
+            'popularity': popularity,
+            # Más vendidos primero; a igual popularidad, orden alfabético
+            'rank': (-popularity, normalize(name), product_id),
+        }
+        self.entries[product_id] = entry
+        for prefix in _prefixes(tokens):
+            bisect.insort(self.prefixes[prefix], entry['rank'])
+
+    def remove(self, product_id):
+        entry = self.entries.pop(product_id, None)
+        if entry is None:
+            return None
+        for prefix in _prefixes(entry['tokens']):
+            ranks = self.prefixes[prefix]
+            position = bisect.bisect_left(ranks, entry['rank'])
+            if position < len(ranks) and ranks[position] == entry['rank']:
+                del ranks[position]
+            if not ranks:
+                del self.prefixes[prefix]
+        return entry
+
+    def refresh(self, product_ids):
+        """Recarga desde la base de datos solo los productos indicados (y sus ventas)."""
+        for product_id in product_ids:
+            self.remove(product_id)
+        for row in _load_products(product_ids):
+            self.add(*row)
+
+    def search(self, query, limit=5):
+        """
+        Productos cuyo nombre tiene una palabra que empieza por cada palabra
+        de query ("smart gal" -> "Smartphone Galaxy"), por popularidad.
+        """
+        words = WORD_RE.findall(normalize(query or ''))
+        if not words:
+            return []
+
+        candidates = [self.prefixes.get(word[:MAX_PREFIX_LENGTH], []) for word in words]
+        # Recorrer la lista más corta y verificar el resto de palabras en el producto
+        driver = min(candidates, key=len)
+        results = []
+        for _, _, product_id in driver:
+            entry = self.entries.get(product_id)
+            if entry and all(
+                any(token.startswith(word) for token in entry['tokens']) for word in words
+            ):
+                results.append(entry['suggestion'])
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def _prefixes(tokens):
+    return {
+        token[:length]
+        for token in tokens
+        for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1)
+    }
+
+
+def _load_products(product_ids=None):
+    """
+    Filas (id, nombre, precio, stock, categoría, popularidad) de los productos
+    activos; popularidad = unidades vendidas en órdenes pagadas.
+    """
+    from shop_orders.models import Order, OrderItem
+
+    products = Product.objects.filter(is_active=True)
+    sales = OrderItem.objects.filter(
+        order__status__in=[Order.OrderStatus.PAID, Order.OrderStatus.SHIPPED, Order.OrderStatus.DELIVERED],
+        product__isnull=False,
+    )
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+        sales = sales.filter(product_id__in=product_ids)
+
+    popularity = dict(
+        sales.order_by().values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units')
+    )
+
+    for product_id, name, price, stock, category in products.values_list(
+        'id', 'name', 'price', 'stock', 'category__name'
+    ).iterator(chunk_size=2000):
+        yield product_id, name, price, stock, category, popularity.get(product_id, 0)
+
+
+def build_suggestion_index(version):
+    index = SuggestionIndex(version)
+    for row in _load_products():
+        index.add(*row)
+    return index
+
+
+# =============================================================================
+# ÍNDICE DEL WORKER Y VERSIONES COMPARTIDAS
+# =============================================================================
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def current_version():
+    """Versión compartida de los cambios de catálogo (la comparten los índices en memoria)."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def record_product_changes(product_ids=None):
+    """
+    Publica un cambio de catálogo para todos los workers.
+
+    Args:
+        product_ids: IDs que cambiaron, o None para forzar la reconstrucción
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.incr(VERSION_KEY)
+    changes = REBUILD if product_ids is None else [int(product_id) for product_id in product_ids]
+    cache.set(f'{CHANGES_KEY_PREFIX}{version}', changes, timeout=CHANGES_TIMEOUT)
+
+
+def changed_product_ids(since, until):
+    """
+    IDs publicados entre las versiones (since, until], o None si hay que
+    reconstruir (versiones expiradas, demasiadas o un cambio global).
+    """
+    if until - since > MAX_INCREMENTAL_VERSIONS:
+        return None
+    keys = [f'{CHANGES_KEY_PREFIX}{v}' for v in range(since + 1, until + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys) or REBUILD in changes.values():
+        return None
+    return {product_id for ids in changes.values() for product_id in ids}
+
+
+def _apply_changes(index, version):
+    """Aplica al índice los cambios publicados desde index.version. False si hay que reconstruir."""
+    product_ids = changed_product_ids(index.version, version)
+    if product_ids is None:
+        return False
+    if product_ids:
+        index.refresh(product_ids)
+    index.version = version
+    return True
+
+
+def get_suggestion_index():
+    """Índice del worker, puesto al día con la versión del cache compartido."""
+    global _index
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or index.version > version or not _apply_changes(index, version):
+            index = build_suggestion_index(version)
+            _index = index
+    return index
+
+
+def get_suggestions(query, limit=5):
+    return get_suggestion_index().search(query, limit=limit)
+
+
+def reset_suggestion_index():
+    """Descarta el índice del worker (se reconstruye en la próxima consulta)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def warm_suggestion_index():
+    """Construye el índice en segundo plano al arrancar el worker."""
+    def build():
+        try:
+            get_suggestion_index()
+        except Exception as e:
+            logger.warning(f"No se pudo precargar el índice de sugerencias: {e}")
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=build, name='suggestion-index-warmup', daemon=True).start()
@@ -0,0 +1,12 @@
+"""
+Tareas en segundo plano del catálogo.
+"""
+from task_queue.queue import task
+
+
+@task(max_retries=3)
+def update_copurchases(order_ids, sign=1):
+    """Suma (o resta, sign=-1) las órdenes dadas a la matriz de co-compra."""
+    from .copurchase_service import apply_order_copurchases
+
+    return apply_order_copurchases(order_ids, sign=sign)
@@ -0,0 +1,24 @@
+"""
+Normalización de texto compartida por la búsqueda (search_service), el
+snapshot del catálogo (catalog_snapshot), el autocompletado
+(suggestion_index) y la coincidencia aproximada (fuzzy_matching).
+"""
+import re
+import unicodedata
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Minúsculas y sin acentos ('Teléfono' -> 'telefono')."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+def stem(word):
+    """Plurales simples del español: 'laptops' -> 'laptop', 'televisores' -> 'televisor'."""
+    if len(word) > 4 and word.endswith('es'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s'):
+        return word[:-1]
+    return word
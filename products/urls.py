@@ -2,6 +2,7 @@ from django.urls import path
 from rest_framework.routers import SimpleRouter
 from .views import CategoryViewSet, ProductViewSet, ReviewViewSet
 from .populate_images_view import populate_product_images
+from .catalog_io_views import export_products_view, import_products_view
 
 # Usar SimpleRouter que es más limpio
 router = SimpleRouter()
@@ -13,8 +14,11 @@ urlpatterns = [
     path('', ProductViewSet.as_view({'get': 'list', 'post': 'create'}), name='product-list'),
     path('personalized/', ProductViewSet.as_view({'get': 'personalized'}), name='product-personalized'),
     path('populate-images/', populate_product_images, name='populate-images'),  # ADMIN ONLY
+    path('import/', import_products_view, name='product-import'),  # ADMIN ONLY
+    path('export/', export_products_view, name='product-export'),  # ADMIN ONLY
     path('<int:pk>/', ProductViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='product-detail'),
-    path('<int:pk>/reviews/', ProductViewSet.as_view({'get': 'reviews', 'post': 'reviews'}), name='product-reviews'),
+    # **kwargs de la acción: aplica sus permission_classes como lo haría el router
+    path('<int:pk>/reviews/', ProductViewSet.as_view({'get': 'reviews', 'post': 'reviews'}, **ProductViewSet.reviews.kwargs), name='product-reviews'),
     path('<int:pk>/recommendations/', ProductViewSet.as_view({'get': 'recommendations'}), name='product-recommendations'),
 ]
 
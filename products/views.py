@@ -1,9 +1,22 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
 from .models import Category, Product, Review
 from .serializers import CategorySerializer, ProductSerializer, ReviewSerializer
+from .rating_service import apply_rating_change
+from .copurchase_service import get_copurchase_recommendations
+from .recommendation_engine import personalized_cache_key, recommend_for_user
+from .detail_cache import get_product_detail
+from .catalog_service import (
+    CATALOG_RESPONSE_TIMEOUT, apply_catalog_filters, catalog_cache_key,
+    catalog_etag, get_catalog_version, last_modified_header,
+)
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -23,18 +36,98 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
 
 
+class ProductCatalogPagination(PageNumberPagination):
+    """
+    Sin paginación por defecto (lista completa, igual que antes).
+    Con ?page= o ?page_size= devuelve páginas de 24 productos.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    catalog_page_size = 24
+
+    def get_page_size(self, request):
+        page_size = super().get_page_size(request)
+        if page_size is None and self.page_query_param in request.query_params:
+            return self.catalog_page_size
+        return page_size
+
+
 class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = ProductCatalogPagination
+    lookup_value_regex = r'\d+'
     
     def get_queryset(self):
         """
         - Admin: ve todos los productos (activos e inactivos)
         - Usuarios normales: solo ven productos activos
         """
-        if self.request.user and self.request.user.is_staff:
-            return Product.objects.all()
-        return Product.objects.filter(is_active=True)
+        # El resumen de calificaciones viene en el mismo SELECT (sin N+1 en el serializer)
+        queryset = Product.objects.select_related('category', 'rating_summary')
+        if not (self.request.user and self.request.user.is_staff):
+            queryset = queryset.filter(is_active=True)
+        if self.action == 'list':
+            queryset = apply_catalog_filters(queryset, self.request.query_params)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Catálogo: GET /api/products/?search=&category=&min_price=&max_price=&in_stock=&ordering=&page=
+
+        Para clientes (no staff) responde con ETag/Last-Modified derivados de
+        la versión del catálogo (products.catalog_service): si no cambió nada
+        devuelve 304 sin consultar la base de datos. Las respuestas anónimas
+        se sirven desde el cache.
+        """
+        if request.user and request.user.is_staff:
+            return super().list(request, *args, **kwargs)
+
+        version = get_catalog_version()
+        etag = catalog_etag(request, version)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(version))
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        anonymous = not request.user.is_authenticated
+        data = cache.get(catalog_cache_key(etag)) if anonymous else None
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if anonymous:
+                cache.set(catalog_cache_key(etag), response.data, timeout=CATALOG_RESPONSE_TIMEOUT)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified_header(version)
+        response['Cache-Control'] = 'no-cache' if anonymous else 'private, no-cache'
+        return response
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de producto. Para clientes (no staff) se sirve desde el cache
+        de products.detail_cache, que se invalida al cambiar el producto, su
+        categoría o sus reseñas.
+        """
+        if request.user and request.user.is_staff:
+            return super().retrieve(request, *args, **kwargs)
+
+        try:
+            product_id = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            raise NotFound('Producto no encontrado.')
+        data = get_product_detail(product_id, lambda: self._product_detail(product_id))
+        if data is None:
+            raise NotFound('Producto no encontrado.')
+        return Response(data)
+    
+    def _product_detail(self, product_id):
+        product = Product.objects.select_related('category', 'rating_summary').filter(
+            id=product_id, is_active=True
+        ).first()
+        return ProductSerializer(product).data if product else None
     
     @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticatedOrReadOnly])
     def reviews(self, request, pk=None):
@@ -46,12 +139,15 @@ class ProductViewSet(viewsets.ModelViewSet):
         product = self.get_object()
         
         if request.method == 'GET':
-            # Listar todas las reseñas del producto
-            reviews = product.reviews.all()
+            # Listar todas las reseñas del producto; conteo, promedio e
+            # histograma salen del resumen materializado (O(1))
+            reviews = product.reviews.select_related('user')
             serializer = ReviewSerializer(reviews, many=True)
+            summary = product.rating_summary_or_none
             return Response({
-                'count': reviews.count(),
-                'average_rating': product.average_rating,
+                'count': summary.review_count if summary else 0,
+                'average_rating': summary.average_rating if summary else 0,
+                'rating_histogram': summary.histogram if summary else {stars: 0 for stars in range(1, 6)},
                 'reviews': serializer.data
             })
         
@@ -67,7 +163,9 @@ class ProductViewSet(viewsets.ModelViewSet):
             
             serializer = ReviewSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(user=request.user, product=product)
+                with transaction.atomic():
+                    review = serializer.save(user=request.user, product=product)
+                    apply_rating_change(product.id, new_rating=review.rating)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -79,16 +177,9 @@ class ProductViewSet(viewsets.ModelViewSet):
         """
         product = self.get_object()
         
-        # Productos comprados junto con el producto actual
-        # Usa 'order_items' (related_name en OrderItem)
-        recommended = Product.objects.filter(
-            order_items__order__items__product_id=pk,
-            is_active=True
-        ).exclude(
-            id=pk
-        ).annotate(
-            times_bought_together=Count('id')
-        ).order_by('-times_bought_together')[:5]
+        # Productos comprados junto con el producto actual, precalculados en
+        # ProductCoPurchase (un SELECT sobre el índice (product, -count))
+        recommended = get_copurchase_recommendations(product.id, limit=5)
         
         serializer = ProductSerializer(recommended, many=True)
         return Response({
@@ -100,104 +191,49 @@ class ProductViewSet(viewsets.ModelViewSet):
     def personalized(self, request):
         """
         🎯 Recomendaciones personalizadas para el cliente actual.
-        GET /api/products/personalized/
+        GET /api/products/personalized/?limit=10
         
-        Estrategia de IA:
-        1. Analiza historial de compras del cliente
-        2. Encuentra productos similares (misma categoría)
-        3. Productos comprados por usuarios con gustos similares (collaborative filtering)
-        4. Productos populares si no hay historial
-        """
-        from shop_orders.models import OrderItem, Order
-        from django.db.models import Q, F, Sum
+        Estrategia de IA (products.recommendation_engine):
+        1. Filtrado colaborativo item-item: similitud coseno entre productos
+           entrenada offline (`python manage.py train_recommendation_model`)
+        2. Puntaje de todos los productos con un solo producto matriz-vector
+           sobre el historial de compras del cliente
+        3. Productos populares si no hay historial (o no hay modelo entrenado)
         
+        El resultado se cachea por usuario y limit durante CACHE_TTL, y se
+        invalida cuando una orden del usuario pasa a PAID o DELIVERED.
+        """
         user = request.user
-        limit = int(request.GET.get('limit', 10))  # Número de productos a retornar
-        
-        # 1. Obtener categorías favoritas del usuario (basado en historial)
-        user_categories = OrderItem.objects.filter(
-            order__user=user,
-            order__status__in=[Order.OrderStatus.PAID, Order.OrderStatus.DELIVERED]
-        ).values('product__category').annotate(
-            total_spent=Sum(F('quantity') * F('price'))
-        ).order_by('-total_spent')[:3]
-        
-        favorite_category_ids = [cat['product__category'] for cat in user_categories if cat['product__category']]
-        
-        # 2. Productos ya comprados por el usuario (para excluirlos)
-        purchased_product_ids = OrderItem.objects.filter(
-            order__user=user
-        ).values_list('product_id', flat=True).distinct()
-        
-        recommended_products = []
-        
-        # ESTRATEGIA 1: Si tiene historial - Productos de sus categorías favoritas
-        if favorite_category_ids:
-            category_products = Product.objects.filter(
-                category_id__in=favorite_category_ids,
-                is_active=True
-            ).exclude(
-                id__in=purchased_product_ids
-            ).order_by('-created_at')[:limit]
-            
-            recommended_products.extend(category_products)
-        
-        # ESTRATEGIA 2: Collaborative Filtering - Usuarios con gustos similares
-        if len(recommended_products) < limit:
-            # Encontrar usuarios que compraron productos similares
-            similar_users = OrderItem.objects.filter(
-                product_id__in=purchased_product_ids
-            ).exclude(
-                order__user=user
-            ).values('order__user').annotate(
-                similarity=Count('id')
-            ).order_by('-similarity')[:5]
-            
-            similar_user_ids = [u['order__user'] for u in similar_users]
-            
-            if similar_user_ids:
-                collaborative_products = Product.objects.filter(
-                    order_items__order__user_id__in=similar_user_ids,
-                    is_active=True
-                ).exclude(
-                    id__in=purchased_product_ids
-                ).annotate(
-                    popularity=Count('id')
-                ).order_by('-popularity')[:limit - len(recommended_products)]
-                
-                recommended_products.extend(collaborative_products)
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)  # Número de productos a retornar
         
-        # ESTRATEGIA 3: Productos populares (fallback si no hay suficientes recomendaciones)
-        if len(recommended_products) < limit:
-            popular_products = Product.objects.filter(
-                is_active=True
-            ).exclude(
-                id__in=purchased_product_ids
-            ).annotate(
-                times_sold=Count('order_items')
-            ).order_by('-times_sold', '-created_at')[:limit - len(recommended_products)]
-            
-            recommended_products.extend(popular_products)
+        cache_key = personalized_cache_key(user.id, limit)
+        data = cache.get(cache_key)
+        if data is None:
+            data = self._personalized_recommendations(user, limit)
+            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
+        return Response(data)
+    
+    def _personalized_recommendations(self, user, limit):
+        result = recommend_for_user(user, limit=limit)
         
-        # Eliminar duplicados y limitar
-        unique_products = []
-        seen_ids = set()
-        for product in recommended_products:
-            if product.id not in seen_ids:
-                unique_products.append(product)
-                seen_ids.add(product.id)
-                if len(unique_products) >= limit:
-                    break
+        # Un solo query para los productos (con categoría y calificaciones), conservando el orden
+        products = Product.objects.filter(
+            id__in=result['product_ids'], is_active=True
+        ).select_related('category', 'rating_summary').in_bulk()
+        recommended = [products[pid] for pid in result['product_ids'] if pid in products][:limit]
         
-        serializer = ProductSerializer(unique_products, many=True)
+        favorite_categories = []
+        if result['favorite_category_ids']:
+            names = dict(Category.objects.filter(id__in=result['favorite_category_ids']).values_list('id', 'name'))
+            favorite_categories = [names[cid] for cid in result['favorite_category_ids'] if cid in names]
         
-        return Response({
+        return {
             'user': user.username,
-            'count': len(unique_products),
-            'strategy_used': 'personalized_ai' if favorite_category_ids else 'popular_products',
-            'favorite_categories': list(Category.objects.filter(id__in=favorite_category_ids).values_list('name', flat=True)),
-            'recommendations': serializer.data
-        })
+            'count': len(recommended),
+            'strategy_used': result['strategy'],
+            'favorite_categories': favorite_categories,
+            'recommendations': ProductSerializer(recommended, many=True).data
+        }
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -210,15 +246,35 @@ class ReviewViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Lista todas las reseñas o filtra por producto si se pasa ?product=ID"""
-        queryset = Review.objects.all()
+        queryset = Review.objects.select_related('user')
         product_id = self.request.query_params.get('product')
         if product_id:
             queryset = queryset.filter(product_id=product_id)
         return queryset
     
     def perform_create(self, serializer):
-        """Al crear, asigna automáticamente el usuario actual."""
-        serializer.save(user=self.request.user)
+        """Al crear, asigna automáticamente el usuario actual y suma la reseña al resumen."""
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user)
+            apply_rating_change(review.product_id, new_rating=review.rating)
+    
+    def perform_update(self, serializer):
+        """Ajusta el resumen con la diferencia entre la calificación anterior y la nueva."""
+        old_product_id = serializer.instance.product_id
+        old_rating = serializer.instance.rating
+        with transaction.atomic():
+            review = serializer.save()
+            if review.product_id != old_product_id:
+                apply_rating_change(old_product_id, old_rating=old_rating)
+                apply_rating_change(review.product_id, new_rating=review.rating)
+            else:
+                apply_rating_change(review.product_id, old_rating=old_rating, new_rating=review.rating)
+    
+    def perform_destroy(self, instance):
+        """Resta la reseña del resumen al eliminarla."""
+        with transaction.atomic():
+            instance.delete()
+            apply_rating_change(instance.product_id, old_rating=instance.rating)
     
     def update(self, request, *args, **kwargs):
         """Solo el autor o admin pueden actualizar."""
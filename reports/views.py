@@ -6,8 +6,6 @@ from django.views import View
 from datetime import datetime
 
 from users.permissions import CanViewReports
-import calendar
-import re
 from .services import (
     generate_sales_report_pdf, 
     generate_sales_report_excel, 
@@ -27,6 +25,8 @@ from .serializers import (
     DynamicReportPreviewSerializer
 )
 from shop_orders.models import Order
+from shop_orders.nlp_grammar import parse_report_prompt
+from shop_orders.order_filters import filter_created_between
 from users.permissions import CanViewReports
 import logging
 
@@ -143,206 +143,18 @@ class DynamicReportParserView(APIView):
 
     def parse_prompt(self, prompt):
         """
-        Parsea el prompt en lenguaje natural para extraer todas las instrucciones.
+        Parsea el prompt en lenguaje natural para extraer todas las instrucciones,
+        con la gramática compilada de shop_orders.nlp_grammar (cacheada por prompt).
         
         Returns:
             dict con: report_type, format, start_date, end_date, group_by, 
                      show_customer_names, show_product_names, count_orders, sum_totals
         """
-        prompt_lower = prompt.lower()
-        parsed = {
-            'report_type': 'ventas',
-            'format': 'pdf',
-            'group_by': None,
-            'show_customer_names': False,
-            'show_product_names': False,
-            'count_orders': False,
-            'sum_totals': False,
-            'start_date': None,
-            'end_date': None
-        }
-        
-        # 1. Tipo de reporte
-        if any(word in prompt_lower for word in ['producto', 'inventario', 'stock']):
-            parsed['report_type'] = 'productos'
-            logger.info(f"📦 Tipo de reporte: PRODUCTOS")
-        else:
-            logger.info(f"💰 Tipo de reporte: VENTAS")
-        
-        # 2. Formato
-        if any(word in prompt_lower for word in ['excel', 'xlsx', 'hoja de cálculo', 'hoja de calculo']):
-            parsed['format'] = 'excel'
-        logger.info(f"📄 Formato: {parsed['format'].upper()}")
-        
-        # 3. Agrupación
-        if any(phrase in prompt_lower for phrase in ['agrupado por producto', 'agrupar por producto', 'por producto']):
-            parsed['group_by'] = 'product'
-            logger.info(f"� Agrupación: Por PRODUCTO")
-        elif any(phrase in prompt_lower for phrase in ['agrupado por cliente', 'agrupar por cliente', 'por cliente', 'compras por cliente']):
-            parsed['group_by'] = 'customer'
-            logger.info(f"📊 Agrupación: Por CLIENTE")
-        
-        # 4. Mostrar nombres de clientes
-        if any(phrase in prompt_lower for phrase in ['nombre del cliente', 'nombres de clientes', 'con nombres', 'mostrar cliente']):
-            parsed['show_customer_names'] = True
-            logger.info(f"👤 Mostrar nombres de clientes: SÍ")
-        
-        # 5. Mostrar nombres de productos
-        if any(phrase in prompt_lower for phrase in ['nombre del producto', 'nombres de productos', 'mostrar producto', 'detalle de producto']):
-            parsed['show_product_names'] = True
-            logger.info(f"📦 Mostrar nombres de productos: SÍ")
-        
-        # 6. Contar órdenes
-        if any(phrase in prompt_lower for phrase in ['cantidad de compras', 'cuantas compras', 'número de órdenes', 'numero de ordenes', 'contar']):
-            parsed['count_orders'] = True
-            logger.info(f"🔢 Contar órdenes: SÍ")
-        
-        # 7. Sumar totales
-        if any(phrase in prompt_lower for phrase in ['total', 'suma', 'monto']):
-            parsed['sum_totals'] = True
-            logger.info(f"💵 Sumar totales: SÍ")
-        
-        # 8. Extraer fechas
-        current_year = datetime.now().year
-        
-        # 8.1 Fechas específicas completas (dd/mm/yyyy al dd/mm/yyyy)
-        date_range_pattern = r'del?\s+(\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{4}-\d{2}-\d{2})\s+al?\s+(\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{4}-\d{2}-\d{2})'
-        match = re.search(date_range_pattern, prompt_lower)
-        
-        if match:
-            start_str, end_str = match.groups()
-            logger.info(f"📅 Rango de fechas completas detectado: {start_str} al {end_str}")
-            
-            for date_format in ['%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d']:
-                try:
-                    parsed['start_date'] = datetime.strptime(start_str, date_format).date()
-                    parsed['end_date'] = datetime.strptime(end_str, date_format).date()
-                    logger.info(f"✅ Fechas parseadas: {parsed['start_date']} a {parsed['end_date']}")
-                    break
-                except ValueError:
-                    continue
-        
-        # 8.2 Días específicos dentro de un mes (del 1 al 15 de octubre)
-        # PRIORIDAD: Ejecutar ANTES que mes completo
-        if not parsed['start_date']:
-            # Diccionario para convertir números en palabras a dígitos
-            numeros_texto = {
-                "primero": 1, "primer": 1, "uno": 1,
-                "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5,
-                "seis": 6, "siete": 7, "ocho": 8, "nueve": 9,
-                "diez": 10, "once": 11, "doce": 12, "trece": 13,
-                "catorce": 14, "quince": 15, "dieciséis": 16, "dieciseis": 16,
-                "diecisiete": 17, "dieciocho": 18, "diecinueve": 19,
-                "veinte": 20, "veintiuno": 21, "veinte y uno": 21,
-                "veintidós": 22, "veintidos": 22, "veinte y dos": 22,
-                "veintitrés": 23, "veintitres": 23, "veinte y tres": 23,
-                "veinticuatro": 24, "veinte y cuatro": 24,
-                "veinticinco": 25, "veinte y cinco": 25,
-                "veintiséis": 26, "veintiseis": 26, "veinte y seis": 26,
-                "veintisiete": 27, "veinte y siete": 27,
-                "veintiocho": 28, "veinte y ocho": 28,
-                "veintinueve": 29, "veinte y nueve": 29,
-                "treinta": 30, "treinta y uno": 31
-            }
-            
-            meses = {
-                "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
-                "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
-                "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12
-            }
-            
-            # Patrón que requiere "del" y "al" explícitamente
-            # Captura: "del 1 al 5 de septiembre" o "del uno al cinco de septiembre"
-            # IMPORTANTE: Debe matchear PRIMERO para evitar que patrón 8.3 lo capture
-            day_range_pattern = r'\bdel?\s+(\d{1,2}|primero?|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno|veintidós|veintitrés|veinticuatro|veinticinco|veintiséis|veintisiete|veintiocho|veintinueve|treinta(?:\s+y\s+uno)?)\s+(?:de\s+\w+\s+)?al?\s+(\d{1,2}|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno|veintidós|veintitrés|veinticuatro|veinticinco|veintiséis|veintisiete|veintiocho|veintinueve|treinta(?:\s+y\s+uno)?)\s+de\s+(\w+)\b'
-            match = re.search(day_range_pattern, prompt_lower)
-            
-            logger.info(f"🔍 [8.2] Buscando patrón de rango de días en: '{prompt_lower}'")
-            logger.info(f"🔍 [8.2] Match encontrado: {bool(match)}")
-            
-            if match:
-                start_day_str, end_day_str, mes_nombre = match.groups()
-                start_day_str = start_day_str.strip()
-                end_day_str = end_day_str.strip()
-                
-                logger.info(f"🔍 Detectado rango de días: '{start_day_str}' al '{end_day_str}' de '{mes_nombre}'")
-                
-                # Convertir a números
-                start_day = numeros_texto.get(start_day_str)
-                end_day = numeros_texto.get(end_day_str)
-                
-                # Si no se encontró como texto, intentar convertir directamente como dígito
-                if start_day is None:
-                    try:
-                        start_day = int(start_day_str)
-                    except ValueError:
-                        logger.warning(f"⚠️ No se pudo convertir '{start_day_str}' a número")
-                
-                if end_day is None:
-                    try:
-                        end_day = int(end_day_str)
-                    except ValueError:
-                        logger.warning(f"⚠️ No se pudo convertir '{end_day_str}' a número")
-                
-                if start_day and end_day and mes_nombre in meses:
-                    num_mes = meses[mes_nombre]
-                    
-                    # Buscar año en el prompt, si no usa el actual
-                    year_match = re.search(r'\b(20\d{2})\b', prompt_lower)
-                    if year_match:
-                        current_year = int(year_match.group(1))
-                    
-                    try:
-                        parsed['start_date'] = datetime(current_year, num_mes, start_day).date()
-                        parsed['end_date'] = datetime(current_year, num_mes, end_day).date()
-                        logger.info(f"📅 Días específicos detectados: {start_day} al {end_day} de {mes_nombre.upper()}")
-                        logger.info(f"✅ Rango calculado: {parsed['start_date']} a {parsed['end_date']}")
-                    except ValueError as e:
-                        logger.warning(f"⚠️ Error al parsear días: {e}")
-        
-        # 8.3 Nombres de meses completos (todo el mes)
-        # Solo si NO hay patrón "del X al Y de mes"
-        if not parsed['start_date']:
-            meses = {
-                "enero": 1, "febrero": 2, "marzo": 3, "abril": 4,
-                "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
-                "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12
-            }
-            
-            # VERIFICAR PRIMERO que NO haya un patrón de rango de días
-            tiene_rango = re.search(r'\bdel?\s+\d{1,2}\s+(?:de\s+\w+\s+)?al?\s+\d{1,2}\s+de\s+\w+', prompt_lower)
-            logger.info(f"🔍 [8.3] ¿Tiene patrón de rango?: {bool(tiene_rango)}")
-            
-            if not tiene_rango:
-                for nombre_mes, num_mes in meses.items():
-                    if nombre_mes in prompt_lower:
-                        logger.info(f"📅 Mes completo detectado: {nombre_mes.upper()} ({num_mes})")
-                        
-                        year_match = re.search(r'\b(20\d{2})\b', prompt_lower)
-                        if year_match:
-                            current_year = int(year_match.group(1))
-                        
-                        primer_dia = datetime(current_year, num_mes, 1).date()
-                        ultimo_dia_num = calendar.monthrange(current_year, num_mes)[1]
-                        ultimo_dia = datetime(current_year, num_mes, ultimo_dia_num).date()
-                        
-                        parsed['start_date'] = primer_dia
-                        parsed['end_date'] = ultimo_dia
-                        logger.info(f"✅ Rango calculado (mes completo): {parsed['start_date']} a {parsed['end_date']}")
-                        break
-            else:
-                logger.info(f"⏭️ [8.3] Saltando mes completo porque hay rango de días")
-        
-        # 8.4 Mes actual por defecto
-        if not parsed['start_date']:
-            logger.info(f"⚠️ No se detectó fecha, usando mes actual")
-            today = datetime.now()
-            primer_dia = datetime(today.year, today.month, 1).date()
-            ultimo_dia_num = calendar.monthrange(today.year, today.month)[1]
-            ultimo_dia = datetime(today.year, today.month, ultimo_dia_num).date()
-            parsed['start_date'] = primer_dia
-            parsed['end_date'] = ultimo_dia
-        
+        parsed = parse_report_prompt(prompt)
+        logger.info(
+            f"🧭 Prompt interpretado: {parsed['report_type'].upper()} en {parsed['format'].upper()}, "
+            f"{parsed['start_date']} a {parsed['end_date']}, agrupado por: {parsed['group_by'] or '-'}"
+        )
         return parsed
 
     def post(self, request, *args, **kwargs):
@@ -516,10 +328,8 @@ class SalesReportPreviewView(APIView):
             )
 
         # Obtener órdenes del rango de fechas
-        orders = Order.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date,
-            status='PAID'
+        orders = filter_created_between(
+            Order.objects.filter(status='PAID'), start_date, end_date
         ).select_related('user').prefetch_related('items__product').order_by('-created_at')
         
         # Preparar datos
@@ -533,7 +343,7 @@ class SalesReportPreviewView(APIView):
                 'customer': order.user.get_full_name() or order.user.username,
                 'customer_email': order.user.email,
                 'total': float(order.total_price),
-                'items_count': order.items.count(),
+                'items_count': order.item_count,
                 'items': [
                     {
                         'product': item.product.name,
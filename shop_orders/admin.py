@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Order, OrderItem
 from .payment_models import Payment, Refund
+from .reservation_models import StockReservation
 
 
 class OrderItemInline(admin.TabularInline):
@@ -22,5 +23,12 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ('order__status',)
 
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'status', 'expires_at')
+    list_filter = ('status',)
+    raw_id_fields = ('order', 'product')
+
+
 # Importar y registrar Payment y Refund admin
 from .payment_admin import PaymentAdmin, RefundAdmin
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from shop_orders.nlp_grammar import clear_parse_caches, parse_cart_prompt, parse_report_prompt
+
+CART_PROMPTS = [
+    'Agrega 2 smartphones al carrito',
+    'Quiero 3 laptops y 1 mouse',
+    'Añade el curso de Python',
+    'Comprar 5 auriculares bluetooth',
+    'quita 1 mouse',
+    'vaciar el carrito',
+]
+REPORT_PROMPTS = [
+    'Quiero un reporte de ventas del mes de octubre en PDF',
+    'Dame el reporte de ventas de septiembre en excel',
+    'Reporte de ventas del 01/10/2025 al 31/10/2025 en excel',
+    'Reporte de ventas agrupado por producto del 1 al 15 de octubre',
+    'Dame un reporte de compras por cliente con nombres y monto total',
+]
+TARGET = 50000
+
+
+class Command(BaseCommand):
+    help = 'Mide el throughput (prompts/s en un core) de los parsers de carrito y reportes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=200000, help='Prompts parseados por medición')
+        parser.add_argument('--unique', type=int, default=1000,
+                            help='Prompts distintos (el resto se repite, como en producción)')
+
+    def handle(self, *args, **options):
+        total, unique = options['prompts'], max(options['unique'], 1)
+
+        for label, templates, parse in (
+            ('carrito', CART_PROMPTS, parse_cart_prompt),
+            ('reportes', REPORT_PROMPTS, parse_report_prompt),
+        ):
+            # Variantes distintas (cantidades / años) para medir también los fallos de cache
+            prompts = [f'{templates[i % len(templates)]} {2000 + i}' for i in range(unique)]
+
+            clear_parse_caches()
+            started = time.perf_counter()
+            for prompt in prompts:
+                parse(prompt)
+            cold = len(prompts) / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for i in range(total):
+                parse(prompts[i % unique])
+            warm = total / (time.perf_counter() - started)
+
+            style = self.style.SUCCESS if warm >= TARGET else self.style.WARNING
+            self.stdout.write(style(
+                f"{'✅' if warm >= TARGET else '⚠️ '} {label}: {warm:,.0f} prompts/s con cache, "
+                f"{cold:,.0f} prompts/s sin cache (objetivo {TARGET:,}/s)"
+            ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from shop_orders.webhook_service import process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Procesa los eventos de webhook de Stripe pendientes (worker para STRIPE_WEBHOOK_ASYNC=True)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Eventos por pasada')
+        parser.add_argument('--loop', action='store_true', help='Seguir procesando indefinidamente')
+        parser.add_argument('--interval', type=float, default=1.0, help='Segundos de espera cuando la cola está vacía')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_events(batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f'Eventos procesados: {processed}')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from shop_orders.signals import clear_dashboard_cache
+from shop_orders.totals_service import reconcile_order_totals
+
+
+class Command(BaseCommand):
+    help = 'Detecta y corrige desvíos en item_count/total_price de las órdenes respecto de sus items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Órdenes revisadas por lote')
+        parser.add_argument('--dry-run', action='store_true', help='Solo reportar, sin modificar')
+        parser.add_argument('--counts-only', action='store_true', help='Corregir solo item_count')
+
+    def handle(self, *args, **options):
+        result = reconcile_order_totals(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            counts_only=options['counts_only'],
+        )
+
+        self.stdout.write(f"Órdenes revisadas: {result['checked']}")
+        if result['drifted_ids']:
+            self.stdout.write(f"Con desvío (primeras): {result['drifted_ids']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"⚠️  Órdenes con desvío: {result['repaired']} (dry-run, sin cambios)"))
+            return
+
+        if result['repaired']:
+            clear_dashboard_cache()
+        self.stdout.write(self.style.SUCCESS(f"✅ Órdenes corregidas: {result['repaired']}"))
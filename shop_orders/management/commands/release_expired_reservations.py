@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from shop_orders.stock_service import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Libera el stock reservado por órdenes PENDING vencidas y las cancela (ejecutar por cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Órdenes procesadas por transacción')
+
+    def handle(self, *args, **options):
+        cancelled = release_expired_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Órdenes vencidas canceladas: {cancelled}'))
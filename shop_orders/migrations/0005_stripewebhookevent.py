@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_orders', '0004_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(help_text='ID del evento de Stripe (evt_...)', max_length=255, unique=True)),
+                ('event_type', models.CharField(max_length=100)),
+                ('order_id', models.BigIntegerField(blank=True, help_text='ID de la orden indicada en los metadatos del evento', null=True)),
+                ('status', models.CharField(choices=[('RECEIVED', 'Recibido'), ('PROCESSED', 'Procesado'), ('IGNORED', 'Ignorado'), ('FAILED', 'Fallido')], default='RECEIVED', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Webhook Stripe',
+                'verbose_name_plural': 'Eventos de Webhook Stripe',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='shop_orders_status_a313e4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_orders', '0006_order_shop_orders_created_0dc574_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='shop_orders_status_2cabe1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'user'], name='shop_orders_status_1e34f8_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_item_count(apps, schema_editor):
+    Order = apps.get_model('shop_orders', 'Order')
+    OrderItem = apps.get_model('shop_orders', 'OrderItem')
+    counts = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        n=Count('id')
+    ).values('n')
+    Order.objects.update(
+        item_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_orders', '0007_order_shop_orders_status_2cabe1_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_item_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_orders', '0008_order_item_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockreservation',
+            name='payment_intent_id',
+            field=models.CharField(blank=True, default='', help_text='PaymentIntent de Stripe abierto para la orden (app móvil); el sweeper lo cancela antes de liberar', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stripewebhookevent',
+            name='payment_intent_id',
+            field=models.CharField(blank=True, default='', help_text='PaymentIntent cobrado; se usa para reembolsar pagos de órdenes canceladas', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='stripewebhookevent',
+            name='status',
+            field=models.CharField(choices=[('RECEIVED', 'Recibido'), ('PROCESSED', 'Procesado'), ('IGNORED', 'Ignorado'), ('FAILED', 'Fallido'), ('REFUNDED', 'Reembolsado (orden cancelada)')], default='RECEIVED', max_length=20),
+        ),
+    ]
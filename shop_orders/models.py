@@ -3,7 +3,26 @@ from django.conf import settings
 from products.models import Product
 
 
+class InvalidStatusTransition(ValueError):
+    """La orden no puede pasar de su estado actual al estado pedido."""
+
+
+# Estado anterior desconocido (la orden se cargó con status diferido)
+_UNKNOWN_STATUS = object()
+
+
 class Order(models.Model):
+    """
+    Orden de compra con máquina de estados explícita.
+
+    El estado se cambia con transition_to(), que valida ALLOWED_TRANSITIONS.
+    save() compara con el estado con el que se cargó la orden y solo si hubo
+    una transición real emite shop_orders.signals.orders_status_changed, que
+    es donde cuelgan los efectos secundarios (Delivery, Warranty, stock). Para
+    cambiar muchas órdenes a la vez ver status_service.bulk_transition().
+    """
+    _previous_status = None
+
     class OrderStatus(models.TextChoices):
         PENDING = 'PENDING', 'Pendiente'
         PAID = 'PAID', 'Pagado'
@@ -11,17 +30,103 @@ class Order(models.Model):
         DELIVERED = 'DELIVERED', 'Entregado'
         CANCELLED = 'CANCELLED', 'Cancelado'
 
+    # Transiciones de estado permitidas (estado actual -> estados destino)
+    ALLOWED_TRANSITIONS = {
+        OrderStatus.PENDING: [OrderStatus.PAID, OrderStatus.CANCELLED],
+        OrderStatus.PAID: [OrderStatus.SHIPPED, OrderStatus.DELIVERED, OrderStatus.CANCELLED],
+        OrderStatus.SHIPPED: [OrderStatus.DELIVERED, OrderStatus.CANCELLED],
+        OrderStatus.DELIVERED: [],
+        OrderStatus.CANCELLED: [],
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=OrderStatus.choices, default=OrderStatus.PENDING)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Cantidad de líneas (OrderItem); se mantiene junto con total_price al
+    # guardar/borrar items (ver signals.update_order_totals_on_item_*)
+    item_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Paginación por cursor (created_at, id): listado admin y "mis órdenes"
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            # Filtros de listados y reportes: ?status= con rango de fechas, ?status=&user_id=
+            models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['status', 'user']),
+        ]
 
     def __str__(self):
         return f"Orden {self.id} por {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._previous_status = instance.__dict__.get('status', _UNKNOWN_STATUS)
+        return instance
+
+    @property
+    def previous_status(self):
+        """Estado con el que se cargó (o guardó por última vez) la orden; None si es nueva."""
+        if self._previous_status is _UNKNOWN_STATUS:
+            return None
+        return self._previous_status
+
+    def has_status_changed(self):
+        """True si status difiere del estado cargado. Una orden nueva cuenta como
+        transición solo si no nace en PENDING (p. ej. scripts que crean órdenes PAID)."""
+        if self._previous_status is _UNKNOWN_STATUS:
+            return True
+        if self._state.adding:
+            return self.status != self.OrderStatus.PENDING
+        return self.status != self._previous_status
+
+    def can_transition_to(self, new_status):
+        return new_status == self.status or new_status in self.ALLOWED_TRANSITIONS.get(self.status, [])
+
+    def transition_to(self, new_status, save=True):
+        """
+        Cambia el estado validando la máquina de estados.
+
+        Returns:
+            bool: False si la orden ya estaba en new_status (no se guarda nada)
+
+        Raises:
+            InvalidStatusTransition: si la transición no está permitida
+        """
+        if new_status == self.status:
+            return False
+        if not self.can_transition_to(new_status):
+            raise InvalidStatusTransition(
+                f'No se puede cambiar la orden #{self.id} de {self.status} a {new_status}'
+            )
+        self.status = new_status
+        if save:
+            self.save(update_fields=['status'] if self.pk else None)
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        status_saved = update_fields is None or 'status' in update_fields
+        transition = status_saved and self.has_status_changed()
+        previous = self.previous_status
+
+        super().save(*args, **kwargs)
+
+        if status_saved:
+            self._previous_status = self.status
+        if transition:
+            from .signals import orders_status_changed
+            orders_status_changed.send(
+                sender=Order,
+                order_ids=[self.id],
+                new_status=self.status,
+                previous_statuses={self.id: previous},
+                user_ids={self.id: self.user_id},
+            )
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -31,3 +136,17 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_subtotal = instance.subtotal if {'price', 'quantity'} <= set(field_names) else None
+        return instance
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+
+# Importar modelos de reservas de stock
+from .reservation_models import StockReservation
@@ -0,0 +1,291 @@
+"""
+Gramática compilada para los comandos en lenguaje natural.
+
+La comparten CartNLPService (carrito por texto o voz) y
+reports.views.DynamicReportParserView (reportes dinámicos). Antes cada
+request recorría listas de palabras clave con `any(word in prompt ...)` y
+`str.replace`, y compilaba sus regex en cada llamada. Ahora:
+
+- KeywordGrammar: todas las frases de una familia de intenciones (acciones del
+  carrito, opciones del reporte, meses) en una sola alternancia compilada al
+  importar el módulo. Un recorrido del texto devuelve todas las etiquetas
+  presentes, con la misma semántica de subcadena que `frase in texto`.
+- Las regex de ítems y fechas se compilan una vez.
+- parse_cart_prompt() / parse_report_prompt() cachean (LRU) el resultado por
+  prompt normalizado: los comandos de voz y los reportes se repiten mucho.
+
+`python manage.py benchmark_nlp_grammar` mide el throughput de ambos parsers.
+"""
+import calendar
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+PARSE_CACHE_SIZE = 4096
+
+
+class KeywordGrammar:
+    """
+    Familia de frases -> etiqueta compilada en una única regex.
+
+    La alternancia va dentro de un lookahead para probarla en cada posición
+    del texto (también las frases que se solapan) y ordenada de la más larga a
+    la más corta; las frases más cortas que empiezan en la misma posición son
+    prefijos de la encontrada y se resuelven con una tabla precalculada.
+    """
+
+    def __init__(self, phrases_by_label):
+        labels_by_phrase = {}
+        for label, phrases in phrases_by_label.items():
+            for phrase in phrases:
+                labels_by_phrase.setdefault(phrase, set()).add(label)
+
+        phrases = sorted(labels_by_phrase, key=len, reverse=True)
+        alternation = '|'.join(re.escape(phrase) for phrase in phrases)
+        self.pattern = re.compile(f'(?=({alternation}))')
+        self.strip_pattern = re.compile(alternation)
+        # Etiquetas de la frase y de todas las frases que son prefijo de ella
+        self.labels_for = {
+            phrase: frozenset().union(*(
+                labels for other, labels in labels_by_phrase.items() if phrase.startswith(other)
+            ))
+            for phrase in phrases
+        }
+
+    def labels(self, text):
+        """Etiquetas de todas las frases contenidas en text."""
+        found = set()
+        for match in self.pattern.finditer(text):
+            found |= self.labels_for[match.group(1)]
+        return found
+
+    def remove(self, text):
+        """text sin las frases de la gramática (las más largas primero)."""
+        return self.strip_pattern.sub('', text)
+
+
+def normalize_prompt(prompt):
+    """Minúsculas y espacios colapsados: la clave de los caches de parseo."""
+    return ' '.join((prompt or '').lower().split())
+
+
+# =============================================================================
+# CARRITO
+# =============================================================================
+
+CART_ACTIONS = KeywordGrammar({
+    'add': ['agrega', 'agregar', 'añade', 'añadir', 'quiero', 'dame', 'comprar', 'necesito'],
+    'remove': ['quita', 'quitar', 'elimina', 'eliminar', 'borra', 'borrar', 'saca', 'sacar'],
+    'clear': ['vacía', 'vaciar', 'limpiar', 'limpía', 'borrar todo', 'quitar todo'],
+})
+
+# Número + nombre del producto: "2 smartphones", "3 laptops"
+CART_ITEM_RE = re.compile(r'(\d+)\s+([a-záéíóúñ\s]+?)(?=\s+y\s+|\s*$|,)')
+ARTICLES_RE = re.compile(r'\b(el|la|los|las|un|una|unos|unas|de|del)\b')
+
+
+def detect_cart_action(prompt):
+    """'clear' tiene prioridad sobre 'remove'; por defecto 'add'."""
+    labels = CART_ACTIONS.labels(prompt)
+    if 'clear' in labels:
+        return 'clear'
+    if 'remove' in labels:
+        return 'remove'
+    return 'add'
+
+
+def extract_cart_items(prompt):
+    """
+    Productos y cantidades del comando:
+    - "agrega 2 smartphones" -> [{'name': 'smartphones', 'quantity': 2}]
+    - "quiero 3 laptops y 1 mouse" -> [{'name': 'laptops', 'quantity': 3}, {'name': 'mouse', 'quantity': 1}]
+    - sin números: el texto sin palabras de acción, cantidad 1
+    """
+    items = []
+    for quantity, name in CART_ITEM_RE.findall(prompt):
+        name = ARTICLES_RE.sub('', name.strip()).strip()
+        if name:
+            items.append({'name': name, 'quantity': int(quantity)})
+
+    if not items:
+        cleaned = CART_ACTIONS.remove(prompt).strip()
+        if cleaned:
+            items.append({'name': cleaned, 'quantity': 1})
+    return items
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cart(prompt):
+    action = detect_cart_action(prompt)
+    items = () if action == 'clear' else tuple(
+        (item['name'], item['quantity']) for item in extract_cart_items(prompt)
+    )
+    return action, items
+
+
+def parse_cart_prompt(prompt):
+    """
+    Acción e ítems (sin resolver productos) de un comando del carrito.
+
+    Returns:
+        dict: {'action': 'add'|'remove'|'clear', 'items': [{'name', 'quantity'}]}
+    """
+    action, items = _parse_cart(normalize_prompt(prompt))
+    return {'action': action, 'items': [{'name': name, 'quantity': quantity} for name, quantity in items]}
+
+
+# Fin de una frase en una transcripción de voz: puntuación, saltos de línea o
+# conectores ("... y luego ...", "... después ...")
+UTTERANCE_SPLIT_RE = re.compile(r'\s*(?:[.!?;\n]+|\b(?:y\s+)?(?:luego|despu[eé]s)\b)\s*', re.IGNORECASE)
+
+
+def split_transcript(transcript):
+    """Divide una transcripción en comandos: "agrega 2 laptops. luego quita 1 mouse" -> 2 prompts."""
+    return [utterance for utterance in UTTERANCE_SPLIT_RE.split(transcript or '') if utterance.strip()]
+
+
+# =============================================================================
+# REPORTES
+# =============================================================================
+
+REPORT_OPTIONS = KeywordGrammar({
+    'type:productos': ['producto', 'inventario', 'stock'],
+    'format:excel': ['excel', 'xlsx', 'hoja de cálculo', 'hoja de calculo'],
+    'group:product': ['agrupado por producto', 'agrupar por producto', 'por producto'],
+    'group:customer': ['agrupado por cliente', 'agrupar por cliente', 'por cliente', 'compras por cliente'],
+    'show_customer_names': ['nombre del cliente', 'nombres de clientes', 'con nombres', 'mostrar cliente'],
+    'show_product_names': ['nombre del producto', 'nombres de productos', 'mostrar producto', 'detalle de producto'],
+    'count_orders': ['cantidad de compras', 'cuantas compras', 'número de órdenes', 'numero de ordenes', 'contar'],
+    'sum_totals': ['total', 'suma', 'monto'],
+})
+
+MONTHS = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
+    'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
+    'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
+}
+MONTH_NAMES = KeywordGrammar({month: [month] for month in MONTHS})
+
+DAY_WORDS = {
+    'primero': 1, 'primer': 1, 'uno': 1,
+    'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
+    'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9,
+    'diez': 10, 'once': 11, 'doce': 12, 'trece': 13,
+    'catorce': 14, 'quince': 15, 'dieciséis': 16, 'dieciseis': 16,
+    'diecisiete': 17, 'dieciocho': 18, 'diecinueve': 19,
+    'veinte': 20, 'veintiuno': 21, 'veinte y uno': 21,
+    'veintidós': 22, 'veintidos': 22, 'veinte y dos': 22,
+    'veintitrés': 23, 'veintitres': 23, 'veinte y tres': 23,
+    'veinticuatro': 24, 'veinte y cuatro': 24,
+    'veinticinco': 25, 'veinte y cinco': 25,
+    'veintiséis': 26, 'veintiseis': 26, 'veinte y seis': 26,
+    'veintisiete': 27, 'veinte y siete': 27,
+    'veintiocho': 28, 'veinte y ocho': 28,
+    'veintinueve': 29, 'veinte y nueve': 29,
+    'treinta': 30, 'treinta y uno': 31,
+}
+
+_FULL_DATE = r'(\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{4}-\d{2}-\d{2})'
+DATE_RANGE_RE = re.compile(rf'del?\s+{_FULL_DATE}\s+al?\s+{_FULL_DATE}')
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d')
+
+_DAY = (
+    r'(\d{1,2}|primero?|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|'
+    r'dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno|veintidós|veintitrés|veinticuatro|veinticinco|'
+    r'veintiséis|veintisiete|veintiocho|veintinueve|treinta(?:\s+y\s+uno)?)'
+)
+# "del 1 al 5 de septiembre" / "del uno al cinco de septiembre"
+DAY_RANGE_RE = re.compile(rf'\bdel?\s+{_DAY}\s+(?:de\s+\w+\s+)?al?\s+{_DAY.replace("primero?|", "")}\s+de\s+(\w+)\b')
+NUMERIC_DAY_RANGE_RE = re.compile(r'\bdel?\s+\d{1,2}\s+(?:de\s+\w+\s+)?al?\s+\d{1,2}\s+de\s+\w+')
+YEAR_RE = re.compile(r'\b(20\d{2})\b')
+
+
+def _day_number(text):
+    text = text.strip()
+    if text in DAY_WORDS:
+        return DAY_WORDS[text]
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def _month_range(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _parse_report_dates(prompt, today):
+    """(inicio, fin): rango dd/mm/yyyy, días de un mes, mes completo o el mes actual."""
+    match = DATE_RANGE_RE.search(prompt)
+    if match:
+        start_str, end_str = match.groups()
+        for date_format in DATE_FORMATS:
+            try:
+                return (
+                    datetime.strptime(start_str, date_format).date(),
+                    datetime.strptime(end_str, date_format).date(),
+                )
+            except ValueError:
+                continue
+
+    year_match = YEAR_RE.search(prompt)
+    year = int(year_match.group(1)) if year_match else today.year
+
+    # Días dentro de un mes: antes que el mes completo
+    match = DAY_RANGE_RE.search(prompt)
+    if match:
+        start_day, end_day = _day_number(match.group(1)), _day_number(match.group(2))
+        month = MONTHS.get(match.group(3))
+        if start_day and end_day and month:
+            try:
+                return date(year, month, start_day), date(year, month, end_day)
+            except ValueError:
+                pass
+
+    if not NUMERIC_DAY_RANGE_RE.search(prompt):
+        months = MONTH_NAMES.labels(prompt)
+        if months:
+            # Igual que antes: con varios meses gana el primero del calendario
+            return _month_range(year, min(MONTHS[month] for month in months))
+
+    return _month_range(today.year, today.month)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_report(prompt, today):
+    labels = REPORT_OPTIONS.labels(prompt)
+    if 'group:product' in labels:
+        group_by = 'product'
+    elif 'group:customer' in labels:
+        group_by = 'customer'
+    else:
+        group_by = None
+    start_date, end_date = _parse_report_dates(prompt, today)
+    return (
+        ('report_type', 'productos' if 'type:productos' in labels else 'ventas'),
+        ('format', 'excel' if 'format:excel' in labels else 'pdf'),
+        ('group_by', group_by),
+        ('show_customer_names', 'show_customer_names' in labels),
+        ('show_product_names', 'show_product_names' in labels),
+        ('count_orders', 'count_orders' in labels),
+        ('sum_totals', 'sum_totals' in labels),
+        ('start_date', start_date),
+        ('end_date', end_date),
+    )
+
+
+def parse_report_prompt(prompt, today=None):
+    """
+    Instrucciones de un pedido de reporte en lenguaje natural.
+
+    Returns:
+        dict con: report_type, format, start_date, end_date, group_by,
+                  show_customer_names, show_product_names, count_orders, sum_totals
+    """
+    # La fecha de hoy forma parte de la clave: "sin fecha" = mes actual
+    return dict(_parse_report(normalize_prompt(prompt), today or date.today()))
+
+
+def clear_parse_caches():
+    _parse_cart.cache_clear()
+    _parse_report.cache_clear()
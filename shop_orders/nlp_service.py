@@ -2,8 +2,9 @@
 Servicio de procesamiento de lenguaje natural para el carrito de compras
 Permite a los usuarios agregar productos usando comandos en texto o voz
 """
-import re
-from products.models import Product, Category
+from products.catalog_snapshot import MIN_CONFIDENCE, get_catalog_snapshot
+from products.suggestion_index import get_suggestions
+from .nlp_grammar import detect_cart_action, extract_cart_items, parse_cart_prompt
 
 
 class CartNLPService:
@@ -11,12 +12,11 @@ class CartNLPService:
     Servicio para interpretar comandos en lenguaje natural relacionados con el carrito
     """
     
-    # Palabras clave para acciones
-    ACTION_KEYWORDS = {
-        'add': ['agrega', 'agregar', 'añade', 'añadir', 'quiero', 'dame', 'comprar', 'necesito'],
-        'remove': ['quita', 'quitar', 'elimina', 'eliminar', 'borra', 'borrar', 'saca', 'sacar'],
-        'clear': ['vacía', 'vaciar', 'limpiar', 'limpía', 'borrar todo', 'quitar todo']
-    }
+    # Candidatos (con su confianza) que se devuelven por ítem
+    TOP_CANDIDATES = 3
+    
+    # Las palabras clave de acciones y las regex de ítems están compiladas en
+    # shop_orders.nlp_grammar (compartidas con el parser de reportes)
     
     # Palabras clave para categorías
     CATEGORY_KEYWORDS = {
@@ -27,7 +27,7 @@ class CartNLPService:
     }
     
     @staticmethod
-    def parse_cart_command(prompt):
+    def parse_cart_command(prompt, snapshot=None):
         """
         Interpreta un comando de lenguaje natural para el carrito
         
@@ -37,14 +37,14 @@ class CartNLPService:
         Returns:
             dict: {
                 'action': 'add'|'remove'|'clear',
-                'items': [{'product_id': int, 'quantity': int, 'name': str}],
+                'items': [{'product_id': int, 'quantity': int, 'name': str,
+                           'confidence': float, 'candidates': [...]}],
                 'error': str|None
             }
         """
-        prompt_lower = prompt.lower().strip()
-        
-        # Detectar acción
-        action = CartNLPService._detect_action(prompt_lower)
+        # Acción, productos y cantidades (gramática compilada, cacheada por prompt)
+        command = parse_cart_prompt(prompt)
+        action = command['action']
         
         if action == 'clear':
             return {
@@ -53,8 +53,7 @@ class CartNLPService:
                 'error': None
             }
         
-        # Extraer productos y cantidades
-        items = CartNLPService._extract_items(prompt_lower)
+        items = command['items']
         
         if not items:
             return {
@@ -63,18 +62,25 @@ class CartNLPService:
                 'error': 'No se pudieron identificar productos en el comando.'
             }
         
-        # Buscar productos en la base de datos
+        # Resolver productos contra el snapshot del catálogo (sin queries)
+        snapshot = snapshot or get_catalog_snapshot()
         resolved_items = []
         for item in items:
-            product = CartNLPService._find_product(item['name'], item.get('category'))
-            if product:
+            candidates = CartNLPService._match_products(item['name'], item.get('category'), snapshot=snapshot)
+            if candidates and candidates[0][1] >= MIN_CONFIDENCE:
+                product, confidence = candidates[0]
                 resolved_items.append({
                     'product_id': product.id,
                     'product': product.id,  # Para compatibilidad con serializer
                     'quantity': item['quantity'],
                     'name': product.name,
                     'price': str(product.price),
-                    'stock_available': product.stock
+                    'stock_available': product.stock,
+                    'confidence': confidence,
+                    'candidates': [
+                        {'product_id': candidate.id, 'name': candidate.name, 'price': str(candidate.price), 'score': score}
+                        for candidate, score in candidates
+                    ]
                 })
             else:
                 return {
@@ -90,20 +96,53 @@ class CartNLPService:
         }
     
     @staticmethod
-    def _detect_action(prompt):
-        """Detecta la acción a realizar"""
-        # Verificar clear primero
-        for keyword in CartNLPService.ACTION_KEYWORDS['clear']:
-            if keyword in prompt:
-                return 'clear'
+    def parse_cart_batch(prompts):
+        """
+        Interpreta varios comandos seguidos (sesión de voz o kiosco) contra un
+        mismo snapshot del catálogo y los acumula como cambios sobre el
+        carrito actual del cliente, que el servidor no conoce:
+        'add' suma, 'remove' resta y 'clear' descarta lo acumulado.
         
-        # Verificar remove
-        for keyword in CartNLPService.ACTION_KEYWORDS['remove']:
-            if keyword in prompt:
-                return 'remove'
+        Sin 'clear' los cambios son deltas por producto (un "quita el mouse"
+        suelto resta 1 del carrito existente). Con 'clear' el lote define el
+        carrito completo: los cambios son lo agregado después del último
+        'clear' y una resta nunca baja de 0.
         
-        # Por defecto: add
-        return 'add'
+        Returns:
+            dict: {
+                'results': [parse_cart_command(prompt) + {'prompt': str}, ...],
+                'clears_cart': bool,
+                'changes': {product_id: +/-cantidad} en orden de llegada,
+            }
+        """
+        snapshot = get_catalog_snapshot()
+        results, changes, clears_cart = [], {}, False
+        for prompt in prompts:
+            result = CartNLPService.parse_cart_command(prompt, snapshot=snapshot)
+            results.append({'prompt': prompt, **result})
+            if result['error']:
+                continue
+            
+            if result['action'] == 'clear':
+                changes.clear()
+                clears_cart = True
+            sign = {'add': 1, 'remove': -1}.get(result['action'], 0)
+            for item in result['items']:
+                product_id = item['product_id']
+                total = changes.get(product_id, 0) + sign * item['quantity']
+                if clears_cart:
+                    total = max(total, 0)
+                if total:
+                    changes[product_id] = total
+                else:
+                    changes.pop(product_id, None)
+        
+        return {'results': results, 'clears_cart': clears_cart, 'changes': changes}
+    
+    @staticmethod
+    def _detect_action(prompt):
+        """Detecta la acción a realizar ('clear' > 'remove' > 'add')"""
+        return detect_cart_action(prompt)
     
     @staticmethod
     def _extract_items(prompt):
@@ -113,157 +152,33 @@ class CartNLPService:
         - "agrega 2 smartphones" -> [{'name': 'smartphones', 'quantity': 2}]
         - "quiero 3 laptops y 1 mouse" -> [{'name': 'laptops', 'quantity': 3}, {'name': 'mouse', 'quantity': 1}]
         """
-        items = []
-        
-        # Patrón: número + nombre del producto
-        # Ej: "2 smartphones", "3 laptops"
-        pattern = r'(\d+)\s+([a-záéíóúñ\s]+?)(?=\s+y\s+|\s*$|,)'
-        matches = re.findall(pattern, prompt)
-        
-        for match in matches:
-            quantity = int(match[0])
-            name = match[1].strip()
-            
-            # Limpiar palabras comunes
-            name = re.sub(r'\b(el|la|los|las|un|una|unos|unas|de|del)\b', '', name).strip()
-            
-            if name:
-                items.append({
-                    'name': name,
-                    'quantity': quantity
-                })
-        
-        # Si no se encontró patrón con números, buscar solo nombres
-        if not items:
-            # Patrón: nombres de productos sin números (asume cantidad = 1)
-            # Limpia el prompt de palabras de acción
-            cleaned = prompt
-            for action_list in CartNLPService.ACTION_KEYWORDS.values():
-                for keyword in action_list:
-                    cleaned = cleaned.replace(keyword, '')
-            
-            cleaned = cleaned.strip()
-            if cleaned:
-                items.append({
-                    'name': cleaned,
-                    'quantity': 1
-                })
-        
-        return items
+        return extract_cart_items(prompt)
     
     @staticmethod
-    def _find_product(search_term, category=None):
-        """
-        Busca un producto por nombre o descripción
-        Implementa búsqueda difusa mejorada (fuzzy search)
-        Maneja singulares/plurales y búsqueda por palabras clave
+    def _match_products(search_term, category=None, snapshot=None, limit=TOP_CANDIDATES):
         """
-        # Normalizar búsqueda: minúsculas y quitar espacios extra
-        search_normalized = search_term.lower().strip()
-        
-        # Quitar plurales comunes (s, es)
-        search_singular = search_normalized.rstrip('s')
-        if search_singular.endswith('e'):
-            search_singular = search_singular.rstrip('es')
-        
-        # 1. Buscar por coincidencia exacta en nombre (más relevante)
-        product = Product.objects.filter(
-            name__icontains=search_normalized,
-            is_active=True
-        ).first()
-        
-        if product:
-            return product
-        
-        # 2. Buscar por singular
-        if search_singular != search_normalized:
-            product = Product.objects.filter(
-                name__icontains=search_singular,
-                is_active=True
-            ).first()
-            
-            if product:
-                return product
-        
-        # 3. Buscar en descripción
-        product = Product.objects.filter(
-            description__icontains=search_normalized,
-            is_active=True
-        ).first()
-        
-        if product:
-            return product
+        Candidatos para un ítem en el snapshot en memoria del catálogo
+        (products.catalog_snapshot), con su confianza (0..1): tolera errores
+        de tipeo ("laptoop"), acentos omitidos, singulares/plurales y
+        sinónimos comunes ("celular" -> "phone").
         
-        # 4. Buscar palabras individuales (para comandos como "laptop dell")
-        words = search_normalized.split()
-        for word in words:
-            if len(word) > 3:  # Solo palabras significativas
-                # Buscar en nombre
-                product = Product.objects.filter(
-                    name__icontains=word,
-                    is_active=True
-                ).first()
-                if product:
-                    return product
-                
-                # Buscar singular de la palabra
-                word_singular = word.rstrip('s')
-                if word_singular != word:
-                    product = Product.objects.filter(
-                        name__icontains=word_singular,
-                        is_active=True
-                    ).first()
-                    if product:
-                        return product
-        
-        # 5. Mapeo de palabras comunes a productos
-        keyword_mapping = {
-            'celular': 'phone',
-            'telefono': 'phone',
-            'movil': 'phone',
-            'computadora': 'laptop',
-            'portatil': 'laptop',
-            'notebook': 'laptop',
-            'pc': 'laptop',
-            'auricular': 'airpods',
-            'audifonos': 'airpods',
-            'headphones': 'airpods',
-            'tele': 'tv',
-            'television': 'tv',
-            'consola': 'playstation',
-            'raton': 'mouse',
-        }
-        
-        # Buscar con mapeo
-        for key, value in keyword_mapping.items():
-            if key in search_normalized:
-                product = Product.objects.filter(
-                    name__icontains=value,
-                    is_active=True
-                ).first()
-                if product:
-                    return product
-        
-        return None
+        Returns:
+            list[tuple[SnapshotProduct, float]]: del más al menos probable
+        """
+        snapshot = snapshot or get_catalog_snapshot()
+        return snapshot.match(search_term, limit=limit)
+    
+    @staticmethod
+    def _find_product(search_term, category=None, snapshot=None):
+        """El candidato más probable si supera MIN_CONFIDENCE, o None."""
+        snapshot = snapshot or get_catalog_snapshot()
+        return snapshot.find(search_term)
     
     @staticmethod
     def get_suggestions(partial_name):
         """
         Obtiene sugerencias de productos basadas en texto parcial
-        Útil para autocompletado
+        Útil para autocompletado. Se sirven desde el índice en memoria del
+        worker (products.suggestion_index), sin consultar la base de datos.
         """
-        products = Product.objects.filter(
-            name__icontains=partial_name,
-            is_active=True
-        )[:5]  # Top 5 sugerencias
-        
-        return [
-            {
-                'id': p.id,
-                'name': p.name,
-                'price': str(p.price),
-                'stock': p.stock,
-                'category': p.category.name if p.category else None
-            }
-            for p in products
-        ]
+        return get_suggestions(partial_name, limit=5)  # Top 5 sugerencias
@@ -0,0 +1,61 @@
+"""
+Filtros de listados de órdenes compartidos por OrderViewSet y AdminOrderViewSet.
+
+Los rangos de fechas se aplican como intervalos semiabiertos sobre el
+timestamp (created_at >= inicio AND created_at < fin + 1 día) en lugar de
+created_at__date, que envuelve la columna en un CAST y obliga a Postgres a
+recorrer la tabla. Así los índices compuestos de Order ((status, -created_at),
+(user, -created_at, -id), ...) resuelven el filtro y el orden a la vez.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' -> date, o None si falta o el formato no es válido."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def start_of_day(day):
+    """Primer instante del día en la zona horaria activa."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_created_between(queryset, start=None, end=None, field='created_at'):
+    """
+    Filtra por días completos [start, end] usando un rango semiabierto sobre
+    el timestamp. start y end son fechas (date); cualquiera puede ser None.
+    """
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start_of_day(start)})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': start_of_day(end + timedelta(days=1))})
+    return queryset
+
+
+def apply_order_filters(queryset, params, allow_user_filter=True):
+    """
+    Aplica los filtros de query params de los listados de órdenes:
+    ?user_id=, ?status=, ?start_date=YYYY-MM-DD, ?end_date=YYYY-MM-DD.
+
+    Las fechas con formato inválido se ignoran, como hasta ahora.
+    """
+    user_id = params.get('user_id')
+    if user_id and allow_user_filter:
+        queryset = queryset.filter(user_id=user_id)
+
+    status_filter = params.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+
+    return filter_created_between(
+        queryset,
+        start=parse_date(params.get('start_date')),
+        end=parse_date(params.get('end_date')),
+    )
@@ -1,7 +1,7 @@
 # shop_orders/payment_admin.py
 
 from django.contrib import admin
-from .payment_models import Payment, Refund
+from .payment_models import Payment, Refund, StripeWebhookEvent
 
 
 @admin.register(Payment)
@@ -107,3 +107,17 @@ class RefundAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """No permitir crear reembolsos manualmente desde admin"""
         return False
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    """Admin de solo lectura para el ledger de eventos de Stripe"""
+    list_display = ['event_id', 'event_type', 'order_id', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['event_id', 'order_id', 'payment_intent_id']
+    readonly_fields = ['event_id', 'event_type', 'order_id', 'payment_intent_id', 'received_at', 'processed_at', 'last_error']
+    ordering = ['-received_at']
+    
+    def has_add_permission(self, request):
+        """Los eventos solo los crea el webhook"""
+        return False
@@ -148,3 +148,58 @@ class Refund(models.Model):
     
     def __str__(self):
         return f"Reembolso {self.id} - ${self.amount} - {self.status}"
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Ledger de eventos de webhook de Stripe, uno por event id.
+
+    Stripe reintenta y a veces duplica entregas; el unique sobre event_id
+    garantiza que cada evento se procese una sola vez aunque lleguen varias
+    copias en paralelo. La fila también sirve de cola: los eventos en
+    RECEIVED/FAILED los procesa el worker (process_stripe_events).
+    """
+    class EventStatus(models.TextChoices):
+        RECEIVED = 'RECEIVED', 'Recibido'
+        PROCESSED = 'PROCESSED', 'Procesado'
+        IGNORED = 'IGNORED', 'Ignorado'
+        FAILED = 'FAILED', 'Fallido'
+        REFUNDED = 'REFUNDED', 'Reembolsado (orden cancelada)'
+
+    event_id = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="ID del evento de Stripe (evt_...)"
+    )
+    event_type = models.CharField(max_length=100)
+    order_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="ID de la orden indicada en los metadatos del evento"
+    )
+    payment_intent_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="PaymentIntent cobrado; se usa para reembolsar pagos de órdenes canceladas"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=EventStatus.choices,
+        default=EventStatus.RECEIVED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-received_at']
+        verbose_name = 'Evento de Webhook Stripe'
+        verbose_name_plural = 'Eventos de Webhook Stripe'
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
@@ -0,0 +1,59 @@
+"""
+Modelos para reservas de stock de órdenes pendientes de pago
+"""
+
+from django.db import models
+from shop_orders.models import Order
+from products.models import Product
+
+
+class StockReservation(models.Model):
+    """
+    Unidades apartadas para una orden mientras el cliente paga en Stripe.
+
+    El contador agregado vive en Product.reserved_stock (se actualiza con
+    UPDATE condicionales); esta tabla guarda el detalle por orden para poder
+    confirmar, liberar o expirar cada reserva, y sobrevive a reinicios de los
+    workers de gunicorn.
+    """
+    class ReservationStatus(models.TextChoices):
+        ACTIVE = 'ACTIVE', 'Activa'
+        COMMITTED = 'COMMITTED', 'Confirmada (pagada)'
+        RELEASED = 'RELEASED', 'Liberada'
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations'
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20,
+        choices=ReservationStatus.choices,
+        default=ReservationStatus.ACTIVE
+    )
+    expires_at = models.DateTimeField(help_text="Momento en que la reserva se libera si no se paga")
+    payment_intent_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="PaymentIntent de Stripe abierto para la orden (app móvil); el sweeper lo cancela antes de liberar"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Reserva de Stock'
+        verbose_name_plural = 'Reservas de Stock'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.quantity} x producto {self.product_id} - Orden #{self.order_id} ({self.status})"
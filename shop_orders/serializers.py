@@ -20,7 +20,21 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Permite limitar los campos serializados: Serializer(..., fields=['id', 'status']).
+    Los nombres desconocidos se ignoran; fields=None serializa todos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user = serializers.StringRelatedField()  # Muestra el username en lugar del ID
     total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, source='total_price', read_only=True)
@@ -29,6 +43,36 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'user', 'created_at', 'status', 'total_price', 'total_amount', 'items']
 
+    def validate_status(self, value):
+        """Las ediciones de admin (PATCH) también respetan la máquina de estados."""
+        if self.instance is not None and not self.instance.can_transition_to(value):
+            raise serializers.ValidationError(
+                f'No se puede cambiar de {self.instance.status} a {value}'
+            )
+        return value
+
+
+class OrderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Representación compacta para listados (?view=compact): sin items anidados
+    ni datos de producto, solo los primeros nombres de producto.
+    Requiere items prefetchados con select_related('product') (ver OrderListingMixin).
+    """
+    PRODUCT_NAMES_LIMIT = 3
+
+    user = serializers.StringRelatedField()
+    product_names = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = ['id', 'user', 'created_at', 'status', 'total_price', 'item_count', 'product_names']
+
+    def get_product_names(self, obj) -> list:
+        return [
+            item.product.name if item.product else None
+            for item in obj.items.all()[:self.PRODUCT_NAMES_LIMIT]
+        ]
+
 
 class OrderItemCreateSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
@@ -66,6 +110,27 @@ class NLPCartRequestSerializer(serializers.Serializer):
     )
 
 
+class NLPCartBatchRequestSerializer(serializers.Serializer):
+    """Serializer para varios comandos de carrito en una sola solicitud"""
+    MAX_PROMPTS = 50
+
+    prompts = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        max_length=MAX_PROMPTS,
+        help_text="Comandos en orden, ej: ['Agrega 2 laptops', 'Quita 1 mouse']"
+    )
+    transcript = serializers.CharField(
+        required=False,
+        help_text="Transcripción completa de voz; se divide en comandos por frases"
+    )
+
+    def validate(self, data):
+        if not data.get('prompts') and not data.get('transcript', '').strip():
+            raise serializers.ValidationError('Debe enviar "prompts" o "transcript".')
+        return data
+
+
 class NLPCartResponseSerializer(serializers.Serializer):
     """Serializer para respuesta de carrito NLP"""
     success = serializers.BooleanField()
@@ -1,10 +1,32 @@
 """
-Signals para invalidar cache automáticamente cuando cambian los datos.
+Signals para invalidar cache automáticamente cuando cambian los datos y para
+los efectos secundarios de las transiciones de estado de órdenes.
 """
+from decimal import Decimal
+
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from django.core.cache import cache
-from .models import Order
+from django.db import transaction
+from django.db.models import F
+from .models import Order, OrderItem
+from .stock_service import commit_reservations, release_order_stock
+
+
+# Emitida en cada transición real de estado, tanto por Order.save() como por
+# las transiciones en bloque (status_service.bulk_transition, sin post_save).
+# Argumentos: order_ids (IDs que cambiaron), new_status,
+# previous_statuses ({id: estado anterior}), user_ids ({id: user_id}).
+orders_status_changed = Signal()
+
+
+def clear_dashboard_cache():
+    """
+    Borra los caches derivados de órdenes. Se expone aparte del receiver para
+    las operaciones en bloque (queryset.update) que no disparan post_save.
+    """
+    cache.delete('admin_dashboard_data')
+    cache.delete('sales_analytics_data')
 
 
 @receiver([post_save, post_delete], sender=Order)
@@ -12,7 +34,141 @@ def invalidate_dashboard_cache(sender, instance, **kwargs):
     """
     Invalida el cache del dashboard cuando se crea/actualiza/elimina una orden.
     """
-    cache_key = 'admin_dashboard_data'
-    cache.delete(cache_key)
-    # También podríamos invalidar otros caches relacionados
-    cache.delete('sales_analytics_data')
+    clear_dashboard_cache()
+
+
+@receiver(orders_status_changed)
+def release_stock_on_cancel(sender, order_ids, new_status, **kwargs):
+    """
+    Una orden cancelada devuelve al disponible el stock que tenía reservado.
+    """
+    if new_status == Order.OrderStatus.CANCELLED:
+        release_order_stock(order_ids)
+
+
+SOLD_STATUSES = {Order.OrderStatus.PAID, Order.OrderStatus.SHIPPED, Order.OrderStatus.DELIVERED}
+
+
+@receiver(orders_status_changed)
+def settle_reservations_on_exit_from_pending(sender, order_ids, new_status, previous_statuses, **kwargs):
+    """
+    Una orden que deja PENDING por cualquier camino (webhook de Stripe, admin
+    update_status, bulk_update_status, PATCH) confirma sus reservas si pasa a
+    vendida y las libera en cualquier otro caso; la cancelación la cubre
+    release_stock_on_cancel. Sin esto el stock quedaba reservado para siempre:
+    el sweeper solo revisa órdenes PENDING.
+    """
+    if new_status == Order.OrderStatus.CANCELLED:
+        return
+    order_ids = [order_id for order_id in order_ids if previous_statuses.get(order_id) == Order.OrderStatus.PENDING]
+    if not order_ids:
+        return
+    if new_status in SOLD_STATUSES:
+        commit_reservations(order_ids)
+    else:
+        release_order_stock(order_ids)
+
+
+@receiver(orders_status_changed)
+def update_copurchases_on_sale(sender, order_ids, new_status, previous_statuses, **kwargs):
+    """
+    Mantiene la matriz de co-compra (products.copurchase_service): una orden
+    suma sus parejas de productos al pasar a vendida y las resta si se cancela
+    después de haberse vendido.
+    """
+    from products.tasks import update_copurchases
+
+    if new_status in SOLD_STATUSES:
+        order_ids = [order_id for order_id in order_ids if previous_statuses.get(order_id) not in SOLD_STATUSES]
+        sign = 1
+    elif new_status == Order.OrderStatus.CANCELLED:
+        order_ids = [order_id for order_id in order_ids if previous_statuses.get(order_id) in SOLD_STATUSES]
+        sign = -1
+    else:
+        return
+    if order_ids:
+        # Tras el commit: una orden que nace pagada aún no tiene sus items
+        # cuando se emite la señal
+        transaction.on_commit(lambda: update_copurchases.delay(order_ids, sign))
+
+
+@receiver(orders_status_changed)
+def refresh_suggestions_on_sale(sender, order_ids, new_status, previous_statuses, **kwargs):
+    """
+    La popularidad del autocompletado (products.suggestion_index) son las
+    unidades vendidas: cambia cuando una orden entra o sale de los estados
+    vendidos, aunque no tenga reservas que muevan el stock.
+    """
+    sold = new_status in SOLD_STATUSES
+    order_ids = [order_id for order_id in order_ids if (previous_statuses.get(order_id) in SOLD_STATUSES) != sold]
+    if not order_ids:
+        return
+    from products.suggestion_index import record_product_changes
+
+    def publish():
+        product_ids = set(
+            OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False).values_list('product_id', flat=True)
+        )
+        if product_ids:
+            record_product_changes(product_ids)
+
+    transaction.on_commit(publish)
+
+
+@receiver(orders_status_changed)
+def invalidate_recommendations_on_purchase(sender, order_ids, new_status, user_ids, **kwargs):
+    """
+    Las recomendaciones personalizadas cacheadas del cliente dejan de valer
+    cuando una orden suya se paga o se entrega. Los clientes vienen en la
+    señal: sin query extra por transición.
+    """
+    if new_status not in (Order.OrderStatus.PAID, Order.OrderStatus.DELIVERED):
+        return
+    from products.recommendation_engine import invalidate_user_recommendations
+
+    users = {user_ids[order_id] for order_id in order_ids}
+    transaction.on_commit(lambda: invalidate_user_recommendations(users))
+
+
+def _apply_item_delta(item, count_delta, total_delta):
+    """
+    Ajusta item_count y total_price de la orden con un UPDATE atómico (F()) y
+    refleja el cambio en la instancia de la orden si está cargada en el item,
+    para que un order.save() posterior no pise los contadores con valores viejos.
+    """
+    if not count_delta and not total_delta:
+        return
+    Order.objects.filter(id=item.order_id).update(
+        item_count=F('item_count') + count_delta,
+        total_price=F('total_price') + total_delta,
+    )
+    if OrderItem.order.is_cached(item):
+        item.order.item_count += count_delta
+        item.order.total_price = Decimal(str(item.order.total_price)) + total_delta
+
+
+@receiver(post_save, sender=OrderItem)
+def update_order_totals_on_item_save(sender, instance, created, **kwargs):
+    """
+    Mantiene Order.item_count y Order.total_price al crear o editar un item.
+    bulk_create no dispara la señal: quien lo use debe fijar ambos campos
+    (ver CreateOrderView).
+    """
+    if kwargs.get('raw'):
+        return
+    previous = getattr(instance, '_loaded_subtotal', None)
+    if created:
+        _apply_item_delta(instance, 1, instance.subtotal)
+    elif previous is not None:
+        _apply_item_delta(instance, 0, instance.subtotal - previous)
+    instance._loaded_subtotal = instance.subtotal
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals_on_item_delete(sender, instance, **kwargs):
+    """Descuenta el item borrado de los totales de su orden."""
+    origin = kwargs.get('origin')
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return  # Se está borrando la orden completa (cascada)
+    previous = getattr(instance, '_loaded_subtotal', None)
+    _apply_item_delta(instance, -1, -(previous if previous is not None else instance.subtotal))
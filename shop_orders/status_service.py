@@ -0,0 +1,82 @@
+"""
+Transiciones de estado de órdenes en bloque.
+
+Pensado para el almacén, que marca cientos de órdenes como SHIPPED a la vez.
+En lugar de un order.save() por orden (3 signals y un envío FCM cada uno):
+
+1. Un SELECT ... FOR UPDATE para leer los estados actuales.
+2. Validación contra Order.ALLOWED_TRANSITIONS.
+3. Un único UPDATE para todas las órdenes válidas.
+4. Una sola emisión de orders_status_changed (los mismos hooks que
+   Order.save()): deliveries crea Delivery/Warranty con bulk_create y el
+   stock reservado de las canceladas se libera en bloque.
+5. Un solo borrado del cache del dashboard.
+6. Notificaciones push encoladas por lotes en la cola de tareas.
+"""
+from django.db import transaction
+
+from .models import Order
+from .signals import clear_dashboard_cache, orders_status_changed
+from users.tasks import send_bulk_order_status_notifications
+
+NOTIFICATION_BATCH_SIZE = 100
+
+
+def bulk_transition(order_ids, new_status):
+    """
+    Cambia el estado de varias órdenes en una sola operación.
+
+    Las órdenes que no pueden pasar a new_status no se tocan y se reportan;
+    el resto se actualiza igualmente.
+
+    Args:
+        order_ids: IDs de las órdenes
+        new_status: Estado destino (Order.OrderStatus)
+
+    Returns:
+        dict: {'updated': [...], 'unchanged': [...], 'invalid': [{'id', 'status'}], 'not_found': [...]}
+    """
+    order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+
+    with transaction.atomic():
+        rows = Order.objects.select_for_update().filter(id__in=order_ids).values_list('id', 'status', 'user_id')
+        current, users = {}, {}
+        for order_id, order_status, user_id in rows:
+            current[order_id] = order_status
+            users[order_id] = user_id
+
+        updated, unchanged, invalid = [], [], []
+        for order_id in order_ids:
+            if order_id not in current:
+                continue
+            old_status = current[order_id]
+            if old_status == new_status:
+                unchanged.append(order_id)
+            elif new_status in Order.ALLOWED_TRANSITIONS.get(old_status, []):
+                updated.append(order_id)
+            else:
+                invalid.append({'id': order_id, 'status': old_status})
+
+        if updated:
+            Order.objects.filter(id__in=updated).update(status=new_status)
+
+            orders_status_changed.send(
+                sender=Order,
+                order_ids=updated,
+                new_status=new_status,
+                previous_statuses={order_id: current[order_id] for order_id in updated},
+                user_ids={order_id: users[order_id] for order_id in updated},
+            )
+            transaction.on_commit(clear_dashboard_cache)
+
+            for start in range(0, len(updated), NOTIFICATION_BATCH_SIZE):
+                send_bulk_order_status_notifications.delay(
+                    updated[start:start + NOTIFICATION_BATCH_SIZE], new_status
+                )
+
+    return {
+        'updated': updated,
+        'unchanged': unchanged,
+        'invalid': invalid,
+        'not_found': [order_id for order_id in order_ids if order_id not in current],
+    }
@@ -0,0 +1,379 @@
+"""
+Operaciones de inventario en bloque para el checkout.
+
+Todas las funciones reciben un dict {product_id: cantidad} y emiten un número
+constante de queries, sin importar cuántas líneas tenga el carrito.
+
+Modelo de stock:
+- Product.stock: unidades físicas en almacén.
+- Product.reserved_stock: unidades apartadas por órdenes PENDING (Stripe).
+- Disponible para vender = stock - reserved_stock.
+
+Las reservas se toman con UPDATE condicionales sobre la fila del producto
+(nunca select_for_update sobre el catálogo), así que dos checkouts solo
+compiten por el lock de fila mientras dura su propia transacción corta.
+"""
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from products.catalog_service import touch_catalog
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStockError(ValueError):
+    """Uno o más productos no tienen stock suficiente para la cantidad pedida."""
+
+
+def aggregate_quantities(cart_items):
+    """
+    Suma las cantidades por producto (un carrito puede repetir el mismo
+    producto en varias líneas).
+
+    Args:
+        cart_items: Iterable de dicts con 'product_id' y 'quantity'
+
+    Returns:
+        OrderedDict: {product_id: cantidad_total} en orden de aparición
+    """
+    quantities = OrderedDict()
+    for item in cart_items:
+        product_id = int(item['product_id'])
+        quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+    return quantities
+
+
+def _per_product(quantities, field, sign):
+    """CASE id WHEN a THEN field +/- qa ... ELSE field END"""
+    whens = [
+        When(id=product_id, then=F(field) + sign * quantity)
+        for product_id, quantity in quantities.items()
+    ]
+    return Case(*whens, default=F(field), output_field=PositiveIntegerField())
+
+
+def decrement_stock(quantities):
+    """
+    Descuenta el stock de todos los productos en un único UPDATE condicional:
+
+        UPDATE product SET stock = stock - CASE id WHEN ... END
+        WHERE (id = a AND stock >= reserved_stock + qa) OR ...
+
+    Respeta las unidades reservadas por otras órdenes. Si alguna fila no cumple
+    la condición se lanza InsufficientStockError; el llamador debe estar dentro
+    de transaction.atomic() para que el rollback deshaga las filas que sí se
+    actualizaron.
+    """
+    if not quantities:
+        return 0
+
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(id=product_id, stock__gte=F('reserved_stock') + quantity)
+
+    updated = Product.objects.filter(condition).update(
+        stock=_per_product(quantities, 'stock', -1),
+        updated_at=Now(),
+    )
+
+    if updated != len(quantities):
+        # Solo en el camino de error: averiguar qué producto falló para el mensaje
+        raise InsufficientStockError(_insufficient_stock_message(quantities))
+
+    # El detalle muestra el stock; el listado solo cambia si algo se agotó
+    sold_out = _sold_out(quantities)
+    transaction.on_commit(lambda: touch_catalog(list(quantities), listing=sold_out))
+    return updated
+
+
+def _sold_out(quantities):
+    """True si alguno de los productos quedó sin stock disponible (sale de ?in_stock=)."""
+    return Product.objects.filter(id__in=list(quantities), stock__lte=F('reserved_stock')).exists()
+
+
+def _back_in_stock(quantities):
+    """Tras liberar quantities: True si alguno pasó de 0 a tener stock disponible."""
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(id=product_id, stock=F('reserved_stock') + quantity)
+    return Product.objects.filter(condition).exists()
+
+
+def _insufficient_stock_message(quantities):
+    products = Product.objects.filter(id__in=list(quantities)).only('id', 'name', 'stock', 'reserved_stock')
+    for product in products:
+        if product.available_stock < quantities[product.id]:
+            return f"Stock insuficiente para {product.name}. Disponible: {product.available_stock}"
+    return "Stock insuficiente para uno de los productos."
+
+
+# =============================================================================
+# RESERVAS DE STOCK (órdenes pagadas con Stripe)
+# =============================================================================
+
+
+def reservation_ttl():
+    """Duración de una reserva antes de que el sweeper la libere."""
+    return timedelta(minutes=settings.STOCK_RESERVATION_TTL_MINUTES)
+
+
+def reserve_stock(order, quantities):
+    """
+    Aparta stock para una orden PENDING con un único UPDATE condicional
+    (reserved_stock += qty WHERE stock - reserved_stock >= qty) y registra el
+    detalle en StockReservation.
+
+    Raises:
+        InsufficientStockError: si algún producto no tiene stock disponible
+    """
+    from .reservation_models import StockReservation
+
+    if not quantities:
+        return []
+
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(id=product_id, stock__gte=F('reserved_stock') + quantity)
+
+    updated = Product.objects.filter(condition).update(
+        reserved_stock=_per_product(quantities, 'reserved_stock', 1),
+    )
+    if updated != len(quantities):
+        raise InsufficientStockError(_insufficient_stock_message(quantities))
+    if _sold_out(quantities):
+        transaction.on_commit(lambda: touch_catalog(list(quantities)))
+
+    expires_at = timezone.now() + reservation_ttl()
+    return StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def extend_reservations(order, expires_at):
+    """Renueva el vencimiento de las reservas activas de una orden."""
+    from .reservation_models import StockReservation
+
+    return StockReservation.objects.filter(
+        order=order,
+        status=StockReservation.ReservationStatus.ACTIVE
+    ).update(expires_at=expires_at, updated_at=Now())
+
+
+def hold_for_payment_intent(order, payment_intent_id):
+    """
+    Asocia las reservas activas de una orden al PaymentIntent de la app móvil
+    y las renueva por un TTL completo. A diferencia de la sesión de Checkout,
+    un PaymentIntent no vence solo: el sweeper lo cancela en Stripe antes de
+    liberar la reserva (ver release_expired_reservations).
+    """
+    from .reservation_models import StockReservation
+
+    return StockReservation.objects.filter(
+        order=order,
+        status=StockReservation.ReservationStatus.ACTIVE
+    ).update(
+        payment_intent_id=payment_intent_id,
+        expires_at=timezone.now() + reservation_ttl(),
+        updated_at=Now(),
+    )
+
+
+def _cancel_payment_intent(payment_intent_id):
+    """
+    Cancela un PaymentIntent en Stripe. Devuelve False si no se pudo (ya se
+    cobró, está procesando o Stripe no respondió): la orden no debe cancelarse.
+    """
+    try:
+        stripe.PaymentIntent.cancel(payment_intent_id)
+        return True
+    except stripe.error.StripeError as e:
+        try:
+            # Cancelado en un intento anterior
+            return stripe.PaymentIntent.retrieve(payment_intent_id).status == 'canceled'
+        except stripe.error.StripeError:
+            logger.warning(f"No se pudo cancelar el PaymentIntent {payment_intent_id}: {e}")
+            return False
+
+
+def _cancel_open_payment_intents(now):
+    """
+    Antes de cancelar órdenes vencidas pagadas desde la app móvil, cancela sus
+    PaymentIntent en Stripe (fuera de cualquier transacción). Si alguno no se
+    puede cancelar, su reserva se renueva y la orden queda para el webhook.
+    """
+    from .models import Order
+    from .reservation_models import StockReservation
+
+    open_intents = dict(
+        StockReservation.objects.filter(
+            status=StockReservation.ReservationStatus.ACTIVE,
+            expires_at__lte=now,
+            order__status=Order.OrderStatus.PENDING,
+        ).exclude(payment_intent_id='').values_list('order_id', 'payment_intent_id')
+    )
+    for order_id, payment_intent_id in open_intents.items():
+        if not _cancel_payment_intent(payment_intent_id):
+            extend_reservations(order_id, now + reservation_ttl())
+
+
+def _take_active_reservations(order_ids, new_status):
+    """
+    Bloquea y marca las reservas activas de las órdenes dadas. Devuelve el
+    total por producto que se tomó; otra transacción que llegue después (pago
+    vs. sweeper) ya no las verá como ACTIVE.
+    """
+    from .reservation_models import StockReservation
+
+    reservations = list(
+        StockReservation.objects.select_for_update().filter(
+            order_id__in=order_ids,
+            status=StockReservation.ReservationStatus.ACTIVE
+        ).values_list('id', 'product_id', 'quantity')
+    )
+    if not reservations:
+        return OrderedDict()
+
+    StockReservation.objects.filter(id__in=[r[0] for r in reservations]).update(
+        status=new_status, updated_at=Now()
+    )
+
+    quantities = OrderedDict()
+    for _, product_id, quantity in reservations:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def commit_reservations(order_ids):
+    """
+    Convierte en venta las reservas activas de las órdenes dadas: pasan a
+    COMMITTED y se descuentan de stock y reserved_stock en un solo UPDATE.
+    Es idempotente (las reservas ya confirmadas no se vuelven a tomar).
+
+    Returns:
+        OrderedDict: {product_id: cantidad} confirmada
+    """
+    from .reservation_models import StockReservation
+
+    with transaction.atomic():
+        quantities = _take_active_reservations(order_ids, StockReservation.ReservationStatus.COMMITTED)
+        if quantities:
+            Product.objects.filter(id__in=list(quantities)).update(
+                stock=_per_product(quantities, 'stock', -1),
+                reserved_stock=_per_product(quantities, 'reserved_stock', -1),
+                updated_at=Now(),
+            )
+            # El disponible (stock - reservado) no cambia: el listado tampoco
+            transaction.on_commit(lambda: touch_catalog(list(quantities), listing=False))
+        return quantities
+
+
+def commit_order_stock(order):
+    """
+    Convierte en venta el stock de una orden pagada: las reservas activas pasan
+    a COMMITTED y se descuentan de stock y reserved_stock en un solo UPDATE.
+
+    Si la orden no tiene reservas activas (órdenes anteriores a las reservas o
+    reservas ya expiradas) se intenta un descuento directo de sus items; si ya
+    fueron confirmadas por otro proceso no se descuenta nada.
+
+    Raises:
+        InsufficientStockError: si no hay reservas y el stock ya no alcanza
+    """
+    from .reservation_models import StockReservation
+
+    with transaction.atomic():
+        quantities = commit_reservations([order.id])
+        if quantities:
+            return quantities
+
+        if StockReservation.objects.filter(
+            order=order,
+            status=StockReservation.ReservationStatus.COMMITTED
+        ).exists():
+            # Otro proceso ya confirmó esta orden: no descontar dos veces
+            return OrderedDict()
+
+        quantities = aggregate_quantities(
+            order.items.filter(product__isnull=False).values('product_id', 'quantity')
+        )
+        decrement_stock(quantities)
+        return quantities
+
+
+def release_order_stock(order_ids):
+    """
+    Devuelve al disponible el stock reservado por las órdenes dadas
+    (cancelación o expiración). Es idempotente.
+    """
+    from .reservation_models import StockReservation
+
+    with transaction.atomic():
+        quantities = _take_active_reservations(order_ids, StockReservation.ReservationStatus.RELEASED)
+        if quantities:
+            Product.objects.filter(id__in=list(quantities)).update(
+                reserved_stock=_per_product(quantities, 'reserved_stock', -1),
+            )
+            if _back_in_stock(quantities):
+                transaction.on_commit(lambda: touch_catalog(list(quantities)))
+        return quantities
+
+
+def release_expired_reservations(now=None, batch_size=500):
+    """
+    Sweeper: libera las reservas vencidas y cancela las órdenes PENDING cuyo
+    checkout de Stripe fue abandonado. Usa SKIP LOCKED para que varios
+    sweepers (o un pago concurrente) no se bloqueen entre sí.
+
+    Los PaymentIntent abiertos de esas órdenes se cancelan primero en Stripe;
+    si alguno ya no se puede cancelar la orden se deja para el webhook.
+
+    La cancelación pasa por status_service.bulk_transition(), así las órdenes
+    vencidas disparan los mismos hooks que cualquier otra cancelación
+    (liberación de stock, notificaciones, cache del dashboard).
+
+    Returns:
+        int: número de órdenes canceladas
+    """
+    from .models import Order
+    from .reservation_models import StockReservation
+    from .status_service import bulk_transition
+
+    now = now or timezone.now()
+    cancelled = 0
+    _cancel_open_payment_intents(now)
+
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                status=StockReservation.ReservationStatus.ACTIVE,
+                expires_at__lte=now,
+                order__status=Order.OrderStatus.PENDING,
+            ).values_list('order_id', flat=True)[:batch_size]
+            # FOR UPDATE no admite DISTINCT: deduplicar en Python conservando el orden
+            order_ids = list(dict.fromkeys(expired))
+            if not order_ids:
+                break
+
+            # Solo las que siguen PENDING con la fila bloqueada: una orden pagada
+            # mientras tanto no debe cancelarse (PAID -> CANCELLED es válida)
+            pending_ids = list(
+                Order.objects.select_for_update().filter(
+                    id__in=order_ids,
+                    status=Order.OrderStatus.PENDING
+                ).values_list('id', flat=True)
+            )
+            if pending_ids:
+                # El hook release_stock_on_cancel libera sus reservas
+                cancelled += len(bulk_transition(pending_ids, Order.OrderStatus.CANCELLED)['updated'])
+
+    return cancelled
@@ -17,7 +17,7 @@ class StripeRefundService:
     """
     
     @staticmethod
-    def create_refund(payment_intent_id, amount, reason=None, metadata=None):
+    def create_refund(payment_intent_id, amount, reason=None, metadata=None, idempotency_key=None):
         """
         Crear un reembolso en Stripe.
         
@@ -26,6 +26,7 @@ class StripeRefundService:
             amount (Decimal): Monto a reembolsar (en la moneda original)
             reason (str): Razón del reembolso
             metadata (dict): Metadata adicional
+            idempotency_key (str): Clave para que Stripe no duplique el reembolso en reintentos
         
         Returns:
             dict: Información del reembolso creado
@@ -55,6 +56,9 @@ class StripeRefundService:
             if metadata:
                 refund_data['metadata'] = metadata
             
+            if idempotency_key:
+                refund_data['idempotency_key'] = idempotency_key
+            
             # Crear reembolso en Stripe
             refund = stripe.Refund.create(**refund_data)
             
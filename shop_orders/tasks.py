@@ -0,0 +1,16 @@
+"""
+Tareas en segundo plano de órdenes y pagos.
+"""
+from task_queue.queue import task
+
+from . import webhook_service
+from .payment_models import StripeWebhookEvent
+
+
+@task(max_retries=webhook_service.MAX_ATTEMPTS - 1, retry_backoff=5)
+def process_stripe_event(event_pk):
+    """Procesa un evento de Stripe registrado en el ledger (webhook asíncrono)."""
+    event = webhook_service.process_stripe_event(event_pk)
+    if event.status == StripeWebhookEvent.EventStatus.FAILED:
+        # Forzar el reintento con backoff de la cola
+        raise RuntimeError(event.last_error)
@@ -0,0 +1,74 @@
+"""
+Totales desnormalizados de órdenes (Order.item_count y Order.total_price).
+
+Se mantienen de forma incremental con las señales de OrderItem (ver
+signals.update_order_totals_on_item_*). Las escrituras que no pasan por esas
+señales (bulk_create, queryset.update, SQL manual) pueden desviarlos;
+reconcile_order_totals() los recalcula por lotes y repara solo las filas
+que difieren.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order
+
+CENTS = Decimal('0.01')
+
+
+def _real_totals(order_ids):
+    """{order_id: (item_count, total)} calculado desde OrderItem."""
+    rows = Order.objects.filter(id__in=order_ids).order_by().annotate(
+        real_count=Count('items'),
+        real_total=Coalesce(
+            Sum(F('items__price') * F('items__quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    ).values_list('id', 'real_count', 'real_total')
+    return {order_id: (count, Decimal(total).quantize(CENTS)) for order_id, count, total in rows}
+
+
+def reconcile_order_totals(batch_size=1000, dry_run=False, counts_only=False):
+    """
+    Recorre las órdenes por rangos de id y corrige item_count/total_price
+    donde no coinciden con sus items (un bulk_update por lote).
+
+    Returns:
+        dict: {'checked': int, 'repaired': int, 'drifted_ids': [...]} (ids limitado a 100)
+    """
+    checked = 0
+    repaired = 0
+    drifted_ids = []
+    last_id = 0
+
+    while True:
+        batch = list(
+            Order.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'item_count', 'total_price')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        checked += len(batch)
+
+        real = _real_totals([row[0] for row in batch])
+        to_update = []
+        for order_id, item_count, total_price in batch:
+            real_count, real_total = real[order_id]
+            total_drift = not counts_only and Decimal(total_price).quantize(CENTS) != real_total
+            if item_count != real_count or total_drift:
+                order = Order(id=order_id, item_count=real_count, total_price=real_total)
+                to_update.append(order)
+                if len(drifted_ids) < 100:
+                    drifted_ids.append(order_id)
+
+        if to_update and not dry_run:
+            fields = ['item_count'] if counts_only else ['item_count', 'total_price']
+            with transaction.atomic():
+                Order.objects.bulk_update(to_update, fields)
+        repaired += len(to_update)
+
+    return {'checked': checked, 'repaired': repaired, 'drifted_ids': drifted_ids}
@@ -12,6 +12,7 @@ from .views import (
     admin_users_list,
     admin_sales_analytics,
     CartNaturalLanguageView,
+    CartNaturalLanguageBatchView,
     ProductSuggestionsView
 )
 
@@ -38,6 +39,7 @@ urlpatterns = [
     
     # 🎤 NUEVO: Carrito con lenguaje natural (texto/voz)
     path('cart/add-natural-language/', CartNaturalLanguageView.as_view(), name='cart-natural-language'),
+    path('cart/add-natural-language/batch/', CartNaturalLanguageBatchView.as_view(), name='cart-natural-language-batch'),
     path('cart/suggestions/', ProductSuggestionsView.as_view(), name='product-suggestions'),
 ]
 
@@ -2,7 +2,7 @@ import stripe
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Count, Sum, Q, F
+from django.db.models import Count, Sum, Q, F, Prefetch
 from django.utils import timezone
 from django.core.cache import cache
 from datetime import datetime, timedelta
@@ -11,39 +11,124 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.pagination import PageNumberPagination
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-from .models import Order, OrderItem
+from .models import Order, OrderItem, InvalidStatusTransition
 from users.permissions import IsAdminOrManager
 
 from .serializers import (
-    OrderSerializer, OrderCreateSerializer,
+    OrderSerializer, OrderListSerializer, OrderCreateSerializer, SimpleProductSerializer,
     CheckoutSessionSerializer, StripeWebhookSerializer,
-    NLPCartRequestSerializer, NLPCartResponseSerializer,
+    NLPCartRequestSerializer, NLPCartBatchRequestSerializer, NLPCartResponseSerializer,
     ProductSuggestionsResponseSerializer,
     DashboardResponseSerializer, AdminUsersResponseSerializer,
     SalesAnalyticsResponseSerializer
 )
+from ecommerce_api.pagination import KeysetPageNumberPagination
 from products.models import Product
+from .nlp_grammar import split_transcript
 from .nlp_service import CartNLPService
+from .order_filters import apply_order_filters
+from .status_service import bulk_transition
+from .tasks import process_stripe_event as process_stripe_event_task
+from users.tasks import send_order_status_notification
+from .payment_models import StripeWebhookEvent
+from .webhook_service import FINAL_EVENT_STATUSES, record_event, process_stripe_event
+from .stock_service import (
+    aggregate_quantities, decrement_stock, reserve_stock, extend_reservations,
+    hold_for_payment_intent, reservation_ttl
+)
 from users.permissions import IsAdminUser, IsManagerUser, IsCajeroUser, IsAdminOrManager
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     """Permite el acceso solo al dueño del objeto o a un admin."""
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user or request.user.is_staff
+        return obj.user_id == request.user.id or request.user.is_staff
 
 
-class OrderPagination(PageNumberPagination):
-    """Custom pagination for orders - 50 items per page for better UX"""
+class OrderPagination(KeysetPageNumberPagination):
+    """
+    Custom pagination for orders - 50 items per page for better UX.
+    Con ?cursor= usa paginación keyset sobre (created_at, id), sin COUNT(*).
+    """
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 500
 
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderListingMixin:
+    """
+    Queryset y serializer de lectura compartidos por OrderViewSet y AdminOrderViewSet.
+
+    - ?view=compact: OrderListSerializer (conteo de items y primeros nombres de
+      producto, sin descripciones) con columnas restringidas vía .only().
+    - ?fields=id,status,total_price: solo esos campos; los items y el usuario
+      se cargan únicamente si se piden.
+    """
+    READ_ACTIONS = ('list', 'retrieve')
+    # Columnas de Order que necesita cada campo del serializer
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'user': ['user__username'],
+        'created_at': ['created_at'],
+        'status': ['status'],
+        'total_price': ['total_price'],
+        'total_amount': ['total_price'],
+        'item_count': ['item_count'],
+        'product_names': [],
+        'items': [],
+    }
+    PRODUCT_COLUMNS = [f'product__{name}' for name in SimpleProductSerializer.Meta.fields]
+
+    def is_compact(self):
+        return self.action in self.READ_ACTIONS and self.request.query_params.get('view') == 'compact'
+
+    def get_requested_fields(self):
+        """Campos pedidos con ?fields= (None = todos)."""
+        if self.action not in self.READ_ACTIONS:
+            return None
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return OrderListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_base_queryset(self):
+        fields = self.get_requested_fields() or list(self.get_serializer_class().Meta.fields)
+        wants_items = bool({'items', 'product_names'} & set(fields))
+        columns = {'id', 'user'}  # user_id: lo usa IsOwnerOrAdmin
+        for name in fields:
+            columns.update(self.FIELD_COLUMNS.get(name, []))
+
+        queryset = Order.objects.order_by('-created_at')
+        if 'user__username' in columns:
+            queryset = queryset.select_related('user')
+        if self.action in self.READ_ACTIONS:
+            # Las escrituras (update, update_status) cargan la fila completa
+            queryset = queryset.only(*columns)
+
+        if wants_items:
+            if self.is_compact():
+                items = OrderItem.objects.only('id', 'order_id', 'product__name')
+            else:
+                items = OrderItem.objects.only('id', 'order_id', 'quantity', 'price', *self.PRODUCT_COLUMNS)
+            # Un solo query para items + producto; no se carga la categoría
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=items.select_related('product').order_by('id'))
+            )
+        return queryset
+
+
+class OrderViewSet(OrderListingMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para ver órdenes. La creación se manejará en un endpoint aparte.
     - list: Un usuario ve sus propias órdenes. Un admin ve todas.
@@ -55,50 +140,16 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        # Optimize query to prevent N+1 problem by prefetching related items and products
-        base_queryset = Order.objects.prefetch_related(
-            'items',                      # Prefetch OrderItems
-            'items__product',             # Prefetch Products within items
-            'items__product__category'    # Prefetch Category within products
-        ).select_related('user').order_by('-created_at')  # Most recent first
+        # Items y productos en un solo prefetch, solo con las columnas serializadas
+        base_queryset = self.get_base_queryset()  # Most recent first
         
         if user.is_staff:
             queryset = base_queryset
         else:
             queryset = base_queryset.filter(user=user)
         
-        # 🔍 FILTROS DINÁMICOS
-        # Filtro por usuario (solo admin/manager)
-        user_id = self.request.query_params.get('user_id', None)
-        if user_id and user.is_staff:
-            queryset = queryset.filter(user_id=user_id)
-        
-        # Filtro por estado
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        # Filtro por rango de fechas
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        
-        if start_date:
-            from datetime import datetime
-            try:
-                start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date__gte=start)
-            except ValueError:
-                pass
-        
-        if end_date:
-            from datetime import datetime
-            try:
-                end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date__lte=end)
-            except ValueError:
-                pass
-        
-        return queryset
+        # 🔍 FILTROS DINÁMICOS (user_id solo admin/manager, status, rango de fechas)
+        return apply_order_filters(queryset, self.request.query_params, allow_user_filter=user.is_staff)
 
 
 class CreateOrderView(APIView):
@@ -120,39 +171,54 @@ class CreateOrderView(APIView):
 
         cart_items = serializer.validated_data['items']
         payment_method = request.data.get('payment_method', 'stripe')  # 'stripe' o 'wallet'
+        # Cantidad total por producto (el carrito puede repetir un producto en varias líneas)
+        quantities = aggregate_quantities(cart_items)
         
         try:
             # Usamos una transacción para asegurar que todas las operaciones de BD 
             # se completen exitosamente o ninguna lo haga.
+            # El número de queries es constante: no depende de cuántas líneas tenga el carrito.
             with transaction.atomic():
-                # 1. Crear la Orden principal
-                order = Order.objects.create(user=request.user)
-                
-                total_order_price = 0
-
-                for item_data in cart_items:
-                    product = Product.objects.get(id=item_data['product_id'])
-                    quantity = item_data['quantity']
-
-                    # 2. Validar stock
-                    if product.stock < quantity:
-                        raise ValueError(f"Stock insuficiente para {product.name}. Disponible: {product.stock}")
-
-                    # 3. Crear el OrderItem
-                    order_item = OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=product.price  # Guardamos el precio actual del producto
+                # 1. Traer todos los productos del carrito en una sola query
+                products = Product.objects.in_bulk(list(quantities))
+                if len(products) != len(quantities):
+                    raise Product.DoesNotExist()
+
+                # 2. Validar stock disponible (sobre la cantidad total pedida de cada producto).
+                #    La garantía real la da el UPDATE condicional de reserva/descuento.
+                for product_id, quantity in quantities.items():
+                    product = products[product_id]
+                    if product.available_stock < quantity:
+                        raise ValueError(f"Stock insuficiente para {product.name}. Disponible: {product.available_stock}")
+
+                # 3. Crear la Orden principal con su total ya calculado
+                order_items = [
+                    OrderItem(
+                        product=products[item_data['product_id']],
+                        quantity=item_data['quantity'],
+                        price=products[item_data['product_id']].price  # Guardamos el precio actual del producto
                     )
+                    for item_data in cart_items
+                ]
+                total_order_price = sum(item.price * item.quantity for item in order_items)
+                order = Order.objects.create(
+                    user=request.user,
+                    total_price=total_order_price,
+                    item_count=len(order_items)
+                )
 
-                    total_order_price += order_item.price * order_item.quantity
-                
-                # 4. Actualizar el precio total de la orden
-                order.total_price = total_order_price
-                order.save()
+                # 4. Crear todos los OrderItems en un solo INSERT (bulk_create no dispara
+                #    las señales que mantienen item_count/total_price: ya se fijaron arriba)
+                for order_item in order_items:
+                    order_item.order = order
+                OrderItem.objects.bulk_create(order_items)
+
+                # 5a. PAGO CON STRIPE: apartar el stock hasta que llegue el webhook
+                #     (el sweeper lo libera si el checkout se abandona)
+                if payment_method != 'wallet':
+                    reserve_stock(order, quantities)
 
-                # 5. SI EL PAGO ES CON BILLETERA, PROCESARLO INMEDIATAMENTE
+                # 5b. SI EL PAGO ES CON BILLETERA, PROCESARLO INMEDIATAMENTE
                 if payment_method == 'wallet':
                     try:
                         from users.wallet_models import Wallet, WalletTransaction
@@ -174,15 +240,11 @@ class CreateOrderView(APIView):
                             reference_id=str(order.id)
                         )
                         
-                        # Actualizar estado de la orden a PAID
-                        order.status = Order.OrderStatus.PAID
-                        order.save()
+                        # Reducir stock de todos los productos en un único UPDATE condicional
+                        decrement_stock(quantities)
                         
-                        # Reducir stock de los productos
-                        for item in order.items.all():
-                            product = item.product
-                            product.stock -= item.quantity
-                            product.save()
+                        # Actualizar estado de la orden a PAID
+                        order.transition_to(Order.OrderStatus.PAID)
                         
                         print(f"✅ Orden #{order.id} pagada con billetera. Saldo restante: ${wallet.balance}")
                     
@@ -193,7 +255,8 @@ class CreateOrderView(APIView):
                         print(f"❌ Error procesando pago con billetera: {str(e)}")
                         raise ValueError(f"Error procesando pago con billetera: {str(e)}")
 
-            # Devolver la orden creada y serializada
+            # Devolver la orden creada y serializada (items y productos en 2 queries fijas)
+            order = Order.objects.select_related('user').prefetch_related('items__product').get(pk=order.pk)
             final_order_serializer = OrderSerializer(order)
             response_data = final_order_serializer.data
             
@@ -244,6 +307,15 @@ class CreateCheckoutSessionView(APIView):
                 'quantity': item.quantity,
             })
 
+        # La sesión de Stripe vence junto con la reserva de stock, así un checkout
+        # abandonado no puede pagarse después de que el sweeper libere el stock.
+        session_options = {}
+        ttl = reservation_ttl()
+        if timedelta(minutes=30) <= ttl <= timedelta(hours=24):
+            expires_at = timezone.now() + ttl
+            extend_reservations(order, expires_at)
+            session_options['expires_at'] = int(expires_at.timestamp())
+
         try:
             # Crea la sesión de Checkout en Stripe
             checkout_session = stripe.checkout.Session.create(
@@ -256,7 +328,8 @@ class CreateCheckoutSessionView(APIView):
                 # para saber qué orden actualizar cuando el pago se complete.
                 metadata={
                     'order_id': order.id
-                }
+                },
+                **session_options
             )
             # Devolvemos la URL de pago al frontend
             return Response({'checkout_url': checkout_session.url})
@@ -332,11 +405,11 @@ class CreatePaymentIntentView(APIView):
             
             # 4. Crear descripción de los items
             items_description = ', '.join([
-                f"{item.product.name} x{item.quantity}" 
-                for item in order.items.all()[:3]  # Limitar a 3 items para la descripción
+                f"{item.product.name if item.product else 'Producto eliminado'} x{item.quantity}" 
+                for item in order.items.select_related('product')[:3]  # Limitar a 3 items para la descripción
             ])
-            if order.items.count() > 3:
-                items_description += f' (+{order.items.count() - 3} más)'
+            if order.item_count > 3:
+                items_description += f' (+{order.item_count - 3} más)'
             
             # 5. Crear el Payment Intent en Stripe
             payment_intent = stripe.PaymentIntent.create(
@@ -355,6 +428,10 @@ class CreatePaymentIntentView(APIView):
                 },
             )
             
+            # El PaymentIntent no vence solo: la reserva se renueva y queda
+            # asociada a él para que el sweeper lo cancele antes de liberarla
+            hold_for_payment_intent(order, payment_intent.id)
+            
             # 6. Devolver el client_secret y datos necesarios para Flutter
             return Response({
                 'client_secret': payment_intent.client_secret,
@@ -380,6 +457,10 @@ class StripeWebhookView(APIView):
     """
     Escucha los eventos de Stripe. Específicamente, cuando una sesión de checkout se completa,
     actualiza el estado de la orden correspondiente a 'PAGADO'.
+    
+    Cada evento se registra en StripeWebhookEvent (deduplicado por event id), así
+    los reintentos y duplicados de Stripe nunca reprocesan una orden.
+    Ver shop_orders/webhook_service.py.
     """
     permission_classes = [permissions.AllowAny]  # Los webhooks vienen de Stripe, no de un usuario
     serializer_class = StripeWebhookSerializer
@@ -404,59 +485,28 @@ class StripeWebhookView(APIView):
             # Firma inválida
             return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Función auxiliar para procesar el pago de una orden
-        def process_order_payment(order_id):
-            """Procesa el pago de una orden: reduce stock y actualiza estado"""
-            try:
-                order = Order.objects.get(id=order_id)
-                # Verificar que la orden no esté ya pagada para evitar reprocesarla
-                if order.status == Order.OrderStatus.PENDING:
-                    # ✅ Reducir stock SOLO cuando se confirma el pago
-                    for item in order.items.all():
-                        if item.product:
-                            product = item.product
-                            # Verificar que haya stock suficiente
-                            if product.stock >= item.quantity:
-                                product.stock -= item.quantity
-                                product.save()
-                            else:
-                                # Si no hay stock, cancelar la orden y reembolsar
-                                order.status = Order.OrderStatus.CANCELLED
-                                order.save()
-                                # TODO: Implementar reembolso automático en Stripe
-                                return Response(
-                                    {'error': f'Stock insuficiente para {product.name}'},
-                                    status=status.HTTP_400_BAD_REQUEST
-                                )
-                    
-                    # Cambiar estado a PAID después de reducir stock
-                    order.status = Order.OrderStatus.PAID
-                    order.save()
-                    return Response(status=status.HTTP_200_OK)
-                return Response(status=status.HTTP_200_OK)
-            except Order.DoesNotExist:
-                return Response({'error': 'Orden no encontrada'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Manejar el evento checkout.session.completed (para pagos web)
+        # Validar metadatos de la sesión de checkout antes de registrarla. Un
+        # payment_intent.succeeded sin order_id es el PaymentIntent de una
+        # sesión de Checkout: se registra como IGNORED y se responde 200 (con
+        # un 400 Stripe lo reintentaría durante días)
         if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            order_id = session.get('metadata', {}).get('order_id')
-            
-            if order_id is None:
+            if (event['data']['object'].get('metadata') or {}).get('order_id') is None:
                 return Response({'error': 'Falta order_id en los metadatos de Stripe'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            return process_order_payment(order_id)
-        
-        # 📱 Manejar el evento payment_intent.succeeded (para pagos móviles con Payment Intent)
-        elif event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            order_id = payment_intent.get('metadata', {}).get('order_id')
-            
-            if order_id is None:
-                return Response({'error': 'Falta order_id en los metadatos del PaymentIntent'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            return process_order_payment(order_id)
 
+        # Registrar el evento en el ledger (deduplicado por event id)
+        webhook_event, created = record_event(event)
+        if webhook_event.status in FINAL_EVENT_STATUSES:
+            # Evento repetido o que no nos interesa: Stripe solo necesita un 200
+            return Response(status=status.HTTP_200_OK)
+
+        # Modo asíncrono: responder de inmediato, la cola de tareas procesa el evento
+        if settings.STRIPE_WEBHOOK_ASYNC:
+            process_stripe_event_task.delay(webhook_event.pk)
+            return Response(status=status.HTTP_200_OK)
+
+        webhook_event = process_stripe_event(webhook_event.pk)
+        if webhook_event.status == StripeWebhookEvent.EventStatus.FAILED:
+            return Response({'error': webhook_event.last_error}, status=status.HTTP_404_NOT_FOUND)
         return Response(status=status.HTTP_200_OK)
 
 
@@ -465,18 +515,23 @@ class StripeWebhookView(APIView):
 # =============================================================================
 
 
-class AdminOrderViewSet(viewsets.ModelViewSet):
+class AdminOrderViewSet(OrderListingMixin, viewsets.ModelViewSet):
     """
     ViewSet para administración completa de órdenes (solo admins y managers)
     - GET /api/admin/orders/ - Lista todas las órdenes
     - GET /api/admin/orders/{id}/ - Detalle de una orden
     - PATCH /api/admin/orders/{id}/ - Actualizar estado de orden
     - DELETE /api/admin/orders/{id}/ - Eliminar orden
+    - POST /api/orders/admin/bulk_update_status/ - Cambiar estado de muchas órdenes
     
     🔍 Soporta filtros:
     - ?status=DELIVERED
     - ?user_id=7
     - ?start_date=2025-11-01&end_date=2025-11-17
+    
+    📦 Formato de respuesta:
+    - ?view=compact (total, estado, conteo de items, primeros productos)
+    - ?fields=id,status,total_price
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAdminOrManager]
@@ -490,45 +545,11 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
         """
         Retorna queryset optimizado con prefetch y filtros dinámicos
         """
-        # Base queryset optimizado para evitar N+1
-        queryset = Order.objects.prefetch_related(
-            'items',
-            'items__product',
-            'items__product__category'
-        ).select_related('user').order_by('-created_at')
-        
-        # 🔍 FILTROS DINÁMICOS
-        # Filtro por usuario
-        user_id = self.request.query_params.get('user_id', None)
-        if user_id:
-            queryset = queryset.filter(user_id=user_id)
-        
-        # Filtro por estado
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        # Filtro por rango de fechas
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        
-        if start_date:
-            from datetime import datetime
-            try:
-                start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date__gte=start)
-            except ValueError:
-                pass
+        # Base queryset optimizado para evitar N+1 (ver OrderListingMixin)
+        queryset = self.get_base_queryset()
         
-        if end_date:
-            from datetime import datetime
-            try:
-                end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date__lte=end)
-            except ValueError:
-                pass
-        
-        return queryset
+        # 🔍 FILTROS DINÁMICOS (user_id, status, rango de fechas)
+        return apply_order_filters(queryset, self.request.query_params)
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -566,34 +587,70 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Guardar estado anterior para comparación
-        old_status = order.status
-        
-        order.status = new_status
-        order.save()
+        # Validar contra la máquina de estados; los efectos secundarios
+        # (delivery, garantías, liberar stock) corren solo si hubo transición
+        try:
+            with transaction.atomic():
+                changed = order.transition_to(new_status)
+        except InvalidStatusTransition as e:
+            return Response(
+                {
+                    'error': str(e),
+                    'current_status': order.status,
+                    'allowed_statuses': Order.ALLOWED_TRANSITIONS.get(order.status, [])
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # 📱 Enviar notificación push si el estado cambió
-        if old_status != new_status:
-            try:
-                from users.push_notification_service import PushNotificationService
-                
-                notification_result = PushNotificationService.send_order_status_update_notification(
-                    user=order.user,
-                    order=order,
-                    new_status=new_status
-                )
-                
-                if notification_result.get('success'):
-                    print(f"✅ Notificación enviada a {order.user.username} - Orden #{order.id} cambió a {new_status}")
-                else:
-                    print(f"⚠️ No se pudo enviar notificación: {notification_result.get('error', 'Sin detalles')}")
-                    
-            except Exception as e:
-                # No fallar la petición si falla la notificación
-                print(f"❌ Error al enviar notificación: {e}")
+        # 📱 Enviar notificación push si el estado cambió (en segundo plano,
+        # después del commit: la respuesta no espera a FCM)
+        if changed:
+            send_order_status_notification.delay(order.id, new_status)
         
         serializer = self.get_serializer(order)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """
+        Cambia el estado de muchas órdenes a la vez
+        POST /api/orders/admin/bulk_update_status/
+        Body: {"order_ids": [1, 2, 3], "status": "SHIPPED"}
+        
+        Valida cada transición contra Order.ALLOWED_TRANSITIONS, aplica las
+        válidas en un único UPDATE y reporta el resto. Las notificaciones push
+        se envían por lotes en segundo plano.
+        """
+        order_ids = request.data.get('order_ids')
+        new_status = request.data.get('status')
+        
+        if not isinstance(order_ids, list) or not order_ids or not new_status:
+            return Response(
+                {'error': 'Se requieren "order_ids" (lista no vacía) y "status"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        new_status = str(new_status).upper()
+        valid_statuses = [choice[0] for choice in Order.OrderStatus.choices]
+        if new_status not in valid_statuses:
+            return Response(
+                {
+                    'error': f'Estado inválido. Debe ser uno de: {", ".join(valid_statuses)}',
+                    'received_status': new_status,
+                    'valid_statuses': valid_statuses
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            result = bulk_transition(order_ids, new_status)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': '"order_ids" debe contener solo IDs numéricos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'status': new_status, **result})
 
 
 @extend_schema(
@@ -780,6 +837,20 @@ def admin_sales_analytics(request):
 # ============================================================================
 
 
+def _nlp_cart_item(product, quantity):
+    """Ítem de carrito devuelto por los endpoints de lenguaje natural."""
+    return {
+        'product_id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'quantity': quantity,
+        'subtotal': str(product.price * quantity),
+        'stock_available': product.available_stock,
+        'image_url': product.image_url
+    }
+
+
 class CartNaturalLanguageView(APIView):
     """
     🎤 Vista para agregar productos al carrito usando lenguaje natural (texto o voz)
@@ -819,40 +890,14 @@ class CartNaturalLanguageView(APIView):
         # Si la acción es 'add', devolver productos para agregar al carrito
         if result['action'] == 'add' and result['items']:
             try:
-                # Validar stock y obtener información de productos
+                # Validar stock y obtener información de productos (un solo query)
                 items_data = []
                 total_price = 0
+                products = Product.objects.in_bulk([item['product_id'] for item in result['items']])
                 
                 for item in result['items']:
-                    try:
-                        product = Product.objects.get(id=item['product_id'])
-                        
-                        # Validar stock disponible
-                        if product.stock < item['quantity']:
-                            return Response(
-                                {
-                                    'success': False,
-                                    'error': f'Stock insuficiente para "{product.name}". Stock disponible: {product.stock}',
-                                    'prompt': prompt
-                                },
-                                status=status.HTTP_400_BAD_REQUEST
-                            )
-                        
-                        # Agregar información del producto
-                        items_data.append({
-                            'product_id': product.id,
-                            'name': product.name,
-                            'description': product.description,
-                            'price': str(product.price),
-                            'quantity': item['quantity'],
-                            'subtotal': str(product.price * item['quantity']),
-                            'stock_available': product.stock,
-                            'image_url': product.image_url if hasattr(product, 'image_url') else None
-                        })
-                        
-                        total_price += product.price * item['quantity']
-                    
-                    except Product.DoesNotExist:
+                    product = products.get(item['product_id'])
+                    if product is None:
                         return Response(
                             {
                                 'success': False,
@@ -861,6 +906,27 @@ class CartNaturalLanguageView(APIView):
                             },
                             status=status.HTTP_404_NOT_FOUND
                         )
+                    
+                    # Validar stock disponible (descontando lo reservado por checkouts pendientes)
+                    if product.available_stock < item['quantity']:
+                        return Response(
+                            {
+                                'success': False,
+                                'error': f'Stock insuficiente para "{product.name}". Stock disponible: {product.available_stock}',
+                                'prompt': prompt
+                            },
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    
+                    # Agregar información del producto, con la confianza del
+                    # match y alternativas (para "¿quisiste decir...?")
+                    items_data.append({
+                        **_nlp_cart_item(product, item['quantity']),
+                        'confidence': item['confidence'],
+                        'candidates': item['candidates']
+                    })
+                    
+                    total_price += product.price * item['quantity']
                 
                 # Devolver productos para que el frontend los agregue al carrito
                 return Response(
@@ -907,6 +973,88 @@ class CartNaturalLanguageView(APIView):
         )
 
 
+class CartNaturalLanguageBatchView(APIView):
+    """
+    🎤 Varios comandos de carrito en una sola solicitud (kioscos y sesiones de voz)
+    POST /api/orders/cart/add-natural-language/batch/
+    
+    Body: {"prompts": ["Agrega 2 laptops", "Quita 1 mouse"]}
+      o   {"transcript": "Agrega 2 laptops y luego 1 mouse. Quita el mouse"}
+    
+    Todos los comandos se resuelven contra el mismo snapshot del catálogo y
+    los cambios se validan con un solo query de productos. El servidor no
+    conoce el carrito del cliente, así que la respuesta son cambios:
+    - cart_action 'update_cart': sumar "items" y restar "removed_items" del
+      carrito actual;
+    - cart_action 'replace_cart': el lote empezó con (o incluye) "vaciar el
+      carrito", así que "items" es el carrito completo.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = NLPCartBatchRequestSerializer
+    
+    def post(self, request):
+        serializer = NLPCartBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        prompts = [prompt.strip() for prompt in serializer.validated_data.get('prompts', []) if prompt.strip()]
+        if not prompts:
+            prompts = split_transcript(serializer.validated_data.get('transcript', ''))
+        if len(prompts) > NLPCartBatchRequestSerializer.MAX_PROMPTS:
+            return Response(
+                {'error': f'Máximo {NLPCartBatchRequestSerializer.MAX_PROMPTS} comandos por solicitud'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        batch = CartNLPService.parse_cart_batch(prompts)
+        
+        # Validar los cambios combinados (un solo query); lo agregado contra
+        # el stock disponible
+        products = Product.objects.in_bulk(list(batch['changes']))
+        cart_items, removed_items, errors, total_price = [], [], [], 0
+        for product_id, quantity in batch['changes'].items():
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                errors.append(f'Producto con ID {product_id} no encontrado')
+            elif quantity < 0:
+                removed_items.append({'product_id': product.id, 'name': product.name, 'quantity': -quantity})
+            elif product.available_stock < quantity:
+                errors.append(f'Stock insuficiente para "{product.name}". Stock disponible: {product.available_stock}')
+            else:
+                cart_items.append(_nlp_cart_item(product, quantity))
+                total_price += product.price * quantity
+        
+        results = [
+            {
+                'prompt': result['prompt'],
+                'success': result['error'] is None,
+                'interpreted_action': result['action'],
+                'items': result['items'],
+                'error': result['error']
+            }
+            for result in batch['results']
+        ]
+        errors = [result['error'] for result in results if result['error']] + errors
+        
+        return Response(
+            {
+                'success': not errors,
+                'message': (
+                    f'Se interpretaron {len(results)} comando(s); '
+                    f'{len(cart_items)} producto(s) para agregar y {len(removed_items)} para quitar'
+                ),
+                'count': len(results),
+                'results': results,
+                'items': cart_items,
+                'removed_items': removed_items,
+                'total': str(total_price),
+                'errors': errors,
+                # 'replace_cart' solo si el lote vació el carrito; si no, aplicar los cambios
+                'cart_action': 'replace_cart' if batch['clears_cart'] else 'update_cart'
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 class ProductSuggestionsView(APIView):
     """
     🔍 Vista para obtener sugerencias de productos (autocompletado)
@@ -0,0 +1,209 @@
+"""
+Procesamiento idempotente de eventos de webhook de Stripe.
+
+Flujo:
+1. La vista verifica la firma y registra el evento en StripeWebhookEvent
+   (unique por event id). Un duplicado ya procesado se responde con 200 sin
+   tocar la orden.
+2. process_stripe_event() confirma el stock y marca la orden como PAID en una
+   transacción corta con lock sobre la fila del evento y de la orden.
+3. La notificación push se encola en la cola de tareas al confirmar la
+   transacción, para no retener locks durante la llamada a FCM.
+4. Un pago que llega para una orden ya cancelada (reserva vencida, sin
+   stock) se reembolsa en Stripe fuera de la transacción y el evento queda
+   REFUNDED; si el reembolso falla queda FAILED y se reintenta. El reembolso
+   es uno por PaymentIntent: un pago por Checkout llega como
+   checkout.session.completed y también como payment_intent.succeeded.
+5. Un payment_intent.succeeded sin order_id en los metadatos (los de Checkout
+   los lleva la sesión, no el PaymentIntent) se registra como IGNORED.
+
+Con STRIPE_WEBHOOK_ASYNC=True la vista solo registra el evento y encola el
+paso 2 en la cola de tareas (shop_orders.tasks.process_stripe_event).
+`python manage.py process_stripe_events` reprocesa lo que haya quedado
+pendiente (por ejemplo, tras reiniciar los workers).
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Order
+from .payment_models import StripeWebhookEvent
+from .stock_service import commit_order_stock, InsufficientStockError
+from .stripe_refund_service import StripeRefundService
+from users.tasks import send_order_status_notification
+
+logger = logging.getLogger(__name__)
+
+# Eventos que confirman el pago de una orden
+PAYMENT_EVENT_TYPES = ('checkout.session.completed', 'payment_intent.succeeded')
+
+# Estados con los que un evento ya no se vuelve a aplicar
+FINAL_EVENT_STATUSES = (
+    StripeWebhookEvent.EventStatus.PROCESSED,
+    StripeWebhookEvent.EventStatus.IGNORED,
+    StripeWebhookEvent.EventStatus.REFUNDED,
+)
+
+# Intentos antes de dejar un evento FAILED para revisión manual
+MAX_ATTEMPTS = 5
+
+
+def record_event(event):
+    """
+    Registra un evento de Stripe en el ledger.
+
+    Returns:
+        tuple: (StripeWebhookEvent, created)
+    """
+    order_id = None
+    payment_intent_id = ''
+    if event['type'] in PAYMENT_EVENT_TYPES:
+        payment = event['data']['object']
+        order_id = (payment.get('metadata') or {}).get('order_id')
+        if event['type'] == 'payment_intent.succeeded':
+            payment_intent_id = payment.get('id') or ''
+        else:
+            payment_intent_id = payment.get('payment_intent') or ''
+
+    defaults = {
+        'event_type': event['type'],
+        'order_id': int(order_id) if order_id else None,
+        'payment_intent_id': payment_intent_id,
+        'status': (
+            StripeWebhookEvent.EventStatus.RECEIVED
+            if order_id
+            else StripeWebhookEvent.EventStatus.IGNORED
+        ),
+    }
+    try:
+        return StripeWebhookEvent.objects.get_or_create(event_id=event['id'], defaults=defaults)
+    except IntegrityError:
+        # Otra copia del evento se insertó entre el SELECT y el INSERT
+        return StripeWebhookEvent.objects.get(event_id=event['id']), False
+
+
+def process_stripe_event(event_pk):
+    """
+    Aplica un evento de pago sobre su orden. Es idempotente: un evento en un
+    estado final no se vuelve a aplicar y las copias concurrentes se
+    serializan con el lock de la fila del evento.
+
+    Returns:
+        StripeWebhookEvent: el evento con su estado final
+    """
+    paid_order = None
+    refund_order = None
+
+    with transaction.atomic():
+        event = StripeWebhookEvent.objects.select_for_update().get(pk=event_pk)
+        if event.status in FINAL_EVENT_STATUSES:
+            return event
+
+        event.attempts += 1
+        try:
+            order = Order.objects.select_for_update().get(id=event.order_id)
+        except Order.DoesNotExist:
+            event.status = StripeWebhookEvent.EventStatus.FAILED
+            event.last_error = f'Orden {event.order_id} no encontrada'
+            event.save(update_fields=['status', 'attempts', 'last_error'])
+            return event
+
+        # Verificar que la orden no esté ya pagada para evitar reprocesarla
+        if order.status == Order.OrderStatus.PENDING:
+            try:
+                # ✅ Reducir stock SOLO cuando se confirma el pago
+                commit_order_stock(order)
+                order.transition_to(Order.OrderStatus.PAID)
+                paid_order = order
+            except InsufficientStockError as e:
+                # Si no hay stock, cancelar la orden y reembolsar el cobro
+                order.transition_to(Order.OrderStatus.CANCELLED)
+                event.last_error = str(e)
+                refund_order = order
+        elif order.status == Order.OrderStatus.CANCELLED:
+            # Cobro de una orden cancelada (p. ej. la reserva venció mientras
+            # el cliente pagaba): no se reactiva, se reembolsa
+            event.last_error = f'Pago recibido para la orden #{order.id} ya cancelada'
+            refund_order = order
+
+        if refund_order is None:
+            event.status = StripeWebhookEvent.EventStatus.PROCESSED
+            event.processed_at = timezone.now()
+        event.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+
+        if paid_order is not None:
+            # Se encola al confirmar la transacción: ningún lock espera a FCM
+            send_order_status_notification.delay(paid_order.id, Order.OrderStatus.PAID)
+
+    if refund_order is not None:
+        # Fuera de la transacción: ningún lock espera a Stripe
+        return _refund_cancelled_order(event, refund_order)
+    return event
+
+
+def _refund_cancelled_order(event, order):
+    """
+    Reembolsa el cobro de una orden cancelada, una sola vez por PaymentIntent:
+    si otro evento del mismo cobro ya lo reembolsó no se vuelve a llamar a
+    Stripe, y la idempotency key por PaymentIntent (con los mismos parámetros
+    en cada llamada) cubre a dos eventos que lleguen a la vez.
+    """
+    if not event.payment_intent_id:
+        event.status = StripeWebhookEvent.EventStatus.FAILED
+        event.last_error = f'{event.last_error}. Sin PaymentIntent para reembolsar: revisar manualmente'
+        event.save(update_fields=['status', 'last_error'])
+        return event
+
+    refunded_by = StripeWebhookEvent.objects.filter(
+        payment_intent_id=event.payment_intent_id,
+        status=StripeWebhookEvent.EventStatus.REFUNDED,
+    ).exclude(pk=event.pk).values_list('event_id', flat=True).first()
+    if refunded_by:
+        event.status = StripeWebhookEvent.EventStatus.REFUNDED
+        event.processed_at = timezone.now()
+        event.last_error = f'{event.last_error}. Ya reembolsado con el evento {refunded_by}'
+        event.save(update_fields=['status', 'processed_at', 'last_error'])
+        return event
+
+    result = StripeRefundService.create_refund(
+        event.payment_intent_id,
+        order.total_price,
+        reason=f'Pago recibido para la orden cancelada #{order.id}',
+        metadata={'order_id': str(order.id)},
+        idempotency_key=f'refund-{event.payment_intent_id}',
+    )
+    if result['success']:
+        event.status = StripeWebhookEvent.EventStatus.REFUNDED
+        event.processed_at = timezone.now()
+        event.save(update_fields=['status', 'processed_at'])
+    else:
+        logger.error(f"No se pudo reembolsar el pago de la orden cancelada #{order.id}: {result['message']}")
+        event.status = StripeWebhookEvent.EventStatus.FAILED
+        event.last_error = f"Reembolso fallido: {result['message']}"
+        event.save(update_fields=['status', 'last_error'])
+    return event
+
+
+def process_pending_events(batch_size=100):
+    """
+    Procesa los eventos RECEIVED/FAILED más antiguos (hasta MAX_ATTEMPTS
+    intentos). Varios workers pueden correr en paralelo: process_stripe_event
+    bloquea cada fila y descarta la que otro worker ya procesó.
+
+    Returns:
+        int: número de eventos procesados en esta pasada
+    """
+    event_ids = list(
+        StripeWebhookEvent.objects.filter(
+            status__in=[StripeWebhookEvent.EventStatus.RECEIVED, StripeWebhookEvent.EventStatus.FAILED],
+            attempts__lt=MAX_ATTEMPTS
+        ).order_by('received_at').values_list('id', flat=True)[:batch_size]
+    )
+
+    for event_id in event_ids:
+        try:
+            process_stripe_event(event_id)
+        except Exception as e:
+            logger.error(f"Error procesando evento de Stripe {event_id}: {e}")
+    return len(event_ids)
@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import DeadLetterTask
+
+
+@admin.register(DeadLetterTask)
+class DeadLetterTaskAdmin(admin.ModelAdmin):
+    """Admin para revisar tareas que agotaron sus reintentos"""
+    list_display = ['id', 'task_name', 'attempts', 'created_at', 'requeued_at']
+    list_filter = ['task_name', 'created_at']
+    search_fields = ['task_name', 'last_error']
+    readonly_fields = ['task_name', 'args', 'kwargs', 'attempts', 'last_error', 'created_at', 'requeued_at']
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        """Las tareas fallidas solo las crea la cola"""
+        return False
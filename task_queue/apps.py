@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class TaskQueueConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'task_queue'
+    verbose_name = 'Cola de Tareas en Segundo Plano'
+
+    def ready(self):
+        """
+        Registrar las tareas de todas las apps: importa el módulo `tasks.py`
+        de cada app instalada (igual que el autodiscover de Celery).
+        """
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from task_queue.models import DeadLetterTask
+from task_queue.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Reencola las tareas en segundo plano que agotaron sus reintentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=str, help='Solo reencolar tareas con este nombre')
+        parser.add_argument('--limit', type=int, default=100, help='Máximo de tareas a reencolar')
+
+    def handle(self, *args, **options):
+        pending = DeadLetterTask.objects.filter(requeued_at__isnull=True).order_by('created_at')
+        if options['task']:
+            pending = pending.filter(task_name=options['task'])
+
+        requeued = 0
+        for dead in pending[:options['limit']]:
+            try:
+                enqueue(dead.task_name, *dead.args, **dead.kwargs)
+            except KeyError as e:
+                self.stdout.write(self.style.WARNING(f'⚠️  {e}'))
+                continue
+            dead.requeued_at = timezone.now()
+            dead.save(update_fields=['requeued_at'])
+            requeued += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Tareas reencoladas: {requeued}'))
@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class DeadLetterTask(models.Model):
+    """
+    Tareas en segundo plano que agotaron sus reintentos.
+
+    Se guardan con sus argumentos para poder revisarlas y reencolarlas con
+    `python manage.py retry_dead_letters`.
+    """
+    task_name = models.CharField(max_length=255, db_index=True)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    requeued_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Tarea Fallida'
+        verbose_name_plural = 'Tareas Fallidas'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.task_name} ({self.attempts} intentos) - {self.created_at:%Y-%m-%d %H:%M}"
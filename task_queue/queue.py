@@ -0,0 +1,177 @@
+"""
+Cola de tareas en segundo plano para efectos secundarios (push, email, auditoría).
+
+Uso:
+    from task_queue.queue import task
+
+    @task(max_retries=5)
+    def send_return_email(kind, return_id):
+        ...
+
+    send_return_email.delay('approved', return_obj.id)
+
+`.delay()` encola la tarea con transaction.on_commit: solo se ejecuta si la
+transacción que la pidió se confirma, y la respuesta HTTP no espera a FCM ni
+al servidor SMTP. Los argumentos deben ser serializables a JSON (IDs, no
+instancias de modelos).
+
+Backends (settings.TASK_QUEUE_BACKEND):
+- 'local': ThreadPoolExecutor dentro del propio proceso de gunicorn.
+- 'celery': broker Redis (CELERY_BROKER_URL) y `celery -A ecommerce_api worker`.
+
+Cada tarea se reintenta con backoff exponencial; al agotar los reintentos se
+guarda en DeadLetterTask. Con TASK_QUEUE_ALWAYS_EAGER=True (tests) la tarea
+corre en el momento, sin esperar al commit.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class Task:
+    """Función registrada como tarea en segundo plano."""
+
+    def __init__(self, func, name, max_retries, retry_backoff):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Encolar la tarea cuando se confirme la transacción actual."""
+        enqueue(self.name, *args, **kwargs)
+
+    def countdown(self, attempt):
+        """Segundos de espera antes del reintento número `attempt` (1, 2, 4, 8... x retry_backoff)."""
+        return self.retry_backoff * (2 ** (attempt - 1))
+
+
+def task(name=None, max_retries=3, retry_backoff=2):
+    """
+    Decorador para registrar una tarea.
+
+    Args:
+        name: Nombre de la tarea (por defecto 'modulo.funcion')
+        max_retries: Reintentos antes de mandarla a DeadLetterTask
+        retry_backoff: Segundos base del backoff exponencial
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registered = Task(func, task_name, max_retries, retry_backoff)
+        _registry[task_name] = registered
+        return registered
+    return decorator
+
+
+def get_task(task_name):
+    try:
+        return _registry[task_name]
+    except KeyError:
+        raise KeyError(f"Tarea no registrada: {task_name}")
+
+
+def enqueue(task_name, *args, **kwargs):
+    """Encola una tarea por nombre (ver Task.delay)."""
+    get_task(task_name)  # Fallar temprano si la tarea no existe
+    args = list(args)
+
+    if settings.TASK_QUEUE_ALWAYS_EAGER:
+        run_eagerly(task_name, args, kwargs)
+        return
+
+    transaction.on_commit(lambda: get_backend().submit(task_name, args, kwargs))
+
+
+def run_eagerly(task_name, args, kwargs):
+    """Ejecuta la tarea en el hilo actual, con sus reintentos pero sin esperas."""
+    registered = get_task(task_name)
+    for attempt in range(1, registered.max_retries + 2):
+        try:
+            registered(*args, **kwargs)
+            return True
+        except Exception as e:
+            error = e
+            logger.warning(f"Tarea {task_name} falló (intento {attempt}): {e}")
+    dead_letter(task_name, args, kwargs, registered.max_retries + 1, error)
+    return False
+
+
+def dead_letter(task_name, args, kwargs, attempts, error):
+    """Guarda una tarea que agotó sus reintentos."""
+    from .models import DeadLetterTask
+
+    logger.error(f"❌ Tarea {task_name} enviada a dead-letter tras {attempts} intentos: {error}")
+    try:
+        DeadLetterTask.objects.create(
+            task_name=task_name,
+            args=args,
+            kwargs=kwargs,
+            attempts=attempts,
+            last_error=str(error)
+        )
+    except Exception as e:
+        logger.error(f"Error guardando DeadLetterTask para {task_name}: {e}")
+
+
+class LocalBackend:
+    """Ejecuta las tareas en un pool de hilos del propio proceso."""
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task-queue')
+
+    def submit(self, task_name, args, kwargs, attempt=1):
+        self.executor.submit(self._run, task_name, args, kwargs, attempt)
+
+    def _run(self, task_name, args, kwargs, attempt):
+        registered = get_task(task_name)
+        close_old_connections()
+        try:
+            registered(*args, **kwargs)
+        except Exception as e:
+            if attempt <= registered.max_retries:
+                logger.warning(f"Tarea {task_name} falló (intento {attempt}), reintentando: {e}")
+                timer = threading.Timer(
+                    registered.countdown(attempt),
+                    self.submit,
+                    args=(task_name, args, kwargs, attempt + 1)
+                )
+                timer.daemon = True
+                timer.start()
+            else:
+                dead_letter(task_name, args, kwargs, attempt, e)
+        finally:
+            # Los hilos del pool no pasan por el ciclo request/response de Django
+            close_old_connections()
+
+
+class CeleryBackend:
+    """Envía las tareas al worker de Celery (ver ecommerce_api/celery.py)."""
+
+    def submit(self, task_name, args, kwargs, attempt=1):
+        from ecommerce_api.celery import run_task
+        run_task.apply_async(args=(task_name, args, kwargs))
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.TASK_QUEUE_BACKEND == 'celery':
+                    _backend = CeleryBackend()
+                else:
+                    _backend = LocalBackend(max_workers=settings.TASK_QUEUE_LOCAL_WORKERS)
+    return _backend
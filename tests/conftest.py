@@ -0,0 +1,20 @@
+"""
+Configuración compartida de pytest
+"""
+
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def eager_task_queue(settings):
+    """Ejecutar las tareas en segundo plano en el momento, sin hilos ni broker"""
+    settings.TASK_QUEUE_ALWAYS_EAGER = True
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cada test empieza con el cache vacío (versión del catálogo, dashboards)"""
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,826 @@
+"""
+Tests unitarios para la creación de órdenes (checkout)
+Verifica que el número de queries no dependa del tamaño del carrito
+"""
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import Product, Category
+from shop_orders.models import Order, OrderItem
+from users.wallet_models import Wallet
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    """Cliente de API para requests"""
+    return APIClient()
+
+
+@pytest.fixture
+def cajero_user(db):
+    """Crea usuario cajero"""
+    return User.objects.create_user(
+        username='cajero_orders',
+        email='cajero@orders.com',
+        password='cajero123',
+        role='CAJERO'
+    )
+
+
+@pytest.fixture
+def admin_user(db):
+    """Crea usuario admin"""
+    return User.objects.create_user(
+        username='admin_orders',
+        email='admin@orders.com',
+        password='admin123',
+        role='ADMIN'
+    )
+
+
+@pytest.fixture
+def category(db):
+    """Crea categoría de prueba"""
+    return Category.objects.create(name='Electrónica', description='Productos electrónicos')
+
+
+@pytest.fixture
+def products(db, category):
+    """Crea 40 productos con stock"""
+    return [
+        Product.objects.create(
+            name=f'Producto {i}',
+            description='Producto para testing',
+            price=Decimal('10.00'),
+            stock=50,
+            category=category
+        )
+        for i in range(40)
+    ]
+
+
+@pytest.fixture
+def funded_wallet(db, cajero_user):
+    """Billetera con saldo suficiente para cualquier carrito de prueba"""
+    return Wallet.objects.create(user=cajero_user, balance=Decimal('100000.00'))
+
+
+def _checkout_queries(api_client, products, payment_method):
+    payload = {
+        'items': [{'product_id': p.id, 'quantity': 2} for p in products],
+        'payment_method': payment_method,
+    }
+    with CaptureQueriesContext(connection) as ctx:
+        response = api_client.post('/api/orders/create/', payload, format='json')
+    assert response.status_code == status.HTTP_201_CREATED, response.data
+    return len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    """Tests de CreateOrderView"""
+
+    def test_creates_order_with_all_items(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [
+                {'product_id': products[0].id, 'quantity': 2},
+                {'product_id': products[1].id, 'quantity': 1},
+            ]
+        }, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        order = Order.objects.get(id=response.data['id'])
+        assert order.status == Order.OrderStatus.PENDING
+        assert order.total_price == Decimal('30.00')
+        assert order.items.count() == 2
+        assert len(response.data['items']) == 2
+
+    def test_unknown_product_returns_404(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [{'product_id': 999999, 'quantity': 1}]
+        }, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert Order.objects.count() == 0
+
+    def test_duplicate_lines_are_checked_against_total_stock(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [
+                {'product_id': products[0].id, 'quantity': 30},
+                {'product_id': products[0].id, 'quantity': 30},
+            ]
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Order.objects.count() == 0
+        assert OrderItem.objects.count() == 0
+
+    def test_wallet_payment_decrements_stock(self, api_client, cajero_user, products, funded_wallet):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [
+                {'product_id': products[0].id, 'quantity': 3},
+                {'product_id': products[1].id, 'quantity': 5},
+            ],
+            'payment_method': 'wallet',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['status'] == Order.OrderStatus.PAID
+        products[0].refresh_from_db()
+        products[1].refresh_from_db()
+        assert products[0].stock == 47
+        assert products[1].stock == 45
+
+    def test_query_count_is_constant_for_stripe_checkout(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        small = _checkout_queries(api_client, products[:2], 'stripe')
+        large = _checkout_queries(api_client, products[2:40], 'stripe')
+        assert small == large
+
+    def test_query_count_is_constant_for_wallet_checkout(self, api_client, cajero_user, products, funded_wallet):
+        api_client.force_authenticate(user=cajero_user)
+        small = _checkout_queries(api_client, products[:2], 'wallet')
+        large = _checkout_queries(api_client, products[2:40], 'wallet')
+        assert small == large
+
+
+@pytest.mark.django_db
+class TestStockReservations:
+    """Tests de reservas de stock para pagos con Stripe"""
+
+    def _create_stripe_order(self, api_client, product, quantity):
+        response = api_client.post('/api/orders/create/', {
+            'items': [{'product_id': product.id, 'quantity': quantity}]
+        }, format='json')
+        return response
+
+    def test_stripe_order_reserves_stock(self, api_client, cajero_user, products):
+        from shop_orders.models import StockReservation
+
+        api_client.force_authenticate(user=cajero_user)
+        response = self._create_stripe_order(api_client, products[0], 20)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        products[0].refresh_from_db()
+        assert products[0].stock == 50
+        assert products[0].reserved_stock == 20
+        assert StockReservation.objects.filter(order_id=response.data['id'], status='ACTIVE').count() == 1
+
+    def test_reserved_units_cannot_be_oversold(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        assert self._create_stripe_order(api_client, products[0], 40).status_code == status.HTTP_201_CREATED
+
+        response = self._create_stripe_order(api_client, products[0], 20)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        products[0].refresh_from_db()
+        assert products[0].reserved_stock == 40
+
+    def test_commit_converts_reservation_into_sale(self, api_client, cajero_user, products):
+        from shop_orders.stock_service import commit_order_stock
+
+        api_client.force_authenticate(user=cajero_user)
+        order = Order.objects.get(id=self._create_stripe_order(api_client, products[0], 5).data['id'])
+
+        commit_order_stock(order)
+        commit_order_stock(order)  # Reintento: no descuenta dos veces
+
+        products[0].refresh_from_db()
+        assert products[0].stock == 45
+        assert products[0].reserved_stock == 0
+
+    def test_sweeper_releases_expired_reservations(self, api_client, cajero_user, products):
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop_orders.stock_service import release_expired_reservations
+
+        api_client.force_authenticate(user=cajero_user)
+        order_id = self._create_stripe_order(api_client, products[0], 5).data['id']
+
+        assert release_expired_reservations() == 0
+        cancelled = release_expired_reservations(now=timezone.now() + timedelta(days=1))
+
+        assert cancelled == 1
+        assert Order.objects.get(id=order_id).status == Order.OrderStatus.CANCELLED
+        products[0].refresh_from_db()
+        assert products[0].stock == 50
+        assert products[0].reserved_stock == 0
+
+    def test_sweeper_cancels_through_state_machine_hooks(self, api_client, cajero_user, products):
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop_orders.signals import orders_status_changed
+        from shop_orders.stock_service import release_expired_reservations
+
+        api_client.force_authenticate(user=cajero_user)
+        pending_id = self._create_stripe_order(api_client, products[0], 5).data['id']
+        paid_id = self._create_stripe_order(api_client, products[1], 5).data['id']
+        # Pagada después de que venciera la reserva: no se toca
+        Order.objects.filter(id=paid_id).update(status=Order.OrderStatus.PAID)
+
+        received = []
+        def receiver(sender, order_ids, new_status, previous_statuses, **kwargs):
+            received.append((order_ids, new_status, previous_statuses))
+        orders_status_changed.connect(receiver)
+        try:
+            cancelled = release_expired_reservations(now=timezone.now() + timedelta(days=1))
+        finally:
+            orders_status_changed.disconnect(receiver)
+
+        assert cancelled == 1
+        assert received == [([pending_id], Order.OrderStatus.CANCELLED, {pending_id: Order.OrderStatus.PENDING})]
+        assert Order.objects.get(id=paid_id).status == Order.OrderStatus.PAID
+
+    def test_admin_marking_order_paid_commits_its_reservation(self, api_client, cajero_user, admin_user, products):
+        from shop_orders.models import StockReservation
+
+        api_client.force_authenticate(user=cajero_user)
+        order_id = self._create_stripe_order(api_client, products[0], 5).data['id']
+
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(f'/api/orders/admin/{order_id}/update_status/', {'status': 'paid'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        products[0].refresh_from_db()
+        assert (products[0].stock, products[0].reserved_stock) == (45, 0)
+        assert StockReservation.objects.get(order_id=order_id).status == 'COMMITTED'
+
+    def test_sweeper_cancels_open_payment_intent_first(self, api_client, mocker, cajero_user, products):
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop_orders.stock_service import hold_for_payment_intent, release_expired_reservations
+
+        api_client.force_authenticate(user=cajero_user)
+        order = Order.objects.get(id=self._create_stripe_order(api_client, products[0], 5).data['id'])
+        hold_for_payment_intent(order, 'pi_abandoned')
+        cancel = mocker.patch('stripe.PaymentIntent.cancel')
+
+        assert release_expired_reservations(now=timezone.now() + timedelta(days=1)) == 1
+
+        cancel.assert_called_once_with('pi_abandoned')
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.CANCELLED
+
+    def test_sweeper_keeps_order_whose_payment_intent_was_charged(self, api_client, mocker, cajero_user, products):
+        import stripe
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop_orders.models import StockReservation
+        from shop_orders.stock_service import hold_for_payment_intent, release_expired_reservations
+
+        api_client.force_authenticate(user=cajero_user)
+        order = Order.objects.get(id=self._create_stripe_order(api_client, products[0], 5).data['id'])
+        hold_for_payment_intent(order, 'pi_paid')
+        mocker.patch('stripe.PaymentIntent.cancel', side_effect=stripe.error.InvalidRequestError('succeeded', None))
+        mocker.patch('stripe.PaymentIntent.retrieve', return_value=mocker.Mock(status='succeeded'))
+
+        now = timezone.now() + timedelta(days=1)
+        assert release_expired_reservations(now=now) == 0
+
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        reservation = StockReservation.objects.get(order=order)
+        assert reservation.status == 'ACTIVE'
+        assert reservation.expires_at > now
+
+
+@pytest.mark.django_db
+class TestStripeWebhook:
+    """Tests del ledger de eventos del webhook de Stripe"""
+
+    def _post_event(self, api_client, mocker, event_id, order_id):
+        event = {
+            'id': event_id,
+            'type': 'checkout.session.completed',
+            'data': {'object': {'metadata': {'order_id': str(order_id)}}},
+        }
+        mocker.patch('stripe.Webhook.construct_event', return_value=event)
+        return api_client.post('/api/orders/stripe-webhook/', {}, format='json', HTTP_STRIPE_SIGNATURE='t=1,v1=x')
+
+    def _pending_order(self, api_client, cajero_user, product, quantity):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [{'product_id': product.id, 'quantity': quantity}]
+        }, format='json')
+        api_client.force_authenticate(user=None)
+        return Order.objects.get(id=response.data['id'])
+
+    def test_payment_event_marks_order_paid(self, api_client, mocker, cajero_user, products):
+        order = self._pending_order(api_client, cajero_user, products[0], 4)
+
+        response = self._post_event(api_client, mocker, 'evt_1', order.id)
+
+        assert response.status_code == status.HTTP_200_OK
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PAID
+        products[0].refresh_from_db()
+        assert products[0].stock == 46
+        assert products[0].reserved_stock == 0
+
+    def test_duplicate_event_is_processed_once(self, api_client, mocker, cajero_user, products):
+        from shop_orders.payment_models import StripeWebhookEvent
+
+        order = self._pending_order(api_client, cajero_user, products[0], 4)
+        self._post_event(api_client, mocker, 'evt_dup', order.id)
+
+        # Simular que la orden volvió a PENDING: un duplicado no debe tocarla
+        Order.objects.filter(id=order.id).update(status=Order.OrderStatus.PENDING)
+        response = self._post_event(api_client, mocker, 'evt_dup', order.id)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert StripeWebhookEvent.objects.filter(event_id='evt_dup').count() == 1
+        products[0].refresh_from_db()
+        assert products[0].stock == 46
+
+    def test_unknown_order_is_recorded_as_failed(self, api_client, mocker, products):
+        from shop_orders.payment_models import StripeWebhookEvent
+
+        response = self._post_event(api_client, mocker, 'evt_missing', 999999)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert StripeWebhookEvent.objects.get(event_id='evt_missing').status == 'FAILED'
+
+    def test_payment_for_cancelled_order_is_refunded(self, api_client, mocker, cajero_user, products):
+        from shop_orders.payment_models import StripeWebhookEvent
+
+        order = self._pending_order(api_client, cajero_user, products[0], 4)
+        order.transition_to(Order.OrderStatus.CANCELLED)
+        event = {
+            'id': 'evt_late',
+            'type': 'payment_intent.succeeded',
+            'data': {'object': {'id': 'pi_late', 'metadata': {'order_id': str(order.id)}}},
+        }
+        mocker.patch('stripe.Webhook.construct_event', return_value=event)
+        refund = mocker.patch('stripe.Refund.create', return_value=mocker.Mock(amount=400))
+
+        response = api_client.post('/api/orders/stripe-webhook/', {}, format='json', HTTP_STRIPE_SIGNATURE='t=1,v1=x')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert StripeWebhookEvent.objects.get(event_id='evt_late').status == 'REFUNDED'
+        assert refund.call_args.kwargs['payment_intent'] == 'pi_late'
+        assert refund.call_args.kwargs['idempotency_key'] == 'refund-pi_late'
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.CANCELLED
+        products[0].refresh_from_db()
+        assert (products[0].stock, products[0].reserved_stock) == (50, 0)
+
+    def test_checkout_and_payment_intent_events_refund_once(self, api_client, mocker, cajero_user, products):
+        from shop_orders.payment_models import StripeWebhookEvent
+
+        order = self._pending_order(api_client, cajero_user, products[0], 4)
+        order.transition_to(Order.OrderStatus.CANCELLED)
+        refund = mocker.patch('stripe.Refund.create', return_value=mocker.Mock(amount=400))
+        metadata = {'order_id': str(order.id)}
+        for event in (
+            {'id': 'evt_session', 'type': 'checkout.session.completed',
+             'data': {'object': {'payment_intent': 'pi_twice', 'metadata': metadata}}},
+            {'id': 'evt_intent', 'type': 'payment_intent.succeeded',
+             'data': {'object': {'id': 'pi_twice', 'metadata': metadata}}},
+        ):
+            mocker.patch('stripe.Webhook.construct_event', return_value=event)
+            response = api_client.post('/api/orders/stripe-webhook/', {}, format='json', HTTP_STRIPE_SIGNATURE='t=1,v1=x')
+            assert response.status_code == status.HTTP_200_OK
+
+        assert refund.call_count == 1
+        assert set(StripeWebhookEvent.objects.values_list('status', flat=True)) == {'REFUNDED'}
+
+    def test_checkout_payment_intent_without_order_id_is_ignored(self, api_client, mocker):
+        from shop_orders.payment_models import StripeWebhookEvent
+
+        event = {
+            'id': 'evt_checkout_pi',
+            'type': 'payment_intent.succeeded',
+            'data': {'object': {'id': 'pi_checkout', 'metadata': {}}},
+        }
+        mocker.patch('stripe.Webhook.construct_event', return_value=event)
+
+        response = api_client.post('/api/orders/stripe-webhook/', {}, format='json', HTTP_STRIPE_SIGNATURE='t=1,v1=x')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert StripeWebhookEvent.objects.get(event_id='evt_checkout_pi').status == 'IGNORED'
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    """Tests de paginación keyset (?cursor=) en listados de órdenes"""
+
+    def _walk(self, api_client, url):
+        ids = []
+        pages = 0
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            ids.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_cursor_walks_all_orders_newest_first(self, api_client, admin_user, cajero_user):
+        from django.utils import timezone
+
+        Order.objects.bulk_create([Order(user=cajero_user) for _ in range(5)])
+        # Mismo timestamp para todas: el id desempata
+        Order.objects.update(created_at=timezone.now())
+        api_client.force_authenticate(user=admin_user)
+
+        ids, pages = self._walk(api_client, '/api/orders/admin/?cursor=&page_size=2')
+
+        assert pages == 3
+        assert ids == list(Order.objects.order_by('-id').values_list('id', flat=True))
+
+    def test_page_number_pagination_is_still_the_default(self, api_client, cajero_user):
+        Order.objects.bulk_create([Order(user=cajero_user) for _ in range(3)])
+        api_client.force_authenticate(user=cajero_user)
+
+        response = api_client.get('/api/orders/?page_size=2')
+
+        assert response.data['count'] == 3
+        assert len(response.data['results']) == 2
+
+    def test_invalid_cursor_returns_404(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get('/api/orders/admin/?cursor=no-es-un-cursor')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestOrderDateFilters:
+    """Tests de filtros por rango de fechas (intervalos semiabiertos)"""
+
+    def _order_at(self, user, when):
+        order = Order.objects.create(user=user)
+        Order.objects.filter(id=order.id).update(created_at=when)
+        return order.id
+
+    def test_end_date_includes_the_whole_day(self, api_client, cajero_user):
+        from datetime import datetime, timezone as dt_timezone
+
+        inside = [
+            self._order_at(cajero_user, datetime(2025, 11, 1, 0, 0, tzinfo=dt_timezone.utc)),
+            self._order_at(cajero_user, datetime(2025, 11, 17, 23, 59, 59, 999999, tzinfo=dt_timezone.utc)),
+        ]
+        self._order_at(cajero_user, datetime(2025, 10, 31, 23, 59, 59, tzinfo=dt_timezone.utc))
+        self._order_at(cajero_user, datetime(2025, 11, 18, 0, 0, tzinfo=dt_timezone.utc))
+        api_client.force_authenticate(user=cajero_user)
+
+        response = api_client.get('/api/orders/?start_date=2025-11-01&end_date=2025-11-17')
+
+        assert sorted(order['id'] for order in response.data['results']) == sorted(inside)
+
+    def test_filtered_admin_listing_uses_an_index(self):
+        from django.db import connection
+        from shop_orders.order_filters import apply_order_filters
+
+        params = {'status': 'PAID', 'start_date': '2025-11-01', 'end_date': '2025-11-17'}
+        queryset = apply_order_filters(Order.objects.order_by('-created_at'), params)
+
+        if connection.vendor == 'postgresql':
+            # Con tablas pequeñas el planner prefiere seq scan: forzar la
+            # alternativa comprueba que el predicado es indexable (un CAST no lo es)
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+            assert 'Index' in plan and 'Seq Scan' not in plan, plan
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            # El rango de fechas debe resolverse dentro del índice, no como filtro posterior
+            assert 'USING INDEX' in plan and 'created_at>' in plan, plan
+        else:
+            pytest.skip('EXPLAIN solo se verifica en PostgreSQL y SQLite')
+
+
+@pytest.mark.django_db
+class TestOrderListingFormats:
+    """Tests de ?view=compact y ?fields= en listados de órdenes"""
+
+    @pytest.fixture
+    def orders_with_items(self, cajero_user, products):
+        Product.objects.update(description='Descripción larga del producto. ' * 40)
+        orders = Order.objects.bulk_create([
+            Order(user=cajero_user, total_price=Decimal('50.00'), item_count=5) for _ in range(5)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders
+            for product in products[:5]
+        ])
+        return orders
+
+    def test_compact_view_lists_counts_and_first_product_names(self, api_client, cajero_user, orders_with_items):
+        api_client.force_authenticate(user=cajero_user)
+
+        response = api_client.get('/api/orders/?view=compact')
+
+        row = response.data['results'][0]
+        assert set(row) == {'id', 'user', 'created_at', 'status', 'total_price', 'item_count', 'product_names'}
+        assert row['item_count'] == 5
+        assert row['product_names'] == ['Producto 0', 'Producto 1', 'Producto 2']
+
+    def test_compact_view_is_much_smaller_than_full_view(self, api_client, cajero_user, orders_with_items):
+        import json
+
+        api_client.force_authenticate(user=cajero_user)
+
+        full = api_client.get('/api/orders/')
+        compact = api_client.get('/api/orders/?view=compact')
+
+        assert len(json.dumps(compact.data, default=str)) * 10 < len(json.dumps(full.data, default=str))
+
+    def test_sparse_fieldset(self, api_client, cajero_user, orders_with_items):
+        api_client.force_authenticate(user=cajero_user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get('/api/orders/?fields=id,status,total_price')
+
+        assert set(response.data['results'][0]) == {'id', 'status', 'total_price'}
+        # Sin items pedidos no hay prefetch: count + página
+        assert not any('shop_orders_orderitem' in q['sql'] for q in ctx.captured_queries)
+
+    def test_list_does_not_load_categories(self, api_client, cajero_user, orders_with_items):
+        api_client.force_authenticate(user=cajero_user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get('/api/orders/')
+
+        assert len(response.data['results'][0]['items']) == 5
+        assert not any('products_category' in q['sql'] for q in ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestBulkStatusTransition:
+    """Tests de cambios de estado en bloque"""
+
+    URL = '/api/orders/admin/bulk_update_status/'
+
+    def _orders(self, user, products, count, order_status):
+        orders = Order.objects.bulk_create([Order(user=user, status=order_status) for _ in range(count)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders
+            for product in products[:2]
+        ])
+        return [order.id for order in orders]
+
+    def test_applies_valid_transitions_and_reports_the_rest(self, api_client, admin_user, cajero_user, products):
+        paid = self._orders(cajero_user, products, 3, Order.OrderStatus.PAID)
+        cancelled = self._orders(cajero_user, products, 1, Order.OrderStatus.CANCELLED)
+        shipped = self._orders(cajero_user, products, 1, Order.OrderStatus.SHIPPED)
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(self.URL, {
+            'order_ids': paid + cancelled + shipped + [999999],
+            'status': 'shipped',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['updated'] == paid
+        assert response.data['unchanged'] == shipped
+        assert response.data['invalid'] == [{'id': cancelled[0], 'status': 'CANCELLED'}]
+        assert response.data['not_found'] == [999999]
+        assert Order.objects.filter(id__in=paid, status='SHIPPED').count() == 3
+        assert Order.objects.get(id=cancelled[0]).status == 'CANCELLED'
+
+    def test_side_effects_are_created_in_bulk(self, api_client, admin_user, cajero_user, products):
+        from deliveries.models import Delivery, Warranty
+
+        pending = self._orders(cajero_user, products, 3, Order.OrderStatus.PENDING)
+        api_client.force_authenticate(user=admin_user)
+
+        api_client.post(self.URL, {'order_ids': pending, 'status': 'PAID'}, format='json')
+        api_client.post(self.URL, {'order_ids': pending, 'status': 'DELIVERED'}, format='json')
+
+        assert Delivery.objects.filter(order_id__in=pending).count() == 3
+        assert Warranty.objects.filter(order_id__in=pending).count() == 6
+
+    def test_query_count_does_not_depend_on_batch_size(self, api_client, admin_user, cajero_user, products, mocker):
+        notify = mocker.patch('shop_orders.status_service.send_bulk_order_status_notifications')
+        small = self._orders(cajero_user, products, 2, Order.OrderStatus.PAID)
+        large = self._orders(cajero_user, products, 30, Order.OrderStatus.PAID)
+        api_client.force_authenticate(user=admin_user)
+
+        counts = []
+        for ids in (small, large):
+            with CaptureQueriesContext(connection) as ctx:
+                api_client.post(self.URL, {'order_ids': ids, 'status': 'DELIVERED'}, format='json')
+            counts.append(len(ctx.captured_queries))
+
+        assert counts[0] == counts[1]
+        assert notify.delay.call_count == 2  # Un lote por petición
+
+    def test_rejects_unknown_status(self, api_client, admin_user):
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(self.URL, {'order_ids': [1], 'status': 'LOST'}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestOrderStateMachine:
+    """Tests de la máquina de estados de Order"""
+
+    def test_save_without_status_change_runs_no_hooks(self, cajero_user):
+        order = Order.objects.create(user=cajero_user, status=Order.OrderStatus.PAID)
+        order = Order.objects.get(id=order.id)
+
+        order.total_price = Decimal('12.00')
+        with CaptureQueriesContext(connection) as ctx:
+            order.save()
+
+        assert len(ctx.captured_queries) == 1  # Solo el UPDATE
+
+    def test_transition_fires_hooks_once(self, cajero_user):
+        from deliveries.models import Delivery
+
+        order = Order.objects.create(user=cajero_user)
+        assert order.transition_to(Order.OrderStatus.PAID) is True
+        assert order.previous_status == Order.OrderStatus.PAID
+        assert order.transition_to(Order.OrderStatus.PAID) is False
+
+        assert Delivery.objects.filter(order=order).count() == 1
+
+    def test_invalid_transition_is_rejected(self, cajero_user):
+        from shop_orders.models import InvalidStatusTransition
+
+        order = Order.objects.create(user=cajero_user, status=Order.OrderStatus.CANCELLED)
+
+        with pytest.raises(InvalidStatusTransition):
+            order.transition_to(Order.OrderStatus.SHIPPED)
+
+    def test_update_status_endpoint_validates_transition(self, api_client, admin_user, cajero_user):
+        order = Order.objects.create(user=cajero_user, status=Order.OrderStatus.DELIVERED)
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(f'/api/orders/admin/{order.id}/update_status/', {'status': 'pending'}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['current_status'] == 'DELIVERED'
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.DELIVERED
+
+    def test_cancel_releases_reserved_stock(self, api_client, admin_user, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        order_id = api_client.post('/api/orders/create/', {
+            'items': [{'product_id': products[0].id, 'quantity': 5}]
+        }, format='json').data['id']
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.post(f'/api/orders/admin/{order_id}/update_status/', {'status': 'CANCELLED'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        products[0].refresh_from_db()
+        assert products[0].reserved_stock == 0
+
+
+@pytest.mark.django_db
+class TestOrderTotals:
+    """Tests de item_count/total_price desnormalizados"""
+
+    def test_checkout_sets_item_count(self, api_client, cajero_user, products):
+        api_client.force_authenticate(user=cajero_user)
+        response = api_client.post('/api/orders/create/', {
+            'items': [{'product_id': p.id, 'quantity': 2} for p in products[:3]]
+        }, format='json')
+
+        order = Order.objects.get(id=response.data['id'])
+        assert order.item_count == 3
+        assert order.total_price == Decimal('60.00')
+
+    def test_item_writes_update_totals_incrementally(self, cajero_user, products):
+        order = Order.objects.create(user=cajero_user)
+        item = OrderItem.objects.create(order=order, product=products[0], quantity=2, price=Decimal('10.00'))
+        OrderItem.objects.create(order=order, product=products[1], quantity=1, price=Decimal('5.00'))
+        assert (order.item_count, order.total_price) == (2, Decimal('25.00'))
+
+        item = OrderItem.objects.get(id=item.id)
+        item.quantity = 3
+        item.save()
+        item.delete()
+
+        order.refresh_from_db()
+        assert order.item_count == 1
+        assert order.total_price == Decimal('5.00')
+
+    def test_deleting_order_cascades_without_errors(self, cajero_user, products):
+        order = Order.objects.create(user=cajero_user)
+        OrderItem.objects.create(order=order, product=products[0], quantity=1, price=Decimal('10.00'))
+
+        order.delete()
+
+        assert OrderItem.objects.count() == 0
+
+    def test_reconcile_repairs_drift(self, cajero_user, products):
+        from django.core.management import call_command
+
+        order = Order.objects.create(user=cajero_user)
+        OrderItem.objects.create(order=order, product=products[0], quantity=2, price=Decimal('10.00'))
+        untouched = Order.objects.create(user=cajero_user)
+        Order.objects.filter(id=order.id).update(item_count=7, total_price=Decimal('1.00'))
+
+        call_command('reconcile_order_totals', '--batch-size=1')
+
+        order.refresh_from_db()
+        assert order.item_count == 1
+        assert order.total_price == Decimal('20.00')
+        untouched.refresh_from_db()
+        assert untouched.item_count == 0
+
+
+class TestNLPGrammar:
+    """Tests de la gramática compilada compartida por el carrito y los reportes"""
+
+    def test_keyword_grammar_finds_overlapping_phrases(self):
+        from shop_orders.nlp_grammar import KeywordGrammar
+
+        grammar = KeywordGrammar({'clear': ['borrar todo'], 'remove': ['borra', 'borrar'], 'group': ['por cliente']})
+
+        assert grammar.labels('borrar todo por cliente') == {'clear', 'remove', 'group'}
+        assert grammar.labels('nada') == set()
+
+    def test_cart_prompts(self):
+        from shop_orders.nlp_grammar import parse_cart_prompt
+
+        assert parse_cart_prompt('Quiero 3 laptops y 1 mouse') == {
+            'action': 'add', 'items': [{'name': 'laptops', 'quantity': 3}, {'name': 'mouse', 'quantity': 1}]
+        }
+        assert parse_cart_prompt('Agregar  mouse gamer')['items'] == [{'name': 'mouse gamer', 'quantity': 1}]
+        assert parse_cart_prompt('quitar todo') == {'action': 'clear', 'items': []}
+        assert parse_cart_prompt('quita 1 mouse')['action'] == 'remove'
+
+    def test_report_prompts(self):
+        from datetime import date
+        from shop_orders.nlp_grammar import parse_report_prompt
+
+        today = date(2025, 11, 20)
+        parsed = parse_report_prompt('Reporte de ventas agrupado por cliente del 1 al 15 de octubre en excel', today=today)
+        assert (parsed['report_type'], parsed['format'], parsed['group_by']) == ('ventas', 'excel', 'customer')
+        assert (parsed['start_date'], parsed['end_date']) == (date(2025, 10, 1), date(2025, 10, 15))
+
+        parsed = parse_report_prompt('ventas del 01/02/2024 al 29/02/2024 con monto total', today=today)
+        assert (parsed['start_date'], parsed['end_date'], parsed['sum_totals']) == (date(2024, 2, 1), date(2024, 2, 29), True)
+
+        parsed = parse_report_prompt('reporte de septiembre', today=today)
+        assert (parsed['start_date'], parsed['end_date']) == (date(2025, 9, 1), date(2025, 9, 30))
+
+        parsed = parse_report_prompt('reporte de ventas', today=today)
+        assert (parsed['start_date'], parsed['end_date']) == (date(2025, 11, 1), date(2025, 11, 30))
+
+    def test_parsed_results_are_cached_copies(self):
+        from shop_orders.nlp_grammar import _parse_report, parse_report_prompt
+
+        first = parse_report_prompt('reporte de ventas de mayo en pdf')
+        first['format'] = 'excel'
+        hits = _parse_report.cache_info().hits
+
+        assert parse_report_prompt('Reporte  de ventas de MAYO en pdf')['format'] == 'pdf'
+        assert _parse_report.cache_info().hits == hits + 1
+
+
+@pytest.mark.django_db
+class TestSalesFeatures:
+    """Extracción por bloques de las características de predicción de ventas"""
+
+    def test_extracts_typed_columns_in_chunks(self, cajero_user, products):
+        from predictions.services import FEATURES, TARGET, extract_sales_features
+
+        paid = Order.objects.create(user=cajero_user, status=Order.OrderStatus.PAID)
+        pending = Order.objects.create(user=cajero_user)
+        for i, product in enumerate(products[:5]):
+            OrderItem.objects.create(order=paid, product=product, quantity=i + 1, price=Decimal('10.50'))
+        OrderItem.objects.create(order=paid, product=None, quantity=7, price=Decimal('3.00'))
+        OrderItem.objects.create(order=pending, product=products[0], quantity=1, price=Decimal('10.00'))
+
+        df = extract_sales_features(chunk_size=2)
+
+        assert list(df.columns) == FEATURES + [TARGET]
+        assert len(df) == 6  # Solo ítems de órdenes pagadas, en 3 bloques
+        assert str(df['product_id'].dtype) == 'category'
+        assert df['price'].dtype == 'float32'
+        assert sorted(df['quantity'].tolist()) == [1, 2, 3, 4, 5, 7]
+
+        orphan = df[df['quantity'] == 7].iloc[0]
+        assert (orphan['product_id'], orphan['category_id']) == (0, 0)
+        assert set(df['year']) == {paid.created_at.year}
+        assert set(df['weekday']) == {paid.created_at.weekday()}
+
+    def test_no_paid_items_returns_error(self, cajero_user):
+        from predictions.services import train_sales_prediction_model
+
+        Order.objects.create(user=cajero_user)
+
+        assert 'error' in train_sales_prediction_model()
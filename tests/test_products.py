@@ -0,0 +1,977 @@
+"""
+Tests unitarios para el catálogo de productos
+Verifica que las calificaciones no generen queries por producto
+"""
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import Product, Category, ProductCoPurchase, ProductRatingSummary, Review
+from products.catalog_service import touch_catalog
+from products.copurchase_service import rebuild_copurchase_matrix
+from products.recommendation_engine import train_recommendation_model
+from products.rating_service import recompute_rating_summaries
+from products.search_service import search_product_ids
+from products.catalog_snapshot import get_catalog_snapshot, reset_catalog_snapshot
+from products.suggestion_index import get_suggestions, reset_suggestion_index
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    """Cliente de API para requests"""
+    return APIClient()
+
+
+@pytest.fixture
+def category(db):
+    """Crea categoría de prueba"""
+    return Category.objects.create(name='Hogar', description='Productos para el hogar')
+
+
+@pytest.fixture
+def reviewers(db):
+    """Crea 3 usuarios que dejan reseñas"""
+    return [
+        User.objects.create_user(username=f'reviewer{i}', email=f'reviewer{i}@test.com', password='pass123')
+        for i in range(3)
+    ]
+
+
+def _create_products(category, reviewers, count):
+    products = Product.objects.bulk_create([
+        Product(name=f'Producto {i}', description='Producto para testing', price=Decimal('10.00'), stock=5, category=category)
+        for i in range(count)
+    ])
+    Review.objects.bulk_create([
+        Review(product=product, user=user, rating=rating, comment='ok')
+        for product in products
+        for user, rating in zip(reviewers, (5, 4, 4))
+    ])
+    # bulk_create no pasa por las vistas ni los signals: reconstruir los
+    # resúmenes y renovar la versión del catálogo
+    recompute_rating_summaries(product_ids=[product.id for product in products])
+    touch_catalog()
+    return products
+
+
+@pytest.mark.django_db
+class TestProductRatings:
+    """Tests de calificaciones agregadas en el listado de productos"""
+
+    def test_list_includes_rating_aggregates(self, api_client, category, reviewers):
+        _create_products(category, reviewers, 1)
+
+        response = api_client.get('/api/products/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['average_rating'] == 4.3
+        assert response.data[0]['review_count'] == 3
+
+    def test_query_count_does_not_depend_on_product_count(self, api_client, category, reviewers):
+        _create_products(category, reviewers, 5)
+        with CaptureQueriesContext(connection) as small:
+            api_client.get('/api/products/')
+
+        _create_products(category, reviewers, 95)
+        with CaptureQueriesContext(connection) as large:
+            response = api_client.get('/api/products/')
+
+        assert len(response.data) == 100
+        assert len(small.captured_queries) == len(large.captured_queries)
+
+    def test_product_without_reviews(self, api_client, category):
+        product = Product.objects.create(name='Nuevo', description='x', price=Decimal('1.00'), stock=1, category=category)
+
+        response = api_client.get(f'/api/products/{product.id}/')
+
+        assert response.data['average_rating'] == 0
+        assert response.data['review_count'] == 0
+
+
+@pytest.mark.django_db
+class TestRatingSummary:
+    """Tests del resumen materializado de calificaciones"""
+
+    @pytest.fixture
+    def product(self, category):
+        return Product.objects.create(name='Lámpara', description='x', price=Decimal('20.00'), stock=3, category=category)
+
+    def _summary(self, product):
+        return ProductRatingSummary.objects.get(product=product)
+
+    def test_review_create_update_delete_keep_summary_in_sync(self, api_client, product, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+        response = api_client.post('/api/products/reviews/', {'product': product.id, 'rating': 5, 'comment': 'genial'})
+        assert response.status_code == status.HTTP_201_CREATED
+        review_id = response.data['id']
+
+        api_client.force_authenticate(user=reviewers[1])
+        api_client.post(f'/api/products/{product.id}/reviews/', {'product': product.id, 'rating': 2, 'comment': 'regular'})
+
+        summary = self._summary(product)
+        assert (summary.review_count, summary.rating_sum) == (2, 7)
+        assert summary.histogram == {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}
+
+        api_client.force_authenticate(user=reviewers[0])
+        api_client.patch(f'/api/products/reviews/{review_id}/', {'rating': 3})
+        summary = self._summary(product)
+        assert (summary.review_count, summary.rating_sum) == (2, 5)
+        assert summary.histogram == {1: 0, 2: 1, 3: 1, 4: 0, 5: 0}
+
+        api_client.delete(f'/api/products/reviews/{review_id}/')
+        summary = self._summary(product)
+        assert (summary.review_count, summary.rating_sum) == (1, 2)
+        assert summary.histogram == {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}
+
+    def test_reviews_endpoint_reads_summary(self, api_client, category, reviewers):
+        product = _create_products(category, reviewers, 1)[0]
+
+        response = api_client.get(f'/api/products/{product.id}/reviews/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 3
+        assert response.data['average_rating'] == 4.3
+        assert response.data['rating_histogram'] == {1: 0, 2: 0, 3: 0, 4: 2, 5: 1}
+        assert len(response.data['reviews']) == 3
+
+    def test_recompute_fixes_drift_and_drops_empty_summaries(self, category, reviewers, product):
+        rated = _create_products(category, reviewers, 1)[0]
+        ProductRatingSummary.objects.filter(product=rated).update(review_count=99, rating_sum=1)
+        ProductRatingSummary.objects.create(product=product, review_count=1, rating_sum=5, stars_5=1)
+
+        written = recompute_rating_summaries()
+
+        assert written == 1
+        summary = self._summary(rated)
+        assert (summary.review_count, summary.rating_sum, summary.stars_4) == (3, 13, 2)
+        assert not ProductRatingSummary.objects.filter(product=product).exists()
+
+
+@pytest.mark.django_db
+class TestProductCatalog:
+    """Tests del listado público: filtros, paginación y cache HTTP"""
+
+    @pytest.fixture
+    def catalog(self, category):
+        other = Category.objects.create(name='Cocina', description='x')
+        return Product.objects.bulk_create([
+            Product(name='Silla', description='x', price=Decimal('30.00'), stock=4, category=category),
+            Product(name='Mesa', description='x', price=Decimal('120.00'), stock=0, category=category),
+            Product(name='Sartén', description='x', price=Decimal('25.00'), stock=9, category=other),
+            Product(name='Oculto', description='x', price=Decimal('50.00'), stock=9, category=category, is_active=False),
+        ])
+
+    def test_filters_and_ordering(self, api_client, category, catalog):
+        response = api_client.get('/api/products/', {'category': category.id, 'ordering': 'price'})
+        assert [p['name'] for p in response.data] == ['Silla', 'Mesa']
+
+        response = api_client.get('/api/products/', {'min_price': '26', 'max_price': '200', 'in_stock': 'true'})
+        assert [p['name'] for p in response.data] == ['Silla']
+
+    def test_pagination_is_opt_in(self, api_client, catalog):
+        assert isinstance(api_client.get('/api/products/').data, list)
+
+        response = api_client.get('/api/products/', {'page_size': 2, 'ordering': '-price'})
+
+        assert response.data['count'] == 3
+        assert [p['name'] for p in response.data['results']] == ['Mesa', 'Silla']
+        assert response.data['next'] is not None
+
+    def test_unchanged_catalog_returns_304_without_queries(self, api_client, catalog):
+        response = api_client.get('/api/products/')
+        etag = response['ETag']
+        assert response['Last-Modified']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert len(queries.captured_queries) == 0
+
+    def test_anonymous_response_is_cached_until_product_changes(self, api_client, catalog, django_capture_on_commit_callbacks):
+        first = api_client.get('/api/products/')
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = api_client.get('/api/products/')
+        assert len(queries.captured_queries) == 0
+        assert cached.data == first.data
+
+        with django_capture_on_commit_callbacks(execute=True):
+            silla = Product.objects.get(name='Silla')
+            silla.price = Decimal('35.00')
+            silla.save()
+
+        response = api_client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != first['ETag']
+        assert next(p for p in response.data if p['name'] == 'Silla')['price'] == '35.00'
+
+    def test_sales_only_change_listing_version_when_a_product_sells_out(
+        self, api_client, catalog, django_capture_on_commit_callbacks
+    ):
+        from collections import OrderedDict
+        from products.catalog_service import get_catalog_version
+        from shop_orders.stock_service import decrement_stock
+
+        silla = next(product for product in catalog if product.name == 'Silla')
+        version = get_catalog_version()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            decrement_stock(OrderedDict({silla.id: 1}))
+        assert get_catalog_version() == version
+
+        with django_capture_on_commit_callbacks(execute=True):
+            decrement_stock(OrderedDict({silla.id: 3}))
+        assert get_catalog_version() > version
+        assert 'Silla' not in [p['name'] for p in api_client.get('/api/products/', {'in_stock': 'true'}).data]
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    """Tests del buscador de productos (versión en memoria en SQLite)"""
+
+    @pytest.fixture
+    def products(self, category):
+        reset_suggestion_index()
+        reset_catalog_snapshot()
+        return {
+            product.name: product
+            for product in Product.objects.bulk_create([
+                Product(name='Teléfono Inalámbrico', description='Para la oficina', price=Decimal('40.00'), stock=3, category=category),
+                Product(name='Smartphone Galaxy', description='Teléfono con cámara', price=Decimal('300.00'), stock=3, category=category),
+                Product(name='Laptop Dell', description='Portátil de 15 pulgadas', price=Decimal('900.00'), stock=3, category=category),
+                Product(name='Laptop Antigua', description='x', price=Decimal('100.00'), stock=3, category=category, is_active=False),
+            ])
+        }
+
+    def test_accent_insensitive_and_name_ranked_first(self, products):
+        results = search_product_ids('telefono')
+
+        assert results == [products['Teléfono Inalámbrico'].id, products['Smartphone Galaxy'].id]
+
+    def test_plural_and_partial_matches(self, products):
+        assert search_product_ids('laptops') == [products['Laptop Dell'].id]
+        assert search_product_ids('smart') == [products['Smartphone Galaxy'].id]
+        assert search_product_ids('  ') == []
+
+    def test_catalog_search_param_ranks_by_relevance(self, api_client, products):
+        response = api_client.get('/api/products/', {'search': 'telefono'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [p['name'] for p in response.data] == ['Teléfono Inalámbrico', 'Smartphone Galaxy']
+
+        response = api_client.get('/api/products/', {'search': 'telefono', 'ordering': '-price'})
+        assert [p['name'] for p in response.data] == ['Smartphone Galaxy', 'Teléfono Inalámbrico']
+        assert api_client.get('/api/products/', {'search': 'zzz'}).data == []
+
+    def test_suggestions_endpoint(self, api_client, products):
+        response = api_client.get('/api/orders/cart/suggestions/', {'q': 'lap'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [s['name'] for s in response.data['suggestions']] == ['Laptop Dell']
+        assert response.data['suggestions'][0]['category'] == 'Hogar'
+
+    def test_cart_command_uses_search(self, products):
+        from shop_orders.nlp_service import CartNLPService
+
+        result = CartNLPService.parse_cart_command('agrega 2 laptops y 1 celular')
+
+        assert result['error'] is None
+        assert [(item['name'], item['quantity']) for item in result['items']] == [
+            ('Laptop Dell', 2), ('Smartphone Galaxy', 1)
+        ]
+
+
+@pytest.mark.django_db
+class TestCatalogSnapshot:
+    """Tests del snapshot en memoria que usa el carrito por lenguaje natural"""
+
+    @pytest.fixture
+    def products(self, category):
+        reset_catalog_snapshot()
+        return Product.objects.bulk_create([
+            Product(name='Mouse Logitech', description='Inalámbrico', price=Decimal('25.00'), stock=10, category=category),
+            Product(name='Laptop Dell', description='Portátil', price=Decimal('900.00'), stock=3, category=category),
+            Product(name='Audífonos AirPods', description='Bluetooth', price=Decimal('200.00'), stock=1, category=category),
+        ])
+
+    def test_multi_item_command_resolves_without_queries(self, products):
+        from shop_orders.nlp_service import CartNLPService
+
+        get_catalog_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            result = CartNLPService.parse_cart_command('quiero 2 laptops, 1 raton y 1 audifonos')
+
+        assert [item['name'] for item in result['items']] == ['Laptop Dell', 'Mouse Logitech', 'Audífonos AirPods']
+        assert len(queries.captured_queries) == 0
+
+    def test_endpoint_reads_products_once(self, api_client, products, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+        get_catalog_snapshot()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post('/api/orders/cart/add-natural-language/', {'prompt': 'agrega 2 laptops y 3 mouse'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total'] == '1875.00'
+        assert sum('products_product' in query['sql'] for query in queries.captured_queries) == 1
+
+    def test_product_changes_refresh_snapshot(self, products, django_capture_on_commit_callbacks):
+        mouse, laptop, _ = products
+        get_catalog_snapshot()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            mouse.name = 'Ratón Razer'
+            mouse.save()
+            laptop.is_active = False
+            laptop.save()
+
+        snapshot = get_catalog_snapshot()
+        assert snapshot.find('razer').id == mouse.id
+        assert snapshot.find('laptop') is None
+
+
+@pytest.mark.django_db
+class TestSuggestionIndex:
+    """Tests del índice en memoria del autocompletado"""
+
+    @pytest.fixture
+    def products(self, category, reviewers):
+        from shop_orders.models import Order, OrderItem
+
+        reset_suggestion_index()
+        galaxy, gamer, gafas = Product.objects.bulk_create([
+            Product(name='Smartphone Galaxy', description='x', price=Decimal('300.00'), stock=3, category=category),
+            Product(name='Silla Gamer', description='x', price=Decimal('150.00'), stock=3, category=category),
+            Product(name='Gafas de Sol', description='x', price=Decimal('20.00'), stock=3, category=category),
+        ])
+        order = Order.objects.create(user=reviewers[0], status=Order.OrderStatus.PAID)
+        OrderItem.objects.create(order=order, product=gafas, quantity=7, price=gafas.price)
+        OrderItem.objects.create(order=order, product=gamer, quantity=2, price=gamer.price)
+        return galaxy, gamer, gafas
+
+    def test_prefix_matches_ranked_by_popularity(self, products):
+        assert [s['name'] for s in get_suggestions('ga')] == ['Gafas de Sol', 'Silla Gamer', 'Smartphone Galaxy']
+        assert [s['name'] for s in get_suggestions('smart gal')] == ['Smartphone Galaxy']
+        assert get_suggestions('xyz') == []
+
+    def test_served_without_queries(self, api_client, products):
+        api_client.get('/api/orders/cart/suggestions/', {'q': 'ga'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/orders/cart/suggestions/', {'q': 'gaf'})
+
+        assert response.data['suggestions'][0]['name'] == 'Gafas de Sol'
+        assert len(queries.captured_queries) == 0
+
+    def test_product_changes_refresh_index_incrementally(self, products, django_capture_on_commit_callbacks):
+        galaxy, gamer, _ = products
+        get_suggestions('ga')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            galaxy.name = 'Smartphone Pixel'
+            galaxy.save()
+            gamer.is_active = False
+            gamer.save()
+
+        assert [s['name'] for s in get_suggestions('ga')] == ['Gafas de Sol']
+        assert [s['name'] for s in get_suggestions('pix')] == ['Smartphone Pixel']
+
+    def test_sales_update_popularity_on_incremental_refresh(self, products, reviewers, django_capture_on_commit_callbacks):
+        from shop_orders.models import Order, OrderItem
+
+        galaxy, _, _ = products
+        assert get_suggestions('ga')[-1]['name'] == 'Smartphone Galaxy'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            order = Order.objects.create(user=reviewers[1], status=Order.OrderStatus.PENDING)
+            OrderItem.objects.create(order=order, product=galaxy, quantity=9, price=galaxy.price)
+            order.transition_to(Order.OrderStatus.PAID)
+
+        assert [s['name'] for s in get_suggestions('ga')] == ['Smartphone Galaxy', 'Gafas de Sol', 'Silla Gamer']
+
+
+@pytest.mark.django_db
+class TestCoPurchaseRecommendations:
+    """Tests de la matriz de co-compra precalculada"""
+
+    @pytest.fixture
+    def catalog(self, category):
+        return Product.objects.bulk_create([
+            Product(name=f'Producto {i}', description='x', price=Decimal('10.00'), stock=50, category=category)
+            for i in range(4)
+        ])
+
+    def _order(self, user, products, status='PENDING'):
+        from shop_orders.models import Order, OrderItem
+
+        order = Order.objects.create(user=user, status=status)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+        return order
+
+    def _pairs(self, product):
+        return dict(ProductCoPurchase.objects.filter(product=product).values_list('related_product_id', 'count'))
+
+    def test_order_created_as_paid_counts_after_commit(self, catalog, reviewers, django_capture_on_commit_callbacks):
+        a, b, _, _ = catalog
+        with django_capture_on_commit_callbacks(execute=True):
+            self._order(reviewers[0], [a, b], status='PAID')
+
+        assert self._pairs(a) == {b.id: 1}
+
+    def test_rebuild_counts_only_sold_orders(self, catalog, reviewers):
+        a, b, c, d = catalog
+        self._order(reviewers[0], [a, b, c], status='PAID')
+        self._order(reviewers[1], [a, b], status='DELIVERED')
+        self._order(reviewers[2], [a, d])  # PENDING: no cuenta
+
+        result = rebuild_copurchase_matrix()
+
+        assert result == {'orders': 2, 'products': 3, 'pairs': 6}
+        assert self._pairs(a) == {b.id: 2, c.id: 1}
+        assert self._pairs(c) == {a.id: 1, b.id: 1}
+
+    def test_top_k_is_applied_when_reading(self, catalog, reviewers):
+        from products.copurchase_service import get_copurchase_recommendations
+
+        a, b, c, _ = catalog
+        self._order(reviewers[0], [a, b, c], status='PAID')
+        self._order(reviewers[1], [a, b], status='PAID')
+
+        rebuild_copurchase_matrix()
+
+        assert self._pairs(a) == {b.id: 2, c.id: 1}
+        assert [p.id for p in get_copurchase_recommendations(a.id, limit=1)] == [b.id]
+
+    def test_incremental_counts_match_a_rebuild(self, catalog, reviewers, django_capture_on_commit_callbacks):
+        a, b, c, _ = catalog
+        self._order(reviewers[0], [a, b, c], status='PAID')
+        self._order(reviewers[1], [a, b], status='PAID')
+        rebuild_copurchase_matrix()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self._order(reviewers[2], [a, c], status='PAID')
+        incremental = self._pairs(a)
+
+        rebuild_copurchase_matrix()
+        assert incremental == self._pairs(a) == {b.id: 2, c.id: 2}
+
+    def test_paid_and_cancelled_transitions_update_matrix(self, catalog, reviewers, django_capture_on_commit_callbacks):
+        a, b, c, _ = catalog
+        first = self._order(reviewers[0], [a, b])
+        second = self._order(reviewers[1], [a, b, c])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first.transition_to('PAID')
+            second.transition_to('PAID')
+        assert self._pairs(a) == {b.id: 2, c.id: 1}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            second.transition_to('CANCELLED')
+        assert self._pairs(a) == {b.id: 1}
+        assert self._pairs(c) == {}
+
+    def test_endpoint_reads_precomputed_neighbours(self, api_client, catalog, reviewers):
+        a, b, c, d = catalog
+        self._order(reviewers[0], [a, b, c], status='PAID')
+        self._order(reviewers[1], [a, c], status='PAID')
+        Product.objects.filter(id=b.id).update(is_active=False)
+        rebuild_copurchase_matrix()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f'/api/products/{a.id}/recommendations/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [p['id'] for p in response.data['recommendations']] == [c.id]
+        assert len(queries.captured_queries) == 2
+
+    def test_falls_back_to_orders_until_matrix_is_built(self, catalog, reviewers):
+        from products.copurchase_service import get_copurchase_recommendations
+
+        a, b, c, d = catalog
+        self._order(reviewers[0], [a, b, c], status='PAID')
+        self._order(reviewers[1], [a, c], status='DELIVERED')
+        self._order(reviewers[2], [a, d])  # PENDING: no cuenta
+
+        recommended = get_copurchase_recommendations(a.id)
+
+        assert not ProductCoPurchase.objects.exists()
+        assert [(p.id, p.times_bought_together) for p in recommended] == [(c.id, 2), (b.id, 1)]
+        rebuild_copurchase_matrix()
+        assert [(p.id, p.times_bought_together) for p in get_copurchase_recommendations(a.id)] == [(c.id, 2), (b.id, 1)]
+
+
+@pytest.mark.django_db
+class TestPersonalizedRecommendations:
+    """Tests del motor de filtrado colaborativo item-item"""
+
+    @pytest.fixture(autouse=True)
+    def model_path(self, settings, tmp_path):
+        settings.RECOMMENDATION_MODEL_PATH = str(tmp_path / 'recommendation_model.joblib')
+        return settings.RECOMMENDATION_MODEL_PATH
+
+    @pytest.fixture
+    def catalog(self, category):
+        return Product.objects.bulk_create([
+            Product(name=f'Producto {i}', description='x', price=Decimal('10.00'), stock=50, category=category)
+            for i in range(5)
+        ])
+
+    def _buy(self, user, products, quantity=1):
+        from shop_orders.models import Order, OrderItem
+
+        order = Order.objects.create(user=user, status='PAID')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product in products
+        ])
+
+    def test_recommends_items_bought_by_similar_customers(self, api_client, catalog, reviewers, model_path):
+        import os
+
+        a, b, c, d, e = catalog
+        customer, neighbour, other = reviewers
+        self._buy(customer, [a])
+        self._buy(neighbour, [a, b])
+        self._buy(other, [c, d], quantity=10)
+
+        result = train_recommendation_model()
+        assert result['n_users'] == 3 and os.path.exists(model_path)
+
+        api_client.force_authenticate(user=customer)
+        response = api_client.get('/api/products/personalized/', {'limit': 3})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['strategy_used'] == 'personalized_ai'
+        assert response.data['favorite_categories'] == ['Hogar']
+        ids = [p['id'] for p in response.data['recommendations']]
+        # b por similitud; luego los más vendidos, nunca lo ya comprado
+        assert ids[0] == b.id
+        assert a.id not in ids and len(ids) == 3
+
+    def test_new_customer_gets_popular_products_and_results_are_cached(self, api_client, catalog, reviewers):
+        a, b, c, d, e = catalog
+        self._buy(reviewers[0], [a, b])
+        self._buy(reviewers[1], [c], quantity=5)
+        train_recommendation_model()
+        newcomer = User.objects.create_user(username='nuevo', email='nuevo@test.com', password='pass123')
+
+        api_client.force_authenticate(user=newcomer)
+        response = api_client.get('/api/products/personalized/', {'limit': 2})
+
+        assert response.data['strategy_used'] == 'popular_products'
+        ids = [p['id'] for p in response.data['recommendations']]
+        assert ids[0] == c.id and ids[1] in (a.id, b.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = api_client.get('/api/products/personalized/', {'limit': 2})
+        assert cached.data == response.data
+        assert len(queries.captured_queries) == 0
+
+    def test_without_trained_model_falls_back_to_popular(self, api_client, catalog, reviewers):
+        self._buy(reviewers[1], [catalog[3]])
+
+        api_client.force_authenticate(user=reviewers[0])
+        response = api_client.get('/api/products/personalized/', {'limit': 1})
+
+        assert response.data['strategy_used'] == 'popular_products'
+        assert [p['id'] for p in response.data['recommendations']] == [catalog[3].id]
+
+    def test_cache_is_invalidated_when_order_is_paid(self, api_client, catalog, reviewers, django_capture_on_commit_callbacks):
+        from shop_orders.models import Order, OrderItem
+
+        a, b, _, _, _ = catalog
+        self._buy(reviewers[1], [a, b])
+        train_recommendation_model()
+        customer = reviewers[0]
+        api_client.force_authenticate(user=customer)
+        before = api_client.get('/api/products/personalized/', {'limit': 3})
+        assert before.data['strategy_used'] == 'popular_products'
+
+        order = Order.objects.create(user=customer)
+        OrderItem.objects.create(order=order, product=a, quantity=1, price=a.price)
+        with django_capture_on_commit_callbacks(execute=True):
+            order.transition_to('PAID')
+
+        after = api_client.get('/api/products/personalized/', {'limit': 3})
+        assert after.data['strategy_used'] == 'personalized_ai'
+        assert after.data['recommendations'][0]['id'] == b.id
+
+    def test_bulk_transition_invalidates_without_order_lookup(
+        self, api_client, catalog, reviewers, django_capture_on_commit_callbacks
+    ):
+        from shop_orders.models import Order
+        from shop_orders.signals import invalidate_recommendations_on_purchase
+        from shop_orders.status_service import bulk_transition
+
+        a, b, _, _, _ = catalog
+        self._buy(reviewers[1], [a, b])
+        train_recommendation_model()
+        customer = reviewers[0]
+        api_client.force_authenticate(user=customer)
+        api_client.get('/api/products/personalized/', {'limit': 3})
+        order = Order.objects.create(user=customer)
+        order.items.create(product=a, quantity=1, price=a.price)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert bulk_transition([order.id], 'PAID')['updated'] == [order.id]
+
+        after = api_client.get('/api/products/personalized/', {'limit': 3})
+        assert after.data['strategy_used'] == 'personalized_ai'
+
+        # Los clientes llegan en la señal: el receiver no consulta órdenes
+        with CaptureQueriesContext(connection) as queries:
+            invalidate_recommendations_on_purchase(Order, [order.id], 'DELIVERED', user_ids={order.id: customer.id})
+        assert len(queries.captured_queries) == 0
+
+    def test_popular_list_is_shared_by_cold_start_users(self, api_client, catalog, reviewers):
+        self._buy(reviewers[2], [catalog[4]])
+        api_client.force_authenticate(user=reviewers[0])
+        api_client.get('/api/products/personalized/', {'limit': 2})
+
+        api_client.force_authenticate(user=reviewers[1])
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/products/personalized/', {'limit': 2})
+
+        assert response.data['recommendations'][0]['id'] == catalog[4].id
+        assert not any('COUNT(' in query['sql'].upper() for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+class TestCatalogImportExport:
+    """Tests de la importación/exportación masiva (CSV y JSONL)"""
+
+    @pytest.fixture
+    def admin(self, db):
+        return User.objects.create_user(username='catalog_admin', email='catalog@test.com', password='pass123', is_staff=True)
+
+    def _upload(self, api_client, admin, content, name='productos.csv', **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        api_client.force_authenticate(user=admin)
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return api_client.post('/api/products/import/', {'file': upload, **data}, format='multipart')
+
+    def test_csv_upserts_by_sku_and_reports_row_errors(self, api_client, admin, category):
+        Product.objects.create(sku='SKU-1', name='Silla', description='vieja', price=Decimal('10.00'), stock=1, category=category)
+        content = (
+            'sku,name,price,stock,category\n'
+            'SKU-1,Silla Gamer,35.50,7,Hogar\n'
+            'SKU-2,Lámpara,12.00,3,Iluminación\n'
+            'SKU-3,Mesa,no-es-precio,1,Hogar\n'
+            'SKU-4,,10.00,1,Hogar\n'
+        )
+
+        response = self._upload(api_client, admin, content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data['created'], response.data['updated']) == (1, 1)
+        assert [error['row'] for error in response.data['errors']] == [4, 5]
+        silla = Product.objects.get(sku='SKU-1')
+        assert (silla.name, silla.price, silla.stock, silla.description) == ('Silla Gamer', Decimal('35.50'), 7, 'vieja')
+        assert Product.objects.get(sku='SKU-2').category.name == 'Iluminación'
+        assert not Product.objects.filter(sku='SKU-3').exists()
+
+    def test_jsonl_without_sku_matches_by_name(self, api_client, admin, category):
+        Product.objects.create(name='Sartén', description='x', price=Decimal('20.00'), stock=1, category=category)
+        content = (
+            '{"name": "Sartén", "stock": 9}\n'
+            '{"name": "Olla", "price": "45.00", "description": "Acero"}\n'
+            '{"name": "Taza"}\n'
+            'no es json\n'
+        )
+
+        response = self._upload(api_client, admin, content, name='productos.jsonl')
+
+        assert (response.data['created'], response.data['updated'], response.data['error_count']) == (1, 1, 2)
+        assert Product.objects.get(name='Sartén').stock == 9
+        assert Product.objects.get(name='Olla').price == Decimal('45.00')
+
+    def test_partial_columns_update_existing_skus(self, api_client, admin, category):
+        Product.objects.create(sku='SKU-1', name='Silla', description='x', price=Decimal('10.00'), stock=1, category=category)
+
+        response = self._upload(api_client, admin, 'sku,stock\nSKU-1,25\nSKU-NUEVO,3\n')
+
+        assert (response.data['created'], response.data['updated']) == (0, 1)
+        assert response.data['errors'] == [{'row': 3, 'error': 'Producto nuevo: name y price son obligatorios'}]
+        silla = Product.objects.get(sku='SKU-1')
+        assert (silla.stock, silla.price, silla.name) == (25, Decimal('10.00'), 'Silla')
+
+    def test_field_limits_are_reported_per_row(self, api_client, admin):
+        content = (
+            'sku,name,price,image_url,warranty_info\n'
+            'SKU-1,Silla,10.00,https://img.test/silla.png,1 año\n'
+            f'{"X" * 65},Mesa,10.00,,\n'
+            'SKU-3,Lámpara,10.00,no-es-url,\n'
+            f'SKU-4,Taza,10.00,,{"g" * 256}\n'
+            'SKU-5,Sofá,10.00,,\n'
+        )
+
+        response = self._upload(api_client, admin, content)
+
+        assert [error['row'] for error in response.data['errors']] == [3, 4, 5]
+        assert response.data['created'] == 2
+        assert set(Product.objects.values_list('sku', flat=True)) == {'SKU-1', 'SKU-5'}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_chunks_are_committed_separately(self, mocker):
+        import io
+        from django.db import connection as db_connection
+        from products import catalog_io
+
+        in_transaction = []
+        import_chunk = catalog_io._import_chunk
+        def spy(chunk, report):
+            in_transaction.append(db_connection.in_atomic_block)
+            return import_chunk(chunk, report)
+        mocker.patch.object(catalog_io, '_import_chunk', side_effect=spy)
+
+        content = 'sku,name,price\nSKU-1,Silla,1.00\nSKU-2,Mesa,2.00\nSKU-3,Taza,3.00\n'
+        report = catalog_io.import_products(io.BytesIO(content.encode()), chunk_size=2)
+
+        assert report['created'] == 3
+        assert in_transaction == [False, False]
+
+    def test_dry_run_does_not_save(self, api_client, admin):
+        response = self._upload(api_client, admin, 'sku,name,price\nSKU-9,Nuevo,1.00\n', dry_run='true')
+
+        assert response.data['created'] == 1
+        assert not Product.objects.filter(sku='SKU-9').exists()
+
+    def test_import_requires_admin(self, api_client, reviewers):
+        response = self._upload(api_client, reviewers[0], 'sku,name,price\nSKU-9,Nuevo,1.00\n')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_export_streams_catalog_in_constant_queries(self, api_client, admin, category):
+        Product.objects.bulk_create([
+            Product(sku=f'SKU-{i}', name=f'Producto {i}', description='x', price=Decimal('5.00'), stock=i, category=category)
+            for i in range(30)
+        ])
+        api_client.force_authenticate(user=admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/products/export/', {'file_format': 'csv'})
+            lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        assert response.streaming
+        assert lines[0] == 'sku,name,description,price,stock,category,image_url,warranty_info,is_active'
+        assert lines[1] == 'SKU-0,Producto 0,x,5.00,0,Hogar,,,True'
+        assert len(lines) == 31
+        assert len(queries.captured_queries) <= 3
+
+        # El archivo exportado se puede volver a importar sin cambios
+        response = self._upload(api_client, admin, '\n'.join(lines) + '\n')
+        assert (response.data['created'], response.data['updated'], response.data['error_count']) == (0, 30, 0)
+
+
+@pytest.mark.django_db
+class TestProductDetailCache:
+    """Tests del cache del detalle de producto y su invalidación"""
+
+    @pytest.fixture
+    def product(self, category):
+        return Product.objects.create(name='Lámpara', description='x', price=Decimal('40.00'), stock=5, category=category)
+
+    def test_second_view_does_not_hit_database(self, api_client, product):
+        first = api_client.get(f'/api/products/{product.id}/')
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = api_client.get(f'/api/products/{product.id}/')
+
+        assert cached.status_code == status.HTTP_200_OK
+        assert cached.data == first.data
+        # La auditoría registra la vista; el producto sale del cache
+        assert not any('products_' in query['sql'] for query in queries.captured_queries)
+
+    def test_invalidated_by_product_category_and_review_writes(
+        self, api_client, product, category, reviewers, django_capture_on_commit_callbacks
+    ):
+        url = f'/api/products/{product.id}/'
+        api_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.price = Decimal('45.00')
+            product.save()
+        assert api_client.get(url).data['price'] == '45.00'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            category.name = 'Casa'
+            category.save()
+        assert api_client.get(url).data['category_name'] == 'Casa'
+
+        api_client.force_authenticate(user=reviewers[0])
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(f'{url}reviews/', {'product': product.id, 'rating': 4, 'comment': 'Bien'})
+        assert api_client.get(url).data['review_count'] == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.is_active = False
+            product.save()
+        assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_non_numeric_id_is_not_found(self, api_client, product):
+        from rest_framework.test import APIRequestFactory
+        from products.views import ProductViewSet
+
+        assert api_client.get('/api/products/abc/').status_code == status.HTTP_404_NOT_FOUND
+
+        # Sin el <int:pk> de products.urls (p. ej. registrado en un router)
+        view = ProductViewSet.as_view({'get': 'retrieve'})
+        response = view(APIRequestFactory().get('/api/products/abc/'), pk='abc')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_concurrent_cold_misses_load_once(self):
+        import threading
+        import time
+        from products.detail_cache import get_product_detail
+
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'id': 99}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_product_detail(99, loader)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{'id': 99}] * 10
+
+
+@pytest.mark.django_db
+class TestFuzzyMatching:
+    """Tests del matching aproximado del carrito por lenguaje natural"""
+
+    @pytest.fixture
+    def products(self, category):
+        reset_catalog_snapshot()
+        return Product.objects.bulk_create([
+            Product(name='Laptop Dell Inspiron', description='x', price=Decimal('900.00'), stock=3, category=category),
+            Product(name='Laptop HP Pavilion', description='x', price=Decimal('700.00'), stock=3, category=category),
+            Product(name='Audífonos Sony', description='Bluetooth', price=Decimal('150.00'), stock=3, category=category),
+            Product(name='Mouse Logitech', description='x', price=Decimal('25.00'), stock=3, category=category),
+        ])
+
+    def test_bounded_levenshtein(self):
+        from products.fuzzy_matching import levenshtein
+
+        assert levenshtein('laptoop', 'laptop', 2) == 1
+        assert levenshtein('kitten', 'sitting', 3) == 3
+        assert levenshtein('mouse', 'pavilion', 2) == 3
+
+    def test_typos_and_missing_accents(self, products):
+        snapshot = get_catalog_snapshot()
+
+        assert snapshot.find('laptoop dell').name == 'Laptop Dell Inspiron'
+        assert snapshot.find('audifonos').name == 'Audífonos Sony'
+        assert snapshot.find('mause').name == 'Mouse Logitech'
+        assert snapshot.find('zzzz') is None
+
+    def test_candidates_are_ranked_with_scores(self, products):
+        results = get_catalog_snapshot().match('laptop pavilion')
+
+        assert [product.name for product, _ in results] == ['Laptop HP Pavilion', 'Laptop Dell Inspiron']
+        assert results[0][1] > results[1][1]
+
+    def test_endpoint_returns_confidence_and_candidates(self, api_client, products, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+
+        response = api_client.post('/api/orders/cart/add-natural-language/', {'prompt': 'agrega 1 laptoop hp'})
+
+        item = response.data['items'][0]
+        assert item['name'] == 'Laptop HP Pavilion'
+        assert 0 < item['confidence'] <= 1
+        assert [candidate['name'] for candidate in item['candidates']][:2] == ['Laptop HP Pavilion', 'Laptop Dell Inspiron']
+
+
+@pytest.mark.django_db
+class TestNLPCartBatch:
+    """Tests del endpoint de varios comandos de carrito por solicitud"""
+
+    URL = '/api/orders/cart/add-natural-language/batch/'
+
+    @pytest.fixture
+    def products(self, category):
+        reset_catalog_snapshot()
+        return Product.objects.bulk_create([
+            Product(name='Laptop Dell', description='x', price=Decimal('900.00'), stock=3, category=category),
+            Product(name='Mouse Logitech', description='x', price=Decimal('25.00'), stock=10, category=category),
+            Product(name='Taza Cerámica', description='x', price=Decimal('5.00'), stock=1, category=category),
+        ])
+
+    def test_prompts_are_merged_into_one_cart_with_one_product_query(self, api_client, products, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+        get_catalog_snapshot()
+        prompts = ['agrega 2 laptops y 3 mouse', 'quiero 1 laptop', 'quita 1 mouse', 'agrega 1 unicornio']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(self.URL, {'prompts': prompts}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [result['success'] for result in response.data['results']] == [True, True, True, False]
+        assert [(item['name'], item['quantity']) for item in response.data['items']] == [
+            ('Laptop Dell', 3), ('Mouse Logitech', 2)
+        ]
+        assert response.data['total'] == '2750.00'
+        assert response.data['success'] is False
+        assert sum('products_product' in query['sql'] for query in queries.captured_queries) == 1
+
+    def test_transcript_is_split_and_stock_is_checked_on_merged_cart(self, api_client, products, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+
+        response = api_client.post(self.URL, {
+            'transcript': 'Vaciar el carrito. Agrega 1 taza y luego 1 taza más! después 1 mouse'
+        }, format='json')
+
+        assert response.data['count'] == 4
+        assert [item['name'] for item in response.data['items']] == ['Mouse Logitech']
+        assert response.data['errors'] == ['Stock insuficiente para "Taza Cerámica". Stock disponible: 1']
+        assert response.data['cart_action'] == 'replace_cart'
+
+    def test_remove_without_clear_is_a_delta_on_the_current_cart(self, api_client, products, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+
+        response = api_client.post(self.URL, {'transcript': 'quita el mouse'}, format='json')
+
+        assert response.data['success'] is True
+        assert response.data['cart_action'] == 'update_cart'
+        assert response.data['items'] == []
+        assert response.data['removed_items'] == [
+            {'product_id': products[1].id, 'name': 'Mouse Logitech', 'quantity': 1}
+        ]
+
+    def test_reserved_units_are_not_offered(self, api_client, products, reviewers):
+        Product.objects.filter(id=products[1].id).update(reserved_stock=9)
+        api_client.force_authenticate(user=reviewers[0])
+
+        response = api_client.post(self.URL, {'prompts': ['agrega 2 mouse']}, format='json')
+
+        assert response.data['items'] == []
+        assert response.data['errors'] == ['Stock insuficiente para "Mouse Logitech". Stock disponible: 1']
+
+        response = api_client.post('/api/orders/cart/add-natural-language/', {'prompt': 'agrega 2 mouse'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_requires_prompts_or_transcript(self, api_client, reviewers):
+        api_client.force_authenticate(user=reviewers[0])
+
+        response = api_client.post(self.URL, {'prompts': []}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
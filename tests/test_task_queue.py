@@ -0,0 +1,68 @@
+"""
+Tests unitarios para la cola de tareas en segundo plano
+"""
+
+import pytest
+from django.core.management import call_command
+
+from task_queue.models import DeadLetterTask
+from task_queue.queue import task
+
+calls = []
+
+
+@task(name='tests.flaky', max_retries=2, retry_backoff=1)
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError('fallo temporal')
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+@pytest.mark.django_db
+class TestTaskQueue:
+    """Tests de reintentos y dead-letter"""
+
+    def test_task_is_retried_until_it_succeeds(self):
+        flaky.delay(2)
+
+        assert len(calls) == 3
+        assert DeadLetterTask.objects.count() == 0
+
+    def test_exhausted_task_goes_to_dead_letter(self):
+        flaky.delay(10)
+
+        assert len(calls) == 3
+        dead = DeadLetterTask.objects.get()
+        assert dead.task_name == 'tests.flaky'
+        assert dead.args == [10]
+        assert dead.attempts == 3
+        assert 'fallo temporal' in dead.last_error
+
+    def test_backoff_is_exponential(self):
+        assert [flaky.countdown(n) for n in (1, 2, 3)] == [1, 2, 4]
+
+    def test_retry_dead_letters_requeues_task(self):
+        dead = DeadLetterTask.objects.create(task_name='tests.flaky', args=[0], attempts=3)
+
+        call_command('retry_dead_letters')
+
+        assert calls == [0]
+        dead.refresh_from_db()
+        assert dead.requeued_at is not None
+
+    def test_delay_waits_for_commit(self, settings, django_capture_on_commit_callbacks, mocker):
+        settings.TASK_QUEUE_ALWAYS_EAGER = False
+        backend = mocker.Mock()
+        mocker.patch('task_queue.queue.get_backend', return_value=backend)
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            flaky.delay(0)
+            backend.submit.assert_not_called()
+
+        assert len(callbacks) == 1
+        backend.submit.assert_called_once_with('tests.flaky', [0], {})
@@ -559,3 +559,30 @@ class TestWalletDeductFundsMethod:
         assert transaction is not None
         assert transaction.amount == Decimal('-25.00')  # Negativo
         assert transaction.balance_after == Decimal('75.00')
+
+
+@pytest.mark.django_db
+class TestWalletTransactionCursor:
+    """Tests de paginación por cursor en my_transactions"""
+
+    def test_my_transactions_cursor_pages(self, api_client, client_user, wallet_with_balance):
+        for i in range(3):
+            WalletTransaction.objects.create(
+                wallet=wallet_with_balance,
+                amount=Decimal('10.00'),
+                transaction_type=WalletTransaction.TransactionType.DEPOSIT,
+                balance_after=Decimal('500.00'),
+                description=f'Depósito {i}'
+            )
+        api_client.force_authenticate(user=client_user)
+
+        # Sin cursor: lista completa, como antes
+        response = api_client.get('/api/users/wallet-transactions/my_transactions/')
+        assert len(response.data) == 3
+
+        first = api_client.get('/api/users/wallet-transactions/my_transactions/?cursor=&page_size=2')
+        second = api_client.get(first.data['next'])
+
+        assert len(first.data['results']) == 2
+        assert len(second.data['results']) == 1
+        assert second.data['next'] is None
@@ -0,0 +1,70 @@
+"""
+Tareas en segundo plano para notificaciones push (FCM).
+
+Reciben IDs en lugar de instancias para poder serializarse al broker.
+"""
+import logging
+
+from task_queue.queue import task
+
+logger = logging.getLogger(__name__)
+
+
+@task(max_retries=3)
+def send_order_status_notification(order_id, new_status):
+    """Notificación push de cambio de estado de una orden."""
+    from shop_orders.models import Order
+    from .push_notification_service import PushNotificationService
+
+    order = Order.objects.select_related('user').get(id=order_id)
+    return PushNotificationService.send_order_status_update_notification(
+        user=order.user,
+        order=order,
+        new_status=new_status
+    )
+
+
+@task(max_retries=1)
+def send_bulk_order_status_notifications(order_ids, new_status):
+    """
+    Notificaciones push de un cambio de estado en bloque (ver
+    shop_orders.status_service). Un fallo con un usuario no reintenta el lote
+    completo: se registra y se sigue con el resto.
+    """
+    from shop_orders.models import Order
+    from .push_notification_service import PushNotificationService
+
+    sent = 0
+    for order in Order.objects.select_related('user').filter(id__in=order_ids):
+        try:
+            result = PushNotificationService.send_order_status_update_notification(
+                user=order.user,
+                order=order,
+                new_status=new_status
+            )
+            sent += 1 if result.get('success') else 0
+        except Exception as e:
+            logger.error(f"Error enviando notificación de orden #{order.id}: {e}")
+    return sent
+
+
+@task(max_retries=3)
+def send_order_delivered_notification(order_id):
+    """Notificación push de orden entregada."""
+    from shop_orders.models import Order
+    from .push_notification_service import PushNotificationService
+
+    order = Order.objects.select_related('user').get(id=order_id)
+    return PushNotificationService.send_order_delivered_notification(order.user, order)
+
+
+@task(max_retries=3)
+def send_return_notification(return_id, approved):
+    """Notificación push de devolución aprobada o rechazada."""
+    from deliveries.models import Return
+    from .push_notification_service import PushNotificationService
+
+    return_obj = Return.objects.select_related('order__user', 'product').get(id=return_id)
+    if approved:
+        return PushNotificationService.send_return_approved_notification(return_obj.order.user, return_obj)
+    return PushNotificationService.send_return_rejected_notification(return_obj.order.user, return_obj)
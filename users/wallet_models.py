@@ -184,7 +184,7 @@ class WalletTransaction(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
-            models.Index(fields=['wallet', '-created_at']),
+            models.Index(fields=['wallet', '-created_at', '-id']),  # my_transactions con cursor
             models.Index(fields=['transaction_type']),
             models.Index(fields=['reference_id']),
         ]
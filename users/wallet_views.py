@@ -18,6 +18,7 @@ from .wallet_serializers import (
     WalletWithdrawalSerializer
 )
 from .permissions import IsAdminOrManager
+from ecommerce_api.pagination import KeysetPageNumberPagination
 
 
 class WalletViewSet(viewsets.ReadOnlyModelViewSet):
@@ -164,6 +165,16 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
 
+class WalletTransactionPagination(KeysetPageNumberPagination):
+    """
+    Sin paginación por defecto (respuesta como lista, igual que antes).
+    Con ?cursor= usa paginación keyset sobre (created_at, id).
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
 class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para consultar transacciones de billetera.
@@ -173,6 +184,7 @@ class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = WalletTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = WalletTransactionPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['transaction_type', 'status']
     ordering_fields = ['created_at', 'amount']
@@ -201,6 +213,8 @@ class WalletTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     def my_transactions(self, request):
         """
         Obtener las transacciones del usuario autenticado.
+        
+        Con ?cursor= (y opcionalmente ?page_size=) devuelve páginas por cursor.
         """
         try:
             wallet = request.user.wallet